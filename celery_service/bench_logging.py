@@ -0,0 +1,94 @@
+"""
+Бенчмарк накладных расходов логирования на задачу воркера.
+
+Выполняет lesson.schedule_reminder (локально, через Task.apply) в разных
+режимах логирования и сравнивает со запуском без логов:
+
+    python bench_logging.py --tasks 5000
+
+task us - время задачи в ее потоке, overhead us - добавка к запуску без
+логов; drain ms - сколько фоновый QueueListener после прогона дописывает
+очередь в файл. --io-delay-ms имитирует медленный диск (сетевой том).
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+from logging.handlers import RotatingFileHandler
+
+# До импорта worker: индекс и метрики не должны требовать Redis и /var/log
+os.environ.setdefault('REMINDER_INDEX_URL', 'memory://')
+os.environ.setdefault('CELERY_METRICS_DIR', os.path.join(tempfile.gettempdir(), 'bench_logging_metrics'))
+
+import logging  # noqa: E402
+
+import logging_config  # noqa: E402
+import worker  # noqa: E402
+
+# Брокер и бэкенд результатов в памяти процесса
+worker.app.conf.update(broker_url='memory://', result_backend='cache+memory://')
+
+MODES = [
+    # (название, режим, формат, доля info-сообщений с пометкой SAMPLED)
+    ('off', None, 'text', 1.0),
+    ('sync,text', 'sync', 'text', 1.0),
+    ('queue,text', 'queue', 'text', 1.0),
+    ('queue,json', 'queue', 'json', 1.0),
+    ('queue,json,sample=0.1', 'queue', 'json', 0.1),
+]
+
+
+def run(tasks: int) -> float:
+    start_time = datetime.now(worker.MOSCOW_TZ) + timedelta(hours=1)
+    started = time.perf_counter()
+    for i in range(tasks):
+        worker.schedule_lesson_reminder.apply(args=[{
+            'id': i,
+            'title': f'Бенчмарк {i}',
+            'start_time': (start_time + timedelta(seconds=i)).isoformat(),
+        }])
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--tasks', type=int, default=5000)
+    parser.add_argument('--io-delay-ms', type=float, default=0,
+                        help="Задержка записи каждой строки в файл, мс")
+    args = parser.parse_args()
+
+    if args.io_delay_ms:
+        emit = RotatingFileHandler.emit
+
+        def slow_emit(self, record):
+            time.sleep(args.io_delay_ms / 1000)
+            emit(self, record)
+
+        RotatingFileHandler.emit = slow_emit
+
+    baseline = None
+    print(f"{'mode':<24}{'task us':>10}{'overhead us':>13}{'drain ms':>10}{'log KB':>9}")
+    for name, mode, fmt, sample_rate in MODES:
+        with tempfile.TemporaryDirectory() as log_dir:
+            logging_config.configure_logging(
+                logging_config.setup_separate_logging(log_dir, fmt, sample_rate), mode=mode or 'sync'
+            )
+            if mode is None:
+                logging.disable(logging.CRITICAL)
+            run(min(args.tasks, 200))  # прогрев
+
+            duration = run(args.tasks)
+            drain_started = time.perf_counter()
+            logging_config.stop_listeners()
+            drain = time.perf_counter() - drain_started
+            logging.disable(logging.NOTSET)
+            size = os.path.getsize(os.path.join(log_dir, 'celery_tasks.log'))
+
+        per_task = duration / args.tasks * 1e6
+        baseline = per_task if baseline is None else baseline
+        print(f"{name:<24}{per_task:>10.1f}{per_task - baseline:>13.1f}{drain * 1000:>10.1f}{size / 1024:>9.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,30 +1,124 @@
+import atexit
+import json
+import logging
+import logging.config
 import os
+import queue
+import random
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
 
+from celery import current_task
 
-def setup_separate_logging():
+# sync - обработчики пишут файл в потоке задачи; queue - задача только
+# кладет запись в очередь, запись в файл делает фоновый поток QueueListener
+LOG_MODE = os.environ.get('LOG_MODE', 'queue')
+# text - строки как раньше; json - один JSON-объект на строку (task_id, lesson_id)
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text')
+# Доля сохраняемых info-сообщений с пометкой SAMPLED (подробности планирования)
+LOG_INFO_SAMPLE_RATE = float(os.environ.get('LOG_INFO_SAMPLE_RATE', 1.0))
+LOG_DIR = os.environ.get('LOG_DIR', '/var/log/celery')
+
+# extra для массовых info-сообщений, которые можно прореживать
+SAMPLED = {'sampled': True}
+
+
+class TaskContextFilter(logging.Filter):
+    """
+    Добавляет в запись task_id текущей задачи Celery и lesson_id
+    (если не переданы через extra). Выполняется в потоке задачи,
+    до передачи записи в очередь.
+    """
+
+    def filter(self, record):
+        if getattr(record, 'task_id', None) is None:
+            request = current_task.request if current_task else None
+            record.task_id = getattr(request, 'id', None) or '-'
+        if not hasattr(record, 'lesson_id'):
+            record.lesson_id = None
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает долю rate info-сообщений с extra=SAMPLED, остальные - всегда"""
+
+    def __init__(self, rate: float = 1.0):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if self.rate >= 1 or record.levelno > logging.INFO or not getattr(record, 'sampled', False):
+            return True
+        return random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись - одна строка JSON"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'task_id': getattr(record, 'task_id', None),
+            'lesson_id': getattr(record, 'lesson_id', None),
+        }
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler без форматирования в потоке задачи.
+
+    Стандартный prepare() склеивает сообщение с аргументами до постановки
+    в очередь; очередь здесь внутри процесса, поэтому запись передается
+    как есть, и % -форматирование выполняет поток QueueListener.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def setup_separate_logging(log_dir: str = LOG_DIR, fmt: str = LOG_FORMAT, sample_rate: float = LOG_INFO_SAMPLE_RATE):
     """Настройка раздельного логирования"""
 
-    log_dir = '/var/log/celery'
     os.makedirs(log_dir, exist_ok=True)
+    tasks_formatter = 'json' if fmt == 'json' else 'standard'
+    system_formatter = 'json' if fmt == 'json' else 'detailed'
 
     logging_config = {
         'version': 1,
         'disable_existing_loggers': False,
         'formatters': {
             'standard': {
-                'format': '[%(asctime)s] %(levelname)s - %(message)s',
+                'format': '[%(asctime)s] %(levelname)s - [%(task_id)s] %(message)s',
                 'datefmt': '%Y-%m-%d %H:%M:%S'
             },
             'detailed': {
                 'format': '[%(asctime)s] %(levelname)s - %(name)s - %(message)s',
                 'datefmt': '%Y-%m-%d %H:%M:%S'
             },
+            'json': {
+                '()': JsonFormatter,
+            },
+        },
+        'filters': {
+            'task_context': {
+                '()': TaskContextFilter,
+            },
+            'sampling': {
+                '()': SamplingFilter,
+                'rate': sample_rate,
+            },
         },
         'handlers': {
             'system_file': {
                 'class': 'logging.handlers.RotatingFileHandler',
                 'level': 'INFO',
-                'formatter': 'detailed',
+                'formatter': system_formatter,
                 'filename': os.path.join(log_dir, 'celery_system.log'),
                 'maxBytes': 10485760,  # 10MB
                 'backupCount': 3,
@@ -33,7 +127,7 @@ def setup_separate_logging():
             'tasks_file': {
                 'class': 'logging.handlers.RotatingFileHandler',
                 'level': 'INFO',
-                'formatter': 'standard',
+                'formatter': tasks_formatter,
                 'filename': os.path.join(log_dir, 'celery_tasks.log'),
                 'maxBytes': 10485760,
                 'backupCount': 3,
@@ -64,6 +158,8 @@ def setup_separate_logging():
             },
             'lesson_tasks': {
                 'level': 'INFO',
+                # Фильтры логгера выполняются в потоке задачи: там известна текущая задача
+                'filters': ['sampling', 'task_context'],
                 'handlers': ['tasks_file'],
                 'propagate': False
             },
@@ -81,5 +177,54 @@ def setup_separate_logging():
     return logging_config
 
 
+# Логгеры, обработчики которых в режиме queue переносятся в QueueListener
+QUEUED_LOGGERS = ('celery', 'celery.beat', 'celery.worker', 'lesson_tasks')
+
+# Логгер -> QueueListener со своими обработчиками и очередью
+_listeners = {}
+
+
+def configure_logging(config: dict = None, mode: str = LOG_MODE):
+    """
+    Применяет конфигурацию; в режиме queue логгеры получают
+    DeferredQueueHandler, а их файловые обработчики обслуживают
+    фоновые потоки QueueListener.
+    """
+    stop_listeners()
+    logging.config.dictConfig(config or logging_config)
+    if mode != 'queue':
+        return
+
+    for name in QUEUED_LOGGERS:
+        logger = logging.getLogger(name)
+        log_queue = queue.SimpleQueue()
+        # Уровень проверяет каждый обработчик: console пишет только WARNING и выше
+        _listeners[name] = QueueListener(log_queue, *logger.handlers, respect_handler_level=True)
+        logger.handlers = [DeferredQueueHandler(log_queue)]
+        _listeners[name].start()
+    atexit.register(stop_listeners)
+
+
+def restart_listeners():
+    """
+    Перезапуск фоновых потоков после fork (worker_process_init): потоки
+    родителя в дочернем процессе prefork не существуют.
+    """
+    for name, listener in list(_listeners.items()):
+        # Очередь родителя могла остаться с записями или захваченной блокировкой
+        log_queue = queue.SimpleQueue()
+        logging.getLogger(name).handlers = [DeferredQueueHandler(log_queue)]
+        _listeners[name] = QueueListener(log_queue, *listener.handlers, respect_handler_level=True)
+        _listeners[name].start()
+
+
+def stop_listeners():
+    """Дописывает очереди и останавливает потоки (при выходе процесса)"""
+    for listener in _listeners.values():
+        if listener._thread is not None:
+            listener.stop()
+    _listeners.clear()
+
+
 # Создаем конфигурацию
-logging_config = setup_separate_logging()
\ No newline at end of file
+logging_config = setup_separate_logging()
@@ -0,0 +1,122 @@
+import asyncio
+import time
+from datetime import datetime
+
+import pytz
+
+MOSCOW_TZ = pytz.timezone('Europe/Moscow')
+
+
+def reminder_message(reminder: dict) -> str:
+    """Текст напоминания для ученика"""
+    start_time = datetime.fromisoformat(reminder['start_time'])
+    if start_time.tzinfo is None:
+        start_time = MOSCOW_TZ.localize(start_time)
+
+    if reminder.get('is_early_notice', True):
+        return f"🚨 Напоминание: через 5 минут начнется урок '{reminder['title']}'. Время начала: {start_time.strftime('%Y-%m-%d %H:%M')}"
+    return f"🚨 Урок '{reminder['title']}' начнется менее чем через 5 минут. Время начала: {start_time.strftime('%Y-%m-%d %H:%M')}"
+
+
+class Notifier:
+    """
+    Канал доставки напоминаний.
+
+    Реализация должна быть асинхронной: deliver_batch отправляет
+    напоминания пачки конкурентно, поэтому ожидание сети одного
+    напоминания не задерживает остальные.
+    """
+
+    async def send(self, reminder: dict, message: str):
+        raise NotImplementedError
+
+
+class LogNotifier(Notifier):
+    """
+    Пишет уведомление в лог задач; delay - имитация задержки внешнего
+    сервиса в секундах (для бенчмарков).
+    """
+
+    def __init__(self, logger, delay: float = 0):
+        self.logger = logger
+        self.delay = delay
+
+    async def send(self, reminder: dict, message: str):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.logger.info(message, extra={'task_id': reminder.get('task_id'), 'lesson_id': reminder.get('reminder_id')})
+
+
+class FakeNotifier(Notifier):
+    """
+    Notifier для тестов и бенчмарков: ничего не отправляет, только
+    запоминает доставленные напоминания.
+
+    Attributes:
+        delay (float): Имитация задержки доставки
+        fail_ids (set): id напоминаний, доставка которых завершится ошибкой
+    """
+
+    def __init__(self, delay: float = 0.0, fail_ids=None):
+        self.delay = delay
+        self.fail_ids = set(fail_ids or ())
+        self.sent = []
+
+    async def send(self, reminder: dict, message: str):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if reminder.get('reminder_id') in self.fail_ids:
+            raise ConnectionError(f"Доставка {reminder['reminder_id']} не удалась")
+        self.sent.append((reminder, message))
+
+
+def create_notifier(name: str, logger, delay: float):
+    """Создает notifier по имени из настройки REMINDER_NOTIFIER"""
+    if name == 'fake':
+        return FakeNotifier(delay=delay)
+    return LogNotifier(logger, delay=delay)
+
+
+async def deliver_batch(reminders: list[dict], notifier: Notifier, concurrency: int) -> dict:
+    """
+    Конкурентно доставляет пачку напоминаний.
+
+    Args:
+        reminders: Напоминания; due_ts - плановое время отправки (epoch)
+        notifier: Канал доставки
+        concurrency: Максимум одновременных отправок
+
+    Returns:
+        dict: Отчет по пачке: количество отправленных/ошибок, длительность,
+            пропускная способность и опоздание относительно due_ts
+            (lateness - опоздание каждого доставленного напоминания)
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    lateness = []
+    failed = []
+
+    async def send_one(reminder):
+        async with semaphore:
+            try:
+                await notifier.send(reminder, reminder_message(reminder))
+            except Exception as e:
+                failed.append((reminder.get('reminder_id'), str(e)))
+                return
+            if reminder.get('due_ts') is not None:
+                lateness.append(time.time() - reminder['due_ts'])
+
+    started = time.perf_counter()
+    await asyncio.gather(*(send_one(reminder) for reminder in reminders))
+    duration = time.perf_counter() - started
+
+    sent = len(reminders) - len(failed)
+    return {
+        'size': len(reminders),
+        'sent': sent,
+        'failed': failed,
+        'duration': round(duration, 4),
+        'throughput': round(sent / duration, 2) if duration else None,
+        'lateness_avg': round(sum(lateness) / len(lateness), 4) if lateness else None,
+        'lateness_max': round(max(lateness), 4) if lateness else None,
+        'lateness': lateness,
+    }
@@ -0,0 +1,316 @@
+import heapq
+import json
+import threading
+import time
+
+import redis
+
+# Атомарно забирает до ARGV[2] напоминаний со сроком <= ARGV[1] в аренду:
+# переносит их из очереди в in-flight с дедлайном ARGV[4] и возвращает payload.
+# Payload удаляет только подтверждение (ACK_SCRIPT) после публикации задач.
+# Аренды с истекшим дедлайном (<= ARGV[3], диспетчер упал до подтверждения)
+# сначала возвращаются в очередь со сроком ARGV[3].
+# Благодаря атомарности несколько диспетчеров не заберут одно напоминание дважды.
+CLAIM_DUE_SCRIPT = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[3], '-inf', ARGV[3])
+for i = 1, #expired do
+    redis.call('ZREM', KEYS[3], expired[i])
+    redis.call('ZADD', KEYS[1], ARGV[3], expired[i])
+end
+local ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'WITHSCORES', 'LIMIT', 0, ARGV[2])
+local result = {}
+for i = 1, #ids, 2 do
+    local payload = redis.call('HGET', KEYS[2], ids[i])
+    redis.call('ZREM', KEYS[1], ids[i])
+    redis.call('ZADD', KEYS[3], ARGV[4], ids[i])
+    table.insert(result, ids[i])
+    table.insert(result, ids[i + 1])
+    table.insert(result, payload or '{}')
+end
+return result
+"""
+
+# Подтверждает публикацию арендованных напоминаний (ARGV - id): снимает
+# аренду и удаляет payload, если напоминание не добавили заново за это время.
+ACK_SCRIPT = """
+for i = 1, #ARGV do
+    if redis.call('ZREM', KEYS[1], ARGV[i]) == 1 and not redis.call('ZSCORE', KEYS[2], ARGV[i]) then
+        redis.call('HDEL', KEYS[3], ARGV[i])
+    end
+end
+return 0
+"""
+
+# Снимает отметки актуальности доставленных напоминаний одним запросом.
+# ARGV - пары (id, start_time); отметка удаляется, только если урок не перенесли.
+COMPLETE_SCRIPT = """
+for i = 1, #ARGV, 2 do
+    if redis.call('HGET', KEYS[1], ARGV[i]) == ARGV[i + 1] then
+        redis.call('HDEL', KEYS[1], ARGV[i])
+    end
+end
+return 0
+"""
+
+
+class RedisReminderIndex:
+    """
+    Персистентный индекс будущих напоминаний в Redis.
+
+    Хранение:
+        <prefix>:due      - sorted set, member = id напоминания, score = срок (epoch)
+        <prefix>:inflight - sorted set забранных диспетчером, но еще не
+                            подтвержденных напоминаний, score = дедлайн аренды
+        <prefix>:payload  - hash, id -> JSON с данными урока
+        <prefix>:current  - hash, id -> start_time актуальной версии урока,
+                            используется для проверки отмены/переноса
+                            перед самой отправкой
+
+    Повторное добавление с тем же id перезаписывает срок и payload, поэтому
+    перенос урока - это просто повторный add.
+    """
+
+    def __init__(self, url: str, prefix: str = 'reminders'):
+        self.redis = redis.Redis.from_url(url, decode_responses=True)
+        self.due_key = f'{prefix}:due'
+        self.inflight_key = f'{prefix}:inflight'
+        self.payload_key = f'{prefix}:payload'
+        self.current_key = f'{prefix}:current'
+        self._claim_due = self.redis.register_script(CLAIM_DUE_SCRIPT)
+        self._complete = self.redis.register_script(COMPLETE_SCRIPT)
+        self._ack = self.redis.register_script(ACK_SCRIPT)
+
+    def add(self, reminder_id: str, due_ts: float, payload: dict):
+        pipe = self.redis.pipeline()
+        pipe.hset(self.payload_key, reminder_id, json.dumps(payload))
+        pipe.hset(self.current_key, reminder_id, payload['start_time'])
+        pipe.zadd(self.due_key, {reminder_id: due_ts})
+        # Перенос арендованного напоминания: истекшая аренда не должна вернуть старый срок
+        pipe.zrem(self.inflight_key, reminder_id)
+        pipe.execute()
+
+    def add_many(self, entries: list[tuple[str, float, dict]]):
+        """Добавляет пачку напоминаний за один запрос к Redis"""
+        if not entries:
+            return
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hset(self.payload_key, mapping={
+            reminder_id: json.dumps(payload) for reminder_id, _, payload in entries
+        })
+        pipe.hset(self.current_key, mapping={
+            reminder_id: payload['start_time'] for reminder_id, _, payload in entries
+        })
+        pipe.zadd(self.due_key, {reminder_id: due_ts for reminder_id, due_ts, _ in entries})
+        pipe.zrem(self.inflight_key, *(reminder_id for reminder_id, _, _ in entries))
+        pipe.execute()
+
+    def cancel(self, reminder_id: str):
+        pipe = self.redis.pipeline()
+        pipe.zrem(self.due_key, reminder_id)
+        pipe.zrem(self.inflight_key, reminder_id)
+        pipe.hdel(self.payload_key, reminder_id)
+        pipe.hdel(self.current_key, reminder_id)
+        pipe.execute()
+
+    def mark_current(self, reminder_id: str, start_time_iso: str):
+        self.redis.hset(self.current_key, reminder_id, start_time_iso)
+
+    def claim_due(self, until_ts: float, limit: int, now: float, lease_until: float) -> list[tuple[str, float, dict]]:
+        raw = self._claim_due(
+            keys=[self.due_key, self.payload_key, self.inflight_key],
+            args=[until_ts, limit, now, lease_until],
+        )
+        return [
+            (raw[i], float(raw[i + 1]), json.loads(raw[i + 2]))
+            for i in range(0, len(raw), 3)
+        ]
+
+    def ack(self, reminder_ids: list[str]):
+        if reminder_ids:
+            self._ack(keys=[self.inflight_key, self.due_key, self.payload_key], args=reminder_ids)
+
+    def is_current(self, reminder_id: str, start_time_iso: str) -> bool:
+        return self.redis.hget(self.current_key, reminder_id) == start_time_iso
+
+    def complete(self, reminder_id: str, start_time_iso: str):
+        # Удаляем отметку, только если урок не перенесли после отправки задачи
+        self._complete(keys=[self.current_key], args=[reminder_id, start_time_iso])
+
+    def filter_current(self, reminders: list[dict]) -> list[dict]:
+        ids = [r['reminder_id'] for r in reminders if r.get('reminder_id') is not None]
+        current = dict(zip(ids, self.redis.hmget(self.current_key, ids))) if ids else {}
+        return [
+            r for r in reminders
+            if r.get('reminder_id') is None or current.get(r['reminder_id']) == r['start_time']
+        ]
+
+    def complete_many(self, reminders: list[dict]):
+        args = []
+        for reminder in reminders:
+            if reminder.get('reminder_id') is not None:
+                args += [reminder['reminder_id'], reminder['start_time']]
+        if args:
+            self._complete(keys=[self.current_key], args=args)
+
+    def pending_count(self) -> int:
+        return self.redis.zcard(self.due_key)
+
+
+class MemoryReminderIndex:
+    """
+    Индекс напоминаний на куче в памяти процесса.
+
+    Локальная замена RedisReminderIndex для разработки и бенчмарков
+    (REMINDER_INDEX_URL=memory://). Не переживает перезапуск и не
+    разделяется между процессами.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._entries = {}
+        # id -> (дедлайн аренды, срок, payload)
+        self._inflight = {}
+        self._current = {}
+        self._lock = threading.Lock()
+
+    def add(self, reminder_id: str, due_ts: float, payload: dict):
+        with self._lock:
+            self._inflight.pop(reminder_id, None)
+            self._entries[reminder_id] = (due_ts, payload)
+            self._current[reminder_id] = payload['start_time']
+            heapq.heappush(self._heap, (due_ts, reminder_id))
+
+    def add_many(self, entries: list[tuple[str, float, dict]]):
+        for reminder_id, due_ts, payload in entries:
+            self.add(reminder_id, due_ts, payload)
+
+    def cancel(self, reminder_id: str):
+        with self._lock:
+            # Запись в куче удаляется лениво при claim_due
+            self._entries.pop(reminder_id, None)
+            self._inflight.pop(reminder_id, None)
+            self._current.pop(reminder_id, None)
+
+    def mark_current(self, reminder_id: str, start_time_iso: str):
+        with self._lock:
+            self._current[reminder_id] = start_time_iso
+
+    def claim_due(self, until_ts: float, limit: int, now: float, lease_until: float) -> list[tuple[str, float, dict]]:
+        claimed = []
+        with self._lock:
+            for reminder_id, (deadline, due_ts, payload) in list(self._inflight.items()):
+                if deadline <= now:
+                    del self._inflight[reminder_id]
+                    self._entries[reminder_id] = (due_ts, payload)
+                    heapq.heappush(self._heap, (due_ts, reminder_id))
+            while self._heap and self._heap[0][0] <= until_ts and len(claimed) < limit:
+                due_ts, reminder_id = heapq.heappop(self._heap)
+                entry = self._entries.get(reminder_id)
+                # Устаревшая запись: напоминание отменено или перенесено
+                if entry is None or entry[0] != due_ts:
+                    continue
+                del self._entries[reminder_id]
+                self._inflight[reminder_id] = (lease_until, due_ts, entry[1])
+                claimed.append((reminder_id, due_ts, entry[1]))
+        return claimed
+
+    def ack(self, reminder_ids: list[str]):
+        with self._lock:
+            for reminder_id in reminder_ids:
+                self._inflight.pop(reminder_id, None)
+
+    def is_current(self, reminder_id: str, start_time_iso: str) -> bool:
+        return self._current.get(reminder_id) == start_time_iso
+
+    def complete(self, reminder_id: str, start_time_iso: str):
+        with self._lock:
+            if self._current.get(reminder_id) == start_time_iso:
+                del self._current[reminder_id]
+
+    def filter_current(self, reminders: list[dict]) -> list[dict]:
+        return [
+            r for r in reminders
+            if r.get('reminder_id') is None or self.is_current(r['reminder_id'], r['start_time'])
+        ]
+
+    def complete_many(self, reminders: list[dict]):
+        for reminder in reminders:
+            if reminder.get('reminder_id') is not None:
+                self.complete(reminder['reminder_id'], reminder['start_time'])
+
+    def pending_count(self) -> int:
+        return len(self._entries)
+
+
+def create_reminder_index(url: str):
+    """Создает индекс по URL: redis://... или memory://"""
+    if url.startswith('memory://'):
+        return MemoryReminderIndex()
+    return RedisReminderIndex(url)
+
+
+class ReminderScheduler:
+    """
+    Планировщик напоминаний вместо ETA-задач Celery.
+
+    Напоминания на будущее лежат в индексе, а не в памяти воркера и брокера.
+    Периодический тик (celery beat) забирает только те, срок которых
+    наступает в ближайшие window секунд, и передает их пачками в dispatch.
+
+    Attributes:
+        index: RedisReminderIndex или MemoryReminderIndex
+        window (float): Горизонт выборки в секундах, должен быть больше
+            периода тика, чтобы напоминания не опаздывали
+        batch_size (int): Максимальный размер пачки
+        lease (float): Сколько секунд забранное напоминание ждет подтверждения
+            публикации; после этого оно возвращается в очередь
+    """
+
+    def __init__(self, index, window: float = 60, batch_size: int = 500, lease: float = 120):
+        self.index = index
+        self.window = window
+        self.batch_size = batch_size
+        self.lease = lease
+
+    def schedule(self, reminder_id: str, due_ts: float, payload: dict):
+        """Добавляет или переносит напоминание"""
+        self.index.add(reminder_id, due_ts, payload)
+
+    def schedule_many(self, entries: list[tuple[str, float, dict]]):
+        """Добавляет или переносит пачку напоминаний (reminder_id, due_ts, payload)"""
+        self.index.add_many(entries)
+
+    def cancel(self, reminder_id: str):
+        """Отменяет напоминание, в том числе уже переданное на отправку"""
+        self.index.cancel(reminder_id)
+
+    def is_due_soon(self, due_ts: float, now: float = None) -> bool:
+        now = time.time() if now is None else now
+        return due_ts <= now + self.window
+
+    def dispatch_due(self, dispatch, now: float = None) -> int:
+        """
+        Забирает напоминания со сроком до now + window и передает их
+        в dispatch(batch) пачками не больше batch_size.
+
+        Пачка забирается в аренду на lease секунд и подтверждается после
+        того, как dispatch вернул управление. Если dispatch упал или процесс
+        завершился, напоминания вернутся в очередь после дедлайна аренды;
+        повторно опубликованная пачка не доставит напоминание дважды -
+        отметку актуальности снимает первая доставка.
+
+        Returns:
+            int: Количество переданных напоминаний
+        """
+        now = time.time() if now is None else now
+        total = 0
+        while True:
+            batch = self.index.claim_due(now + self.window, self.batch_size, now=now, lease_until=now + self.lease)
+            if not batch:
+                break
+            dispatch(batch)
+            self.index.ack([reminder_id for reminder_id, _, _ in batch])
+            total += len(batch)
+            if len(batch) < self.batch_size:
+                break
+        return total
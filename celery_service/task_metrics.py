@@ -0,0 +1,273 @@
+"""
+Метрики задач воркера: ожидание в очереди, время выполнения, счетчики
+задач по имени и состоянию, опоздание доставки напоминаний.
+
+Процессы пула prefork не разделяют память, поэтому каждый процесс
+периодически сбрасывает свой снимок в METRICS_DIR/<hostname>.<pid>.json.
+Главный процесс воркера (при заданном порте) отдает сумму снимков
+в текстовом формате Prometheus по HTTP; файлы можно читать и напрямую.
+"""
+import copy
+import glob
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+LAG_BUCKETS = (0.1, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+# Заголовок сообщения со временем публикации (epoch), см. stamp_published_at
+PUBLISHED_AT_HEADER = 'published_at'
+
+
+def _escape(value) -> str:
+    """Экранирование значения метки по формату Prometheus, как в lesson.metrics"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name: str, documentation: str, labels: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._lock = threading.Lock()
+        self._values = {}
+        REGISTRY.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(label, '')) for label in self.labels)
+
+    def snapshot(self) -> list:
+        with self._lock:
+            return [[list(key), copy.deepcopy(value)] for key, value in self._values.items()]
+
+    def _format_labels(self, key: tuple, extra: dict = None) -> str:
+        pairs = list(zip(self.labels, key)) + list((extra or {}).items())
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    @staticmethod
+    def merge(total, value):
+        return (total or 0) + value
+
+    def render(self, values: dict) -> list[str]:
+        return [f'{self.name}{self._format_labels(key)} {value}' for key, value in values.items()]
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, *args, buckets: tuple = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [счетчики по корзинам, сумма, количество]
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    @staticmethod
+    def merge(total, value):
+        if total is None:
+            return value
+        return [[a + b for a, b in zip(total[0], value[0])], total[1] + value[1], total[2] + value[2]]
+
+    def render(self, values: dict) -> list[str]:
+        lines = []
+        for key, (counts, total, count) in values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{self._format_labels(key, {"le": bound})} {cumulative}')
+            lines.append(f'{self.name}_bucket{self._format_labels(key, {"le": "+Inf"})} {count}')
+            lines.append(f'{self.name}_sum{self._format_labels(key)} {total}')
+            lines.append(f'{self.name}_count{self._format_labels(key)} {count}')
+        return lines
+
+
+REGISTRY = []
+
+tasks_total = Counter(
+    'lesson_worker_tasks_total', 'Выполненные задачи по имени и итоговому состоянию', ('task', 'state'),
+)
+task_queue_wait = Histogram(
+    'lesson_worker_task_queue_wait_seconds',
+    'Ожидание задачи в очереди: от публикации (или ETA) до начала выполнения', ('task',),
+    buckets=LAG_BUCKETS,
+)
+task_runtime = Histogram(
+    'lesson_worker_task_runtime_seconds', 'Время выполнения задачи', ('task',),
+)
+reminder_lag = Histogram(
+    'lesson_worker_reminder_lag_seconds',
+    'Опоздание доставки напоминания относительно планового срока (start_time - 5 минут)', (),
+    buckets=LAG_BUCKETS,
+)
+reminders_total = Counter(
+    'lesson_worker_reminders_total', 'Напоминания по результату доставки', ('result',),
+)
+
+
+class TaskMetrics:
+    """
+    Обработчики сигналов Celery и сброс снимков метрик процесса.
+
+    Attributes:
+        directory (str): Каталог снимков процессов
+        flush_interval (float): Не чаще раза в столько секунд пишется снимок
+    """
+
+    def __init__(self, directory: str, flush_interval: float = 5.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._started = {}
+        self._flushed_at = 0.0
+        self.hostname = None
+
+    # --- Сигналы ---
+
+    @staticmethod
+    def stamp_published_at(headers=None, **kwargs):
+        """before_task_publish: время публикации для расчета ожидания в очереди"""
+        if headers is not None:
+            headers.setdefault(PUBLISHED_AT_HEADER, time.time())
+
+    def task_prerun(self, task_id=None, task=None, **kwargs):
+        now = time.time()
+        self._started[task_id] = time.perf_counter()
+        wait = queue_wait(task.request, now)
+        if wait is not None:
+            task_queue_wait.observe(wait, task=task.name)
+
+    def task_postrun(self, task_id=None, task=None, state=None, **kwargs):
+        started = self._started.pop(task_id, None)
+        if started is not None:
+            task_runtime.observe(time.perf_counter() - started, task=task.name)
+        tasks_total.inc(task=task.name, state=state or 'UNKNOWN')
+        if time.monotonic() - self._flushed_at >= self.flush_interval:
+            self.flush()
+
+    def worker_init(self, sender=None, **kwargs):
+        """Главный процесс: снимки прошлого запуска этого воркера больше не нужны"""
+        self.hostname = getattr(sender, 'hostname', None)
+        os.makedirs(self.directory, exist_ok=True)
+        for path in glob.glob(os.path.join(self.directory, f'{self._host()}.*.json')):
+            os.remove(path)
+
+    def worker_process_shutdown(self, **kwargs):
+        self.flush()
+
+    # --- Снимки ---
+
+    def _host(self) -> str:
+        return (self.hostname or os.environ.get('HOSTNAME') or 'worker').replace(os.sep, '_')
+
+    def flush(self):
+        """Атомарно записывает снимок метрик текущего процесса"""
+        self._flushed_at = time.monotonic()
+        snapshot = {metric.name: metric.snapshot() for metric in REGISTRY}
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f'{self._host()}.{os.getpid()}.json')
+            with open(path + '.tmp', 'w') as f:
+                json.dump(snapshot, f)
+            os.replace(path + '.tmp', path)
+        except OSError:
+            # Метрики не должны ронять задачи
+            pass
+
+    def render(self) -> str:
+        """Сумма снимков всех процессов в текстовом формате Prometheus"""
+        merged = {metric.name: {} for metric in REGISTRY}
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            try:
+                with open(path) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for metric in REGISTRY:
+                values = merged[metric.name]
+                for key, value in snapshot.get(metric.name, []):
+                    values[tuple(key)] = metric.merge(values.get(tuple(key)), value)
+
+        lines = []
+        for metric in REGISTRY:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            lines.extend(metric.render(merged[metric.name]))
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, port: int, host: str = '0.0.0.0') -> ThreadingHTTPServer:
+        """HTTP-эндпоинт GET /metrics в фоновом потоке"""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name='task-metrics', daemon=True).start()
+        return server
+
+
+def queue_wait(request, now: float):
+    """
+    Ожидание в очереди в секундах или None, если время публикации
+    неизвестно. Для задач с ETA отсчет идет от ETA: ожидание до срока
+    запланировано и задержкой не является.
+    """
+    published_at = getattr(request, PUBLISHED_AT_HEADER, None)
+    if published_at is None:
+        published_at = (getattr(request, 'headers', None) or {}).get(PUBLISHED_AT_HEADER)
+    if published_at is None:
+        return None
+    ready_at = float(published_at)
+    if request.eta:
+        eta = datetime.fromisoformat(request.eta) if isinstance(request.eta, str) else request.eta
+        ready_at = max(ready_at, eta.timestamp())
+    return max(0.0, now - ready_at)
+
+
+def observe_delivery(lateness: list[float], report: dict):
+    """Опоздания и результаты доставки пачки напоминаний (отчет _deliver_reminders)"""
+    for value in lateness:
+        reminder_lag.observe(max(0.0, value))
+    reminders_total.inc(report['sent'], result='sent')
+    reminders_total.inc(len(report['failed']), result='failed')
+    reminders_total.inc(report['skipped'], result='skipped')
+    reminders_total.inc(report['retried'], result='retried')
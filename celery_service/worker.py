@@ -1,29 +1,148 @@
-import logging.config
-import time
+import asyncio
+import logging
+import os
+from collections import defaultdict
 from datetime import datetime, timedelta
 
 import pytz
-from celery import Celery
-from logging_config import logging_config
+from celery import Celery, signals
+from kombu import Exchange, Queue
+from logging_config import SAMPLED, configure_logging, restart_listeners, stop_listeners
+from notifier import create_notifier, deliver_batch
+from reminder_scheduler import ReminderScheduler, create_reminder_index
+from task_metrics import TaskMetrics, observe_delivery
 
-logging.config.dictConfig(logging_config)
+configure_logging()
 
 task_logger = logging.getLogger('lesson_tasks')
 
 MOSCOW_TZ = pytz.timezone('Europe/Moscow')
 
+# Индекс будущих напоминаний: redis://... или memory:// для локального запуска
+REMINDER_INDEX_URL = os.environ.get('REMINDER_INDEX_URL', 'redis://redis:6379/2')
+# Период тика диспетчера и горизонт выборки (горизонт должен быть больше тика)
+REMINDER_TICK_SECONDS = float(os.environ.get('REMINDER_TICK_SECONDS', 30))
+REMINDER_WINDOW_SECONDS = float(os.environ.get('REMINDER_WINDOW_SECONDS', 60))
+REMINDER_BATCH_SIZE = int(os.environ.get('REMINDER_BATCH_SIZE', 500))
+# Через сколько секунд забранные, но не опубликованные напоминания возвращаются в очередь
+REMINDER_LEASE_SECONDS = float(os.environ.get('REMINDER_LEASE_SECONDS', 120))
+
+# Доставка: notifier 'log' или 'fake'; REMINDER_DELIVERY_DELAY - имитация задержки
+# внешнего сервиса в секундах для бенчмарков, по умолчанию без задержки
+REMINDER_NOTIFIER = os.environ.get('REMINDER_NOTIFIER', 'log')
+REMINDER_DELIVERY_DELAY = float(os.environ.get('REMINDER_DELIVERY_DELAY', 0))
+REMINDER_DELIVERY_CONCURRENCY = int(os.environ.get('REMINDER_DELIVERY_CONCURRENCY', 500))
+# Напоминания, срок которых попадает в один интервал, отправляются одной пачкой
+REMINDER_GROUP_SECONDS = float(os.environ.get('REMINDER_GROUP_SECONDS', 1))
+REMINDER_MAX_ATTEMPTS = int(os.environ.get('REMINDER_MAX_ATTEMPTS', 3))
+REMINDER_RETRY_DELAY = float(os.environ.get('REMINDER_RETRY_DELAY', 5))
+
+# Очереди: due - срочная доставка напоминаний и тик диспетчера, schedule -
+# планирование (в том числе пачки импорта). Воркеры каждой очереди
+# запускаются отдельно (celery -Q), поэтому всплеск планирования не
+# задерживает напоминания, срок которых уже наступил
+DUE_QUEUE = 'reminders.due'
+SCHEDULE_QUEUE = 'reminders.schedule'
+# Приоритеты Redis-транспорта: 0 - наивысший; одиночное планирование
+# обгоняет пачки импорта, первая попытка доставки - повторы
+PRIORITY_STEPS = list(range(10))
+TASK_ROUTES = {
+    'lesson.send_reminder_batch': {'queue': DUE_QUEUE, 'priority': 0},
+    'lesson.send_reminder': {'queue': DUE_QUEUE, 'priority': 0},
+    'lesson.dispatch_due_reminders': {'queue': DUE_QUEUE, 'priority': 0},
+    'lesson.schedule_reminder': {'queue': SCHEDULE_QUEUE, 'priority': 3},
+    'lesson.cancel_reminder': {'queue': SCHEDULE_QUEUE, 'priority': 3},
+    # Пачки импорта сжимаются: сотни уроков в одном сообщении
+    'lesson.schedule_reminders': {'queue': SCHEDULE_QUEUE, 'priority': 7, 'compression': 'zlib'},
+}
+REMINDER_RETRY_PRIORITY = 3
+# Сериализация сообщений, которые ставит сам воркер: json или msgpack
+TASK_SERIALIZER = os.environ.get('CELERY_TASK_SERIALIZER', 'json')
+# Результаты задач никто не читает, кроме отчетов доставки для отладки
+# (REMINDER_STORE_REPORTS=1); они живут в бэкенде не дольше RESULT_EXPIRES
+REMINDER_STORE_REPORTS = os.environ.get('REMINDER_STORE_REPORTS', '0') == '1'
+RESULT_EXPIRES = int(os.environ.get('CELERY_RESULT_EXPIRES', 3600))
+# Сообщений на процесс пула, забираемых заранее: 1 для due (срочная задача не
+# ждет за чужими в буфере процесса), больше для schedule (пропускная способность)
+CELERY_PREFETCH_MULTIPLIER = int(os.environ.get('CELERY_PREFETCH_MULTIPLIER', 1))
+
+# Метрики задач: снимки процессов пула в каталоге и (при ненулевом порте)
+# HTTP GET /metrics в формате Prometheus из главного процесса воркера
+METRICS_DIR = os.environ.get('CELERY_METRICS_DIR', '/var/log/celery/metrics')
+METRICS_PORT = int(os.environ.get('CELERY_METRICS_PORT', 0))
+METRICS_FLUSH_SECONDS = float(os.environ.get('CELERY_METRICS_FLUSH_SECONDS', 5))
+
+notifier = create_notifier(REMINDER_NOTIFIER, task_logger, REMINDER_DELIVERY_DELAY)
+
+reminder_scheduler = ReminderScheduler(
+    index=create_reminder_index(REMINDER_INDEX_URL),
+    window=REMINDER_WINDOW_SECONDS,
+    batch_size=REMINDER_BATCH_SIZE,
+    lease=REMINDER_LEASE_SECONDS,
+)
+
 app = Celery(
     'lesson_worker',
     broker='redis://redis:6379/0',
     backend='redis://redis:6379/1',
 )
 
+task_metrics = TaskMetrics(METRICS_DIR, flush_interval=METRICS_FLUSH_SECONDS)
+signals.before_task_publish.connect(task_metrics.stamp_published_at)
+signals.task_prerun.connect(task_metrics.task_prerun)
+signals.task_postrun.connect(task_metrics.task_postrun)
+signals.worker_init.connect(task_metrics.worker_init)
+signals.worker_process_shutdown.connect(task_metrics.worker_process_shutdown)
+
+
+@signals.worker_process_init.connect
+def restart_log_listeners(**kwargs):
+    restart_listeners()
+
+
+@signals.worker_process_shutdown.connect
+def stop_log_listeners(**kwargs):
+    # Дочерний процесс завершается через os._exit, atexit не сработает
+    stop_listeners()
+
+
+@signals.worker_ready.connect
+def serve_task_metrics(**kwargs):
+    if METRICS_PORT:
+        task_metrics.serve(METRICS_PORT)
+        task_logger.info("📈 Метрики задач: http://0.0.0.0:%s/metrics", METRICS_PORT)
+
+
 app.conf.update(
-    task_serializer='json',
-    accept_content=['json'],
+    task_serializer=TASK_SERIALIZER,
+    accept_content=['json', 'msgpack'],
     result_serializer='json',
+    task_ignore_result=True,
+    result_expires=RESULT_EXPIRES,
     timezone='Europe/Moscow',
     enable_utc=True,
+    # Как create_missing_queues у клиента в Django: обменник и ключ по имени очереди
+    task_queues=[
+        Queue(name, Exchange(name), routing_key=name)
+        # celery - сообщения, поставленные до разделения очередей
+        for name in (DUE_QUEUE, SCHEDULE_QUEUE, 'celery')
+    ],
+    task_default_queue=SCHEDULE_QUEUE,
+    task_routes=TASK_ROUTES,
+    broker_transport_options={
+        'priority_steps': PRIORITY_STEPS,
+        'sep': ':',
+        'queue_order_strategy': 'priority',
+    },
+    worker_prefetch_multiplier=CELERY_PREFETCH_MULTIPLIER,
+    beat_schedule={
+        'dispatch-due-reminders': {
+            'task': 'lesson.dispatch_due_reminders',
+            'schedule': REMINDER_TICK_SECONDS,
+            # Тик, не взятый до следующего, устарел: следующий заберет те же напоминания
+            'options': {'expires': REMINDER_TICK_SECONDS},
+        },
+    },
 )
 
 
@@ -33,9 +152,143 @@ def schedule_lesson_reminder(self, lesson_data):
     Планирует напоминание за 5 минут до урока.
     Если до урока <5 минут — уведомление сразу.
     """
+    reminder_id, due_ts, payload, dispatch_now = _plan_reminder(lesson_data, self.request.id)
+
+    if dispatch_now:
+        _dispatch_now(reminder_id, due_ts, payload)
+    else:
+        # Отложенное уведомление за 5 минут: кладем в индекс, его заберет диспетчер
+        reminder_scheduler.schedule(reminder_id, due_ts, payload)
+
+
+@app.task(bind=True, name='lesson.schedule_reminders')
+def schedule_lesson_reminders(self, lessons):
+    """
+    Пакетный вариант lesson.schedule_reminder для импорта уроков.
+
+    Отложенные напоминания добавляются в индекс одним запросом, ближайшие
+    группируются по сроку и уходят пачками lesson.send_reminder_batch.
+    """
     task_id = self.request.id
+    later = []
+    due_now = defaultdict(list)
+    for lesson_data in lessons:
+        reminder_id, due_ts, payload, dispatch_now = _plan_reminder(lesson_data, task_id)
+        if dispatch_now:
+            reminder_scheduler.cancel(reminder_id)
+            reminder_scheduler.index.mark_current(reminder_id, payload['start_time'])
+            due_now[int(due_ts // REMINDER_GROUP_SECONDS)].append(_reminder(reminder_id, due_ts, payload))
+        else:
+            later.append((reminder_id, due_ts, payload))
+
+    reminder_scheduler.schedule_many(later)
+    for reminders in due_now.values():
+        _dispatch_batch(reminders)
+
+    dispatched = sum(len(reminders) for reminders in due_now.values())
+    task_logger.info("📥 Пачка уроков: %s напоминаний в индексе, %s на отправку", len(later), dispatched)
+    return {'scheduled': len(later), 'dispatched': dispatched}
+
+
+@app.task(bind=True, name='lesson.cancel_reminder')
+def cancel_lesson_reminder(self, lesson_id):
+    """Отменяет напоминание об уроке (урок отменен или удален)"""
+    reminder_scheduler.cancel(str(lesson_id))
+    task_logger.info("🗑 Напоминание для урока %s отменено", lesson_id, extra={'lesson_id': lesson_id})
+
+
+@app.task(bind=True, name='lesson.dispatch_due_reminders')
+def dispatch_due_reminders(self):
+    """
+    Периодический тик планировщика (celery beat).
+
+    Забирает из индекса напоминания со сроком в ближайшие
+    REMINDER_WINDOW_SECONDS, группирует их по моменту отправки
+    (с точностью REMINDER_GROUP_SECONDS) и ставит каждую группу
+    одной задачей lesson.send_reminder_batch.
+    """
+    def dispatch(batch):
+        groups = defaultdict(list)
+        for reminder_id, due_ts, payload in batch:
+            groups[int(due_ts // REMINDER_GROUP_SECONDS)].append(
+                _reminder(reminder_id, due_ts, payload)
+            )
+        for reminders in groups.values():
+            _dispatch_batch(reminders)
+
+    dispatched = reminder_scheduler.dispatch_due(dispatch)
+    if dispatched:
+        task_logger.info("📤 Передано на отправку напоминаний: %s", dispatched)
+    return {'dispatched': dispatched}
+
+
+@app.task(bind=True, name='lesson.send_reminder_batch', ignore_result=not REMINDER_STORE_REPORTS)
+def send_reminder_batch(self, reminders):
+    """
+    Доставляет пачку напоминаний с одним сроком.
+
+    Напоминания отправляются конкурентно через notifier (не больше
+    REMINDER_DELIVERY_CONCURRENCY одновременно), отмененные и перенесенные
+    после постановки пачки пропускаются. Неудачные отправки повторяются
+    отдельной пачкой до REMINDER_MAX_ATTEMPTS раз.
+    """
+    return _deliver_reminders(reminders, self.request.id)
+
+
+def _deliver_reminders(reminders, task_id):
+    current = reminder_scheduler.index.filter_current(reminders)
+    for reminder in current:
+        reminder['task_id'] = task_id
+
+    report = asyncio.run(deliver_batch(current, notifier, REMINDER_DELIVERY_CONCURRENCY))
+    lateness = report.pop('lateness')
+
+    failed_ids = {reminder_id for reminder_id, _ in report['failed']}
+    retry = [
+        dict(reminder, attempt=reminder.get('attempt', 1) + 1)
+        for reminder in current
+        if reminder['reminder_id'] in failed_ids and reminder.get('attempt', 1) < REMINDER_MAX_ATTEMPTS
+    ]
+    # Отметка актуальности снимается и у доставленных, и у исчерпавших попытки
+    retry_ids = {reminder['reminder_id'] for reminder in retry}
+    reminder_scheduler.index.complete_many(
+        [reminder for reminder in current if reminder['reminder_id'] not in retry_ids]
+    )
+    if retry:
+        send_reminder_batch.apply_async(
+            args=[retry], countdown=REMINDER_RETRY_DELAY, priority=REMINDER_RETRY_PRIORITY
+        )
+
+    task_logger.info(
+        "📦 Пачка напоминаний: отправлено %s/%s, пропущено %s, ошибок %s, повтор %s, "
+        "%s/с за %sс, опоздание avg %sс max %sс",
+        report['sent'], report['size'], len(reminders) - len(current), len(report['failed']), len(retry),
+        report['throughput'], report['duration'], report['lateness_avg'], report['lateness_max'],
+    )
+    report['skipped'] = len(reminders) - len(current)
+    report['retried'] = len(retry)
+    observe_delivery(lateness, report)
+    return report
+
+
+def _plan_reminder(lesson_data, task_id):
+    """
+    Рассчитывает напоминание за 5 минут до урока.
+
+    Returns:
+        tuple: (reminder_id, due_ts, payload, dispatch_now) - dispatch_now
+            True, если срок ближе горизонта тика и напоминание нужно
+            отправить, не дожидаясь диспетчера
+    """
     lesson_title = lesson_data.get('title')
-    start_time = lesson_data.get("start_time")
+    if lesson_data.get('start_ts') is not None:
+        # Компактный формат: начало урока в секундах epoch
+        start_time = datetime.fromtimestamp(lesson_data['start_ts'], MOSCOW_TZ)
+    else:
+        # Сообщения, поставленные до перехода на start_ts: строка ISO 8601
+        start_time = lesson_data.get("start_time")
+        if isinstance(start_time, str):
+            start_time = datetime.fromisoformat(start_time)
 
     # Приводим к aware datetime в московской TZ
     if start_time.tzinfo is None:
@@ -44,51 +297,75 @@ def schedule_lesson_reminder(self, lesson_data):
     current_time = datetime.now(MOSCOW_TZ)
 
     # Логирование факта добавления в урок
-    task_logger.info(f"[{task_id}] 📅 Вы добавлены в урок '{lesson_title}'. Время начала: {start_time.strftime('%Y-%m-%d %H:%M')}")
+    # Подробности планирования - самые массовые сообщения, их можно прореживать (LOG_INFO_SAMPLE_RATE)
+    log_extra = dict(SAMPLED, task_id=task_id, lesson_id=lesson_data['id'])
+    task_logger.info("📅 Вы добавлены в урок '%s'. Время начала: %s", lesson_title, start_time, extra=log_extra)
 
     # Вычисляем время для напоминания за 5 минут
     reminder_time = start_time - timedelta(minutes=5)
     seconds_to_wait = (reminder_time - current_time).total_seconds()
 
-    task_logger.info(f"[{task_id}] ⏰ Напоминание должно прийти: {reminder_time.strftime('%Y-%m-%d %H:%M:%S')}")
+    task_logger.info("⏰ Напоминание должно прийти: %s", reminder_time, extra=log_extra)
 
-    if seconds_to_wait > 0:
-        # Отложенное уведомление за 5 минут
-        task_logger.info(f"[{task_id}] ⏰ Планируем напоминание за 5 минут")
-        send_lesson_reminder.apply_async(
-            args=[lesson_title, start_time.isoformat(), True],
-            countdown=seconds_to_wait
-        )
-    else:
+    reminder_id = str(lesson_data['id'])
+    payload = {
+        'title': lesson_title,
+        'start_time': start_time.isoformat(),
+        'is_early_notice': seconds_to_wait > 0,
+    }
+
+    if seconds_to_wait <= 0:
         # До урока меньше 5 минут — уведомление сразу
-        task_logger.info(f"[{task_id}] ⏰ Урок начнется менее чем через 5 минут, уведомление отправляем сразу")
-        send_lesson_reminder.apply_async(
-            args=[lesson_title, start_time.isoformat(), False],
-            countdown=1
-        )
+        task_logger.info("⏰ Урок начнется менее чем через 5 минут, уведомление отправляем сразу", extra=log_extra)
+        return reminder_id, (current_time + timedelta(seconds=1)).timestamp(), payload, True
 
+    task_logger.info("⏰ Планируем напоминание за 5 минут", extra=log_extra)
+    # Срок ближе горизонта тика — отправляем напрямую, не дожидаясь диспетчера
+    dispatch_now = reminder_scheduler.is_due_soon(reminder_time.timestamp())
+    return reminder_id, reminder_time.timestamp(), payload, dispatch_now
 
-@app.task(bind=True, name='lesson.send_reminder')
-def send_lesson_reminder(self, lesson_title, start_time_iso, is_early_notice=True):
-    """
-    Логирует уведомление о уроке.
-    is_early_notice=True — уведомление за 5 минут до урока
-    is_early_notice=False — уведомление сразу, урок начнется скоро
-    """
-    task_id = self.request.id
-    start_time = datetime.fromisoformat(start_time_iso)
-    if start_time.tzinfo is None:
-        start_time = MOSCOW_TZ.localize(start_time)
 
-    if is_early_notice:
-        message = f"🚨 Напоминание: через 5 минут начнется урок '{lesson_title}'. Время начала: {start_time.strftime('%Y-%m-%d %H:%M')}"
-    else:
-        message = f"🚨 Урок '{lesson_title}' начнется менее чем через 5 минут. Время начала: {start_time.strftime('%Y-%m-%d %H:%M')}"
+def _reminder(reminder_id, due_ts, payload):
+    """Напоминание в формате задачи lesson.send_reminder_batch"""
+    return {
+        'reminder_id': reminder_id,
+        'due_ts': due_ts,
+        'title': payload['title'],
+        'start_time': payload['start_time'],
+        'is_early_notice': payload['is_early_notice'],
+    }
 
-    task_logger.info(f"[{task_id}] {message}")
 
-    # Симуляция отправки уведомления
-    time.sleep(1)
+def _dispatch_now(reminder_id, due_ts, payload):
+    """Отправка в обход индекса, когда срок ближе горизонта тика"""
+    # Заменяет запись в индексе, если урок перенесли ближе
+    reminder_scheduler.cancel(reminder_id)
+    reminder_scheduler.index.mark_current(reminder_id, payload['start_time'])
+    _dispatch_batch([_reminder(reminder_id, due_ts, payload)])
 
-    return {'status': 'sent'}
 
+def _dispatch_batch(reminders):
+    """Ставит пачку на отправку с ETA не дальше горизонта тика"""
+    send_reminder_batch.apply_async(
+        args=[reminders],
+        eta=datetime.fromtimestamp(min(r['due_ts'] for r in reminders), MOSCOW_TZ)
+    )
+
+
+@app.task(bind=True, name='lesson.send_reminder', ignore_result=not REMINDER_STORE_REPORTS)
+def send_lesson_reminder(self, lesson_title, start_time_iso, is_early_notice=True, reminder_id=None):
+    """
+    Логирует уведомление о уроке.
+    is_early_notice=True — уведомление за 5 минут до урока
+    is_early_notice=False — уведомление сразу, урок начнется скоро
+
+    Оставлена для сообщений, поставленных до перехода на
+    lesson.send_reminder_batch; доставляет через тот же notifier.
+    """
+    reminder = {
+        'reminder_id': reminder_id,
+        'title': lesson_title,
+        'start_time': start_time_iso,
+        'is_early_notice': is_early_notice,
+    }
+    return _deliver_reminders([reminder], self.request.id)
@@ -1,13 +1,16 @@
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin import ShowFacets
 
-from .models import Lesson
+from .changelist import EstimatedCountPaginator, KeysetChangeList, StartDateFilter, StatusFacetFilter
+from .models import Lesson, LessonArchive, LessonSeries, LessonSeriesException
+from .search import get_backend
 
 
-@admin.register(Lesson)
 class LessonAdmin(admin.ModelAdmin):
     list_display = ('title', 'status', 'start_time', 'end_time', 'created_at')
     list_filter = ('status', 'start_time')
-    search_fields = ('title',)
+    search_fields = ('title', 'description')
     date_hierarchy = 'start_time'
     ordering = ('-start_time',)
 
@@ -22,3 +25,83 @@ class LessonAdmin(admin.ModelAdmin):
             'fields': ('status', 'completed_at')
         }),
     )
+
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск через lesson.search: на SQLite - индекс FTS5 вместо LIKE '%...%'"""
+        if not search_term:
+            return queryset, False
+        return get_backend().filter(queryset, search_term), False
+
+
+class ScalableLessonAdmin(LessonAdmin):
+    """
+    Список уроков для больших таблиц, см. lesson.changelist: без COUNT(*)
+    по таблице, DISTINCT по датам и OFFSET. Сортировка только по времени
+    начала - по ней идут страницы.
+    """
+
+    list_filter = (StatusFacetFilter, StartDateFilter)
+    date_hierarchy = None
+    ordering = ('-start_time', '-id')
+    sortable_by = ()
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    show_facets = ShowFacets.NEVER
+    list_max_show_all = 0
+    change_list_template = 'admin/lesson/lesson/change_list_keyset.html'
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+
+admin.site.register(Lesson, ScalableLessonAdmin if settings.LESSON_ADMIN['MODE'] == 'scalable' else LessonAdmin)
+
+
+@admin.register(LessonArchive)
+class LessonArchiveAdmin(admin.ModelAdmin):
+    """Архив только для просмотра: уроки переносит manage.py archive_lessons"""
+
+    list_display = ('title', 'status', 'start_time', 'end_time', 'archived_at')
+    list_filter = ('status',)
+    search_fields = ('title', 'description')
+    ordering = ('-start_time',)
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск через lesson.search: на SQLite - индекс FTS5 архива (lesson_archive_search)"""
+        if not search_term:
+            return queryset, False
+        return get_backend().filter(queryset, search_term), False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+class LessonSeriesExceptionInline(admin.TabularInline):
+    model = LessonSeriesException
+    extra = 0
+    fields = ('occurrence_start', 'start_time')
+
+
+@admin.register(LessonSeries)
+class LessonSeriesAdmin(admin.ModelAdmin):
+    list_display = ('title', 'frequency', 'interval', 'weekdays', 'start_time', 'until', 'status')
+    list_filter = ('status', 'frequency')
+    search_fields = ('title',)
+    ordering = ('-start_time',)
+    inlines = (LessonSeriesExceptionInline,)
+
+    fieldsets = (
+        ('Основная информация', {
+            'fields': ('title', 'description')
+        }),
+        ('Расписание', {
+            'fields': ('start_time', 'duration', 'frequency', 'interval', 'weekdays', 'until')
+        }),
+        ('Статус', {
+            'fields': ('status',)
+        }),
+    )
@@ -1,5 +1,18 @@
+import logging
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.utils import timezone
 from lesson.domain import LessonDomain
-from lesson.forms import LessonCreateForm
+from lesson.forms import LessonCreateForm, LessonImportForm
+from lesson.importer import decode_lines, parse_rows
+from lesson.intervals import PendingIntervals
+from lesson.models import Lesson
+from ws_app.groups import client_groups
+
+logger = logging.getLogger(__name__)
 
 
 class LessonApplication:
@@ -29,23 +42,188 @@ class LessonApplication:
         # 1 Получение данных из формы
         form = LessonCreateForm(request.POST)
 
-        # 2 Валидация формы
-        self.lesson_domain.check_form(form)
+        # 2 Валидация формы: ответ 400 с ошибками возвращается представлению
+        error_response = self.lesson_domain.check_form(form)
+        if error_response is not None:
+            return error_response
 
-        # 3 Создание объекта Lesson
-        # Возврат объекта в виде словаря
-        lesson = self.lesson_domain.create_lesson(data=form.cleaned_data)
+        # 3-4 Создание урока и постановка задачи в Celery одной транзакцией:
+        # задача пишется в outbox и уходит в брокер вне HTTP-запроса
+        lesson = self._create_lesson_with_task(form.cleaned_data)
 
-        # 4 Постановка задачи в Celery
-        self.lesson_domain.add_new_task(lesson)
+        # 5. Отправка сообщения на клиент, поставивший задачу
+        self.lesson_domain.send_websocket_message(
+            self._created_message(lesson),
+            groups=client_groups(request.user, request.session.session_key)
+        )
 
-        # 5. Отправка сообщения на клиент
-        message = f"Это сообщение по WebSocket получил пользователь который поставил задачу. <br>В Celery уже отправлена задача: <br>Оповестить учеников о том, что у них будет урок - {lesson['title']} <br>Начнется {lesson['start_time'].date()} в {lesson['start_time'].time().strftime("%H:%M")} <br>Также добавлена задача в Celery: <br>Которая предупредит учеников за 5 минут до начала урока <br>Если урок создался менее чем за 5 минут до начала <br>Уведомление придет сразу <br>Посмотреть можно в logs/celery/celery_tasks.log"
+        return "Валидация прошла"
+
+    async def alesson_add(self, request):
+        """
+        Асинхронный вариант lesson_add для работы под Daphne/ASGI.
 
-        self.lesson_domain.send_websocket_message(message)
+        Не занимает поток на все время запроса: в поток уходят только
+        валидация формы и запись в БД, сообщение в WebSocket отправляется
+        напрямую через channel layer, публикация в брокер (режим direct) -
+        через ограниченный пул publish_executor.
+        """
+
+        # 1 Получение данных из формы
+        form = LessonCreateForm(request.POST)
+
+        # 2 Валидация формы
+        error_response = await self.lesson_domain.acheck_form(form)
+        if error_response is not None:
+            return error_response
+
+        # 3-4 Создание урока и постановка задачи в Celery
+        if settings.LESSON_TASK_PUBLISHING == 'outbox':
+            # Урок и outbox пишутся одной транзакцией, а транзакции
+            # в асинхронном ORM не поддерживаются
+            lesson = await sync_to_async(self._create_lesson_with_task)(form.cleaned_data)
+        else:
+            lesson = await self.lesson_domain.acreate_lesson(data=form.cleaned_data)
+            await self.lesson_domain.apublish_task('lesson.schedule_reminder', [lesson])
+
+        # 5. Отправка сообщения на клиент, поставивший задачу
+        await self.lesson_domain.asend_websocket_message(
+            self._created_message(lesson),
+            groups=client_groups(await request.auser(), request.session.session_key)
+        )
 
         return "Валидация прошла"
 
+    def lesson_import(self, request, fmt: str) -> dict:
+        """
+        Массовый импорт уроков из CSV/NDJSON.
+
+        Строки проверяются правилами LessonCreateForm, корректные уроки
+        создаются пачками по LESSON_IMPORT['CHUNK_SIZE'] - один INSERT и одна
+        задача lesson.schedule_reminders на пачку. Ошибочные строки попадают
+        в отчет и не прерывают импорт. Клиент получает одно итоговое
+        уведомление по WebSocket.
+
+        Returns:
+            dict: Отчет: created, failed, errors (номер строки и ошибки)
+        """
+        options = settings.LESSON_IMPORT
+        report = {'created': 0, 'failed': 0, 'errors': [], 'truncated': False}
+        chunk = []
+        # Уроки пачки попадут в индекс интервалов только после ее коммита
+        pending = PendingIntervals()
+
+        for line, data, errors in parse_rows(decode_lines(request), fmt):
+            if report['created'] + report['failed'] + len(chunk) >= options['MAX_ROWS']:
+                report['truncated'] = True
+                break
+
+            if errors is None:
+                try:
+                    form = LessonImportForm(data, pending_intervals=pending)
+                    if form.is_valid():
+                        lesson = Lesson(**form.cleaned_data)
+                        lesson.apply_defaults()
+                        chunk.append((line, lesson))
+                        if lesson.status != 'cancelled':
+                            pending.add(lesson.start_time, lesson.end_time)
+                    else:
+                        errors = {field: list(messages) for field, messages in form.errors.items()}
+                except Exception as e:
+                    # Сбой проверки одной строки - ошибка этой строки, а не всего импорта
+                    logger.exception("Не удалось проверить строку %s импорта", line)
+                    errors = {'__all__': [f"Не удалось проверить строку: {e}"]}
+            if errors is not None:
+                self._import_error(report, line, errors)
+
+            if len(chunk) >= options['CHUNK_SIZE']:
+                self._import_chunk(chunk, report)
+                chunk = []
+                pending.clear()
+
+        if chunk:
+            self._import_chunk(chunk, report)
+
+        # 5. Одно итоговое сообщение вместо уведомления на каждый урок
+        self.lesson_domain.send_websocket_message(
+            self._imported_message(report),
+            groups=client_groups(request.user, request.session.session_key)
+        )
+        return report
+
+    def _import_chunk(self, chunk: list, report: dict):
+        """Создает пачку уроков и ставит их напоминания в одной транзакции"""
+        try:
+            with transaction.atomic():
+                created = self.lesson_domain.bulk_create_lessons([lesson for _, lesson in chunk])
+                lessons_data = [
+                    self.lesson_domain.lesson_payload(lesson)
+                    for lesson in created if lesson.status == 'scheduled'
+                ]
+                if lessons_data:
+                    self.lesson_domain.add_new_tasks(lessons_data)
+        except DatabaseError as e:
+            for line, _ in chunk:
+                self._import_error(report, line, {'__all__': [f"Ошибка записи в БД: {e}"]})
+            return
+        report['created'] += len(created)
+
+    @staticmethod
+    def _import_error(report: dict, line: int, errors: dict):
+        report['failed'] += 1
+        if len(report['errors']) < settings.LESSON_IMPORT['MAX_ERRORS']:
+            report['errors'].append({'line': line, 'errors': errors})
+
+    @staticmethod
+    def _imported_message(report: dict) -> str:
+        return f"Импорт уроков завершен <br>Создано уроков: {report['created']} <br>Строк с ошибками: {report['failed']}"
+
+    def advance_statuses(self, batch_size: int = 1000) -> dict:
+        """
+        Перевод статусов уроков по времени (периодическая задача,
+        manage.py advance_lesson_statuses).
+
+        Подключенные клиенты получают одно сводное уведомление за запуск,
+        а не по сообщению на каждый урок; подписчики ленты - дельты.
+        """
+        result = self.lesson_domain.advance_statuses(batch_size=batch_size)
+        if result['started'] or result['completed']:
+            self.lesson_domain.send_websocket_message(self._statuses_message(result))
+        return result
+
+    @staticmethod
+    def _statuses_message(result: dict) -> str:
+        return f"Статусы уроков обновлены <br>Начались: {result['started']} <br>Завершились: {result['completed']}"
+
+    def archive_lessons(self, retention_days: int = None, batch_size: int = None) -> dict:
+        """
+        Перенос старых завершенных и отмененных уроков в архив
+        (периодическая задача, manage.py archive_lessons)
+        """
+        return self.lesson_domain.archive_lessons(retention_days=retention_days, batch_size=batch_size)
+
+    def plan_series_reminders(self) -> dict:
+        """
+        Планирование напоминаний занятий повторяющихся уроков на скользящий
+        горизонт (периодическая задача, manage.py plan_series_reminders)
+        """
+        return self.lesson_domain.plan_series_reminders()
+
+    def _create_lesson_with_task(self, data: dict) -> dict:
+        """Создает урок и ставит задачу напоминания в одной транзакции"""
+        with transaction.atomic():
+            # Возврат объекта в виде словаря
+            lesson = self.lesson_domain.create_lesson(data=data)
+
+            self.lesson_domain.add_new_task(lesson)
+
+        return lesson
+
+    @staticmethod
+    def _created_message(lesson: dict) -> str:
+        start_time = datetime.fromtimestamp(lesson['start_ts'], timezone.get_current_timezone())
+        return f"Это сообщение по WebSocket получил пользователь который поставил задачу. <br>В Celery уже отправлена задача: <br>Оповестить учеников о том, что у них будет урок - {lesson['title']} <br>Начнется {start_time.date()} в {start_time.strftime("%H:%M")} <br>Также добавлена задача в Celery: <br>Которая предупредит учеников за 5 минут до начала урока <br>Если урок создался менее чем за 5 минут до начала <br>Уведомление придет сразу <br>Посмотреть можно в logs/celery/celery_tasks.log"
+
 
 lesson_domain_instance = LessonDomain()
 lesson_app = LessonApplication(lesson_domain_instance)
@@ -0,0 +1,189 @@
+"""
+Общие инструменты бенчмарков: временная SQLite-база, ASGI-клиент
+внутри процесса, генератор нагрузки и расчет перцентилей.
+"""
+import asyncio
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+
+from django.core.management import call_command
+from django.db import connections
+
+CSRF_TOKEN = 'b' * 32
+
+
+@contextmanager
+def temporary_database():
+    """
+    Переключает соединение default на временную SQLite-базу с миграциями,
+    чтобы бенчмарк не писал в рабочую базу.
+    """
+    connection = connections['default']
+    connection.close()
+    original = dict(connection.settings_dict)
+
+    fd, path = tempfile.mkstemp(prefix='lesson_bench_', suffix='.sqlite3')
+    os.close(fd)
+    connection.settings_dict.update({
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': path,
+    })
+    try:
+        call_command('migrate', verbosity=0)
+        yield path
+    finally:
+        connection.close()
+        connection.settings_dict.clear()
+        connection.settings_dict.update(original)
+        os.remove(path)
+
+
+def seed_lessons(count: int, batch_size: int = 1000):
+    """
+    Заполняет базу уроками для бенчмарка выдачи: по одному уроку
+    в 10 минут начиная с завтрашнего дня.
+
+    bulk_create не вызывает save() и сигналы, поэтому умолчания
+    проставляет Lesson.apply_defaults, а журнал ленты и outbox не заполняются.
+    """
+    from lesson.intervals import lesson_intervals
+    from lesson.models import Lesson
+
+    start = datetime.now().replace(second=0, microsecond=0) + timedelta(days=1)
+    lessons = []
+    for i in range(count):
+        lesson = Lesson(
+            title=f'Бенчмарк {i}',
+            description='Урок создан бенчмарком',
+            start_time=start + timedelta(minutes=10 * i),
+        )
+        lesson.apply_defaults()
+        lessons.append(lesson)
+    Lesson.objects.bulk_create(lessons, batch_size=batch_size)
+    lesson_intervals.invalidate()
+
+
+def lesson_form_data(i: int, start: datetime) -> dict:
+    """
+    Данные формы урока для POST /lesson_add/: по уроку в час,
+    чтобы форма не отклоняла их как пересекающиеся.
+    """
+    return {
+        'title': f'Бенчмарк {i}',
+        'description': 'Урок создан бенчмарком',
+        'start_time': (start + timedelta(hours=i)).strftime('%Y-%m-%d %H:%M'),
+        'status': 'scheduled',
+    }
+
+
+async def asgi_request(app, method: str, path: str, data: dict = None) -> tuple[int, bytes]:
+    """
+    Выполняет HTTP-запрос к ASGI-приложению без сети.
+
+    Returns:
+        tuple: (HTTP-статус, тело ответа)
+    """
+    path, _, query_string = path.partition('?')
+    body = urlencode(data).encode() if data else b''
+    headers = [
+        (b'host', b'localhost'),
+        (b'content-type', b'application/x-www-form-urlencoded'),
+        (b'content-length', str(len(body)).encode()),
+        (b'cookie', f'csrftoken={CSRF_TOKEN}'.encode()),
+        (b'x-csrftoken', CSRF_TOKEN.encode()),
+    ]
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': query_string.encode(),
+        'root_path': '',
+        'headers': headers,
+        'client': ('127.0.0.1', 40000),
+        'server': ('localhost', 80),
+    }
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    disconnected = asyncio.Event()
+    status = None
+    chunks = []
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        await disconnected.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+        elif message['type'] == 'http.response.body':
+            chunks.append(message.get('body', b''))
+
+    await app(scope, receive, send)
+    disconnected.set()
+    return status, b''.join(chunks)
+
+
+async def run_load(request, total: int, concurrency: int) -> dict:
+    """
+    Выполняет total вызовов корутины request(i) не более чем
+    concurrency одновременно.
+
+    request должна вернуть True при успешном ответе.
+    """
+    latencies = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            started = time.perf_counter()
+            ok = await request(i)
+            latencies.append(time.perf_counter() - started)
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - started, errors)
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    """Перцентиль q (0..100) по методу ближайшего ранга"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(q / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies: list, duration: float, errors: int = 0) -> dict:
+    """Пропускная способность и перцентили задержки в миллисекундах"""
+    values = sorted(latencies)
+    return {
+        'count': len(values),
+        'errors': errors,
+        'duration_s': round(duration, 4),
+        'throughput_rps': round(len(values) / duration, 2) if duration else 0.0,
+        'p50_ms': round(percentile(values, 50) * 1000, 3),
+        'p95_ms': round(percentile(values, 95) * 1000, 3),
+        'p99_ms': round(percentile(values, 99) * 1000, 3),
+        'max_ms': round(values[-1] * 1000, 3) if values else 0.0,
+    }
+
+
+def format_result(name: str, result: dict) -> str:
+    return (
+        f"{name:<24} n={result['count']:<7} err={result['errors']:<4} "
+        f"{result['throughput_rps']:>10} rps  p50={result['p50_ms']}ms "
+        f"p95={result['p95_ms']}ms p99={result['p99_ms']}ms"
+    )
@@ -0,0 +1,165 @@
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Потокобезопасный LRU-кэш в памяти процесса с ограничением времени жизни.
+
+    Attributes:
+        max_entries (int): Максимальное число записей, при превышении
+            вытесняется давно не использованная запись
+        ttl (float): Время жизни записи в секундах
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                return default
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class LessonListCache:
+    """
+    Read-through кэш для страниц GET /lessons/.
+
+    Хранит уже сериализованное JSON-тело ответа. Уровни:
+        1. LRU в памяти процесса;
+        2. (опционально) общий бэкенд из settings.CACHES, например Redis
+           в проде или LocMemCache как локальная замена.
+
+    Инвалидация через версию: версия входит в ключ, при любой записи
+    урока (сигналы post_save / post_delete) версия увеличивается и старые
+    записи перестают находиться. При общем бэкенде версия хранится в нем,
+    поэтому изменения видны всем процессам; без него - только текущему,
+    остальные процессы увидят изменения по истечении TTL.
+    """
+
+    version_key = 'lesson_list:version'
+
+    def __init__(self, max_entries: int, ttl: float, shared_alias: str = None):
+        self.local = LRUCache(max_entries=max_entries, ttl=ttl)
+        self.ttl = ttl
+        self.shared_alias = shared_alias
+        self._version = 1
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias] if self.shared_alias else None
+
+    def version(self) -> int:
+        if self.shared is None:
+            return self._version
+        # Без timeout, чтобы версия не «откатилась» при истечении ключа
+        return self.shared.get_or_set(self.version_key, 1, timeout=None)
+
+    def invalidate(self):
+        """Сбрасывает все закэшированные страницы (увеличивает версию)"""
+        with self._lock:
+            self.invalidations += 1
+            self._version += 1
+        if self.shared is not None:
+            try:
+                self.shared.incr(self.version_key)
+            except ValueError:
+                self.shared.add(self.version_key, 2, timeout=None)
+        self.local.clear()
+
+    def make_key(self, params: dict) -> str:
+        return f"lesson_list:v{self.version()}:{urlencode(sorted(params.items()))}"
+
+    def get_or_build(self, params: dict, builder) -> tuple[bytes, bool]:
+        """
+        Возвращает тело ответа для набора параметров выдачи.
+
+        Args:
+            params: Нормализованные параметры выдачи (режим, страница,
+                курсор, размер страницы, фильтры)
+            builder: Функция без аргументов, строящая тело ответа при промахе
+
+        Returns:
+            tuple: (тело ответа, True если значение взято из кэша)
+        """
+        key = self.make_key(params)
+
+        content = self.local.get(key)
+        if content is not None:
+            self._count('hits')
+            return content, True
+
+        if self.shared is not None:
+            content = self.shared.get(key)
+            if content is not None:
+                self._count('shared_hits')
+                self.local.set(key, content)
+                return content, True
+
+        self._count('misses')
+        content = builder()
+        self.local.set(key, content)
+        if self.shared is not None:
+            self.shared.set(key, content, timeout=self.ttl)
+        return content, False
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.shared_hits + self.misses
+        return {
+            'hits': self.hits,
+            'shared_hits': self.shared_hits,
+            'misses': self.misses,
+            'hit_ratio': round((self.hits + self.shared_hits) / lookups, 4) if lookups else None,
+            'invalidations': self.invalidations,
+            'entries': len(self.local),
+            'max_entries': self.local.max_entries,
+            'ttl': self.ttl,
+            'shared_backend': self.shared_alias,
+        }
+
+    def _count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+
+lesson_list_cache = LessonListCache(
+    max_entries=settings.LESSON_LIST_CACHE['MAX_ENTRIES'],
+    ttl=settings.LESSON_LIST_CACHE['TTL'],
+    shared_alias=settings.LESSON_LIST_CACHE['SHARED_BACKEND'],
+)
@@ -0,0 +1,261 @@
+"""
+Список уроков в админке для больших таблиц (LESSON_ADMIN['MODE'] = 'scalable').
+
+Стандартный список на каждое открытие считает COUNT(*) по таблице
+(пагинатор и полный счетчик), DISTINCT по датам (date_hierarchy)
+и уходит в OFFSET на дальних страницах. Здесь:
+    EstimatedCountPaginator - число уроков без фильтров берется из фасетов
+        или оценки СУБД, с фильтрами - COUNT не дальше EXACT_COUNT_LIMIT;
+    LessonFacets - счетчики по статусам и дням одним запросом в фоновом
+        потоке, в кэше на FACETS_TTL секунд;
+    KeysetChangeList - страницы по ключу (start_time, id), как в GET /lessons/.
+"""
+import logging
+import threading
+import time
+from datetime import date, datetime
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ChangeList
+from django.core.cache import caches
+from django.core.paginator import Paginator
+from django.db import connection, connections
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils.functional import cached_property
+from lesson.models import Lesson
+from lesson.pagination import InvalidCursor, KeysetPaginator
+
+logger = logging.getLogger(__name__)
+
+CURSOR_VAR = 'cursor'
+
+
+class LessonFacets:
+    """
+    Счетчики уроков для фильтров админки: по статусам и по дням начала
+    (месяцы и годы суммируются из дней).
+
+    Устаревшие счетчики отдаются как есть, пересчет запускается в фоновом
+    потоке - открытие списка не ждет GROUP BY по всей таблице. Пересчет
+    в нескольких процессах одновременно не запускается (блокировка в кэше).
+    """
+
+    cache_key = 'lesson_admin:facets'
+    lock_key = 'lesson_admin:facets:refreshing'
+
+    def __init__(self, alias: str, ttl: float):
+        self.alias = alias
+        self.ttl = ttl
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def get(self) -> dict | None:
+        """Счетчики из кэша или None, если они еще не посчитаны"""
+        facets = self.cache.get(self.cache_key)
+        if facets is None or facets['computed_at'] + self.ttl < time.time():
+            self.refresh_in_background()
+        return facets
+
+    def refresh_in_background(self):
+        if not self.cache.add(self.lock_key, True, timeout=self.ttl):
+            return
+        threading.Thread(target=self._refresh_thread, name='lesson-facets', daemon=True).start()
+
+    def _refresh_thread(self):
+        try:
+            self.refresh()
+        except Exception:
+            logger.exception("Не удалось пересчитать счетчики списка уроков")
+        finally:
+            self.cache.delete(self.lock_key)
+            # Соединения с БД у потока свои
+            connections.close_all()
+
+    def refresh(self) -> dict:
+        started = time.perf_counter()
+        queryset = Lesson.objects.order_by()
+        status = dict(queryset.values_list('status').annotate(Count('id')))
+        days = {
+            day.isoformat(): count
+            for day, count in queryset.annotate(day=TruncDate('start_time'))
+            .values_list('day').annotate(Count('id'))
+        }
+        facets = {
+            'computed_at': time.time(),
+            'total': sum(status.values()),
+            'status': status,
+            'days': days,
+        }
+        self.cache.set(self.cache_key, facets, timeout=None)
+        logger.debug("Счетчики списка уроков пересчитаны за %.2fс", time.perf_counter() - started)
+        return facets
+
+    @staticmethod
+    def dates(facets: dict, prefix: str = '') -> dict:
+        """
+        Счетчики на уровень глубже prefix: годы для '', месяцы для 'YYYY',
+        дни для 'YYYY-MM'.
+        """
+        length = {0: 4, 4: 7}.get(len(prefix), 10)
+        result = {}
+        for day, count in facets['days'].items():
+            if day.startswith(prefix):
+                result[day[:length]] = result.get(day[:length], 0) + count
+        return dict(sorted(result.items(), reverse=True))
+
+
+lesson_facets = LessonFacets(
+    alias=settings.LESSON_ADMIN['FACETS_BACKEND'],
+    ttl=settings.LESSON_ADMIN['FACETS_TTL'],
+)
+
+
+def estimated_table_count(model) -> int:
+    """Оценка числа строк без COUNT(*): статистика СУБД или диапазон id"""
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                           [model._meta.db_table])
+        else:
+            cursor.execute(f"SELECT COALESCE(MAX(id) - MIN(id) + 1, 0) FROM {table}")
+        row = cursor.fetchone()
+    return max(int(row[0] or 0), 0) if row else 0
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор без полного COUNT(*).
+
+    count для списка без фильтров - итог фасетов или оценка СУБД, для
+    отфильтрованного - точное число, но не больше EXACT_COUNT_LIMIT + 1.
+    count_display - подпись числа для шаблона.
+    """
+
+    count_display = ''
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            facets = lesson_facets.get()
+            count = facets['total'] if facets else estimated_table_count(queryset.model)
+            self.count_display = f"≈ {count}"
+            return count
+        limit = settings.LESSON_ADMIN['EXACT_COUNT_LIMIT']
+        count = queryset.order_by()[:limit + 1].count()
+        self.count_display = f"более {limit}" if count > limit else str(count)
+        return count
+
+
+class KeysetChangeList(ChangeList):
+    """
+    Список без номеров страниц: «Далее» передает курсор последнего урока
+    (параметр cursor), запрос идет по индексу (start_time, id) без OFFSET.
+    Фильтры, поиск и переход к началу сбрасывают курсор.
+    """
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        new_params = new_params or {}
+        if CURSOR_VAR not in new_params:
+            remove = [*(remove or []), CURSOR_VAR]
+        return super().get_query_string(new_params, remove)
+
+    def get_results(self, request):
+        paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        cursor = request.GET.get(CURSOR_VAR)
+        try:
+            page = KeysetPaginator(self.queryset, self.list_per_page).get_page(cursor)
+        except InvalidCursor:
+            raise IncorrectLookupParameters
+
+        self.result_list = page['object_list']
+        self.next_page_url = self.get_query_string({CURSOR_VAR: page['next_cursor']}) if page['has_next'] else None
+        self.first_page_url = self.get_query_string() if cursor else None
+        self.paginator = paginator
+        self.result_count = paginator.count
+        self.result_count_display = paginator.count_display
+        self.full_result_count = None
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.can_show_all = False
+        self.multi_page = bool(page['has_next'] or cursor)
+
+
+class StatusFacetFilter(admin.SimpleListFilter):
+    """Фильтр по статусу со счетчиками из LessonFacets"""
+
+    title = 'Статус урока'
+    parameter_name = 'status'
+
+    def lookups(self, request, model_admin):
+        facets = lesson_facets.get()
+        if facets is None:
+            return Lesson.STATUS_CHOICES
+        return [
+            (value, f"{label} ({facets['status'].get(value, 0)})")
+            for value, label in Lesson.STATUS_CHOICES
+        ]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(status=self.value())
+        return queryset
+
+
+class StartDateFilter(admin.SimpleListFilter):
+    """
+    Переход по датам начала вместо date_hierarchy: годы -> месяцы -> дни
+    со счетчиками из LessonFacets. Значение - 'YYYY', 'YYYY-MM' или 'YYYY-MM-DD'.
+    """
+
+    title = 'Дата начала'
+    parameter_name = 'start'
+
+    def lookups(self, request, model_admin):
+        selected = self.value() or ''
+        facets = lesson_facets.get()
+        # Выбранный период и периоды выше остаются в списке для возврата назад
+        choices = [(selected[:length], selected[:length]) for length in (4, 7, 10) if len(selected) >= length]
+        if facets is not None and len(selected) < 10:
+            choices += [
+                (value, f"{value} ({count})")
+                for value, count in LessonFacets.dates(facets, selected).items()
+            ]
+        return choices
+
+    def queryset(self, request, queryset):
+        if not self.value():
+            return queryset
+        try:
+            start, end = self.period(self.value())
+        except ValueError:
+            # Как некорректный курсор: админка перенаправит на ?e=1
+            raise IncorrectLookupParameters
+        return queryset.filter(start_time__gte=start, start_time__lt=end)
+
+    @staticmethod
+    def period(value: str) -> tuple[datetime, datetime]:
+        """Границы [начало, конец) периода 'YYYY', 'YYYY-MM' или 'YYYY-MM-DD'"""
+        parts = [int(part) for part in value.split('-')]
+        if len(parts) == 1:
+            start, end = date(parts[0], 1, 1), date(parts[0] + 1, 1, 1)
+        elif len(parts) == 2:
+            start = date(parts[0], parts[1], 1)
+            end = date(parts[0] + parts[1] // 12, parts[1] % 12 + 1, 1)
+        elif len(parts) == 3:
+            start = date(*parts)
+            end = date.fromordinal(start.toordinal() + 1)
+        else:
+            raise ValueError(f"Некорректный период: {value!r}")
+        return datetime.combine(start, datetime.min.time()), datetime.combine(end, datetime.min.time())
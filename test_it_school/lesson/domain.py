@@ -1,12 +1,39 @@
-from datetime import datetime
+import asyncio
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import partial
 
-from asgiref.sync import async_to_sync
+from asgiref.sync import async_to_sync, sync_to_async
 from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
 from django.http import JsonResponse
+from django.utils import timezone
+from lesson import feed
+from lesson.cache import lesson_list_cache
 from lesson.forms import LessonCreateForm
-from lesson.models import Lesson
+from lesson.intervals import lesson_intervals
+from lesson.metrics import broker_publish_duration, channel_layer_send_duration, errors_total, \
+    form_validation_duration, group_kind, timed
+from lesson.models import Lesson, LessonArchive, LessonSeries, LessonSeriesException, OutboxMessage
+from lesson.series import Occurrence, active_series, occurrences, reminder_id
+from lesson.series import series_exceptions as series_exceptions_of
 
 from test_it_school.celery import external_celery
+from ws_app.groups import BROADCAST_GROUP
+
+logger = logging.getLogger(__name__)
+
+# Отдельный ограниченный пул для публикации в брокер из async-кода:
+# блокирующий send_task не занимает event loop и общий пул sync_to_async
+publish_executor = ThreadPoolExecutor(
+    max_workers=settings.LESSON_PUBLISH_EXECUTOR_WORKERS,
+    thread_name_prefix='celery-publish'
+)
 
 
 class LessonDomain:
@@ -22,12 +49,20 @@ class LessonDomain:
     @staticmethod
     def check_form(form: LessonCreateForm):
         """Добавление урока с историей операций"""
-        if not form.is_valid():
+        with timed('form', form_validation_duration, form=type(form).__name__):
+            is_valid = form.is_valid()
+        if not is_valid:
             return JsonResponse(
                 {"status": "error", "errors": form.errors},
                 status=400
             )
 
+    @staticmethod
+    async def acheck_form(form: LessonCreateForm):
+        """Асинхронный вариант check_form"""
+        # Валидация ModelForm проверяет CheckConstraint запросом к БД
+        return await sync_to_async(LessonDomain.check_form)(form)
+
     @staticmethod
     def create_lesson(data: dict) -> dict:
         """
@@ -38,49 +73,364 @@ class LessonDomain:
 
         lesson = Lesson.objects.create(**data)
 
-        lesson_data = {
+        return LessonDomain.lesson_payload(lesson)
+
+    @staticmethod
+    async def acreate_lesson(data: dict) -> dict:
+        """Асинхронный вариант create_lesson"""
+        lesson = await Lesson.objects.acreate(**data)
+
+        return LessonDomain.lesson_payload(lesson)
+
+    @staticmethod
+    def bulk_create_lessons(lessons: list[Lesson]) -> list[Lesson]:
+        """
+        Создает пачку уроков одним INSERT.
+
+        bulk_create не вызывает save() и сигналы, поэтому умолчания,
+        журнал ленты, сброс кэша выдачи и индекс интервалов обновляются здесь явно.
+        """
+        for lesson in lessons:
+            lesson.apply_defaults()
+        created = Lesson.objects.bulk_create(lessons)
+        feed.record_bulk_change(created, 'create')
+        transaction.on_commit(lesson_list_cache.invalidate)
+        transaction.on_commit(lambda: lesson_intervals.update_many(created))
+        return created
+
+    @staticmethod
+    def advance_statuses(now: datetime = None, batch_size: int = 1000) -> dict:
+        """
+        Переводит уроки по времени: scheduled -> in_progress после начала,
+        scheduled/in_progress -> completed после окончания.
+
+        Пачка - одна транзакция: выборка id по индексам (status, start_time)
+        и (status, end_time) без чтения строк, UPDATE по этим id с тем же
+        условием на статус (completed_at выставляется тем же запросом)
+        и чтение обновленных строк для журнала ленты. Урок, измененный
+        после выборки id, UPDATE не затрагивает, и в журнал он не попадает:
+        строки отбираются по updated_at = now.
+
+        update() не вызывает сигналы, поэтому журнал ленты и сброс кэша
+        выдачи выполняются здесь явно. Процесс перевода статусов отдельный
+        (manage.py advance_lesson_statuses): до web сброс кэша доходит только
+        через общий бэкенд LESSON_LIST_CACHE['SHARED_BACKEND'], без него
+        страницы в кэше web обновятся по истечении TTL.
+
+        Returns:
+            dict: Количество начавшихся и завершившихся уроков
+        """
+        now = now or timezone.now()
+        transitions = {
+            'completed': (
+                Lesson.objects.filter(status__in=['scheduled', 'in_progress'], end_time__lte=now),
+                {'status': 'completed', 'completed_at': F('end_time'), 'updated_at': now},
+            ),
+            'started': (
+                Lesson.objects.filter(status='scheduled', start_time__lte=now, end_time__gt=now),
+                {'status': 'in_progress', 'updated_at': now},
+            ),
+        }
+        result = {}
+        for name, (queryset, values) in transitions.items():
+            result[name] = 0
+            while True:
+                with transaction.atomic():
+                    # Без сортировки по умолчанию (-created_at): выборка идет по индексу без временной сортировки
+                    ids = list(queryset.order_by().values_list('pk', flat=True)[:batch_size])
+                    if not ids:
+                        break
+                    # Условие повторяется в UPDATE: урок могли изменить после выборки id
+                    updated = queryset.filter(pk__in=ids).update(**values)
+                    if updated:
+                        changed = Lesson.objects.filter(pk__in=ids, status=values['status'], updated_at=now)
+                        feed.record_bulk_change(list(changed), 'update')
+                        transaction.on_commit(lesson_list_cache.invalidate)
+                result[name] += updated
+        return result
+
+    @staticmethod
+    def archive_lessons(now: datetime = None, retention_days: int = None,
+                        batch_size: int = None, pause: float = None) -> dict:
+        """
+        Переносит в LessonArchive завершенные и отмененные уроки, которые
+        закончились раньше чем retention_days дней назад (по умолчанию
+        из settings.LESSON_ARCHIVE).
+
+        Каждая пачка - одна короткая транзакция: выборка не больше
+        batch_size уроков по индексу (status, end_time), INSERT в архив
+        и DELETE по id; между пачками - пауза pause. Уроки, заблокированные
+        другим процессом, SKIP LOCKED пропускает (где СУБД его поддерживает).
+        DELETE - SQL-запрос без сигналов и сборщика связей: напоминаний
+        у таких уроков нет, в индексе интервалов только незакончившиеся
+        уроки, строки FTS5 переносят триггеры обеих таблиц, кэш выдачи
+        сбрасывается здесь явно. В журнал ленты перенос не пишется - урок
+        не меняется, меняется только место хранения.
+
+        Returns:
+            dict: Количество перенесенных уроков и пачек
+        """
+        options = settings.LESSON_ARCHIVE
+        now = now or timezone.now()
+        retention_days = options['RETENTION_DAYS'] if retention_days is None else retention_days
+        batch_size = batch_size or options['BATCH_SIZE']
+        pause = options['PAUSE'] if pause is None else pause
+
+        queryset = Lesson.objects.filter(
+            status__in=['completed', 'cancelled'],
+            end_time__lt=now - timedelta(days=retention_days),
+        ).order_by()
+        if connection.features.has_select_for_update_skip_locked:
+            queryset = queryset.select_for_update(skip_locked=True)
+        result = {'archived': 0, 'batches': 0}
+        while True:
+            with transaction.atomic():
+                lessons = list(queryset[:batch_size])
+                if not lessons:
+                    break
+                ids = [lesson.id for lesson in lessons]
+                LessonArchive.objects.bulk_create([LessonArchive.from_lesson(lesson, now) for lesson in lessons])
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f"DELETE FROM {Lesson._meta.db_table} WHERE id IN ({', '.join(['%s'] * len(ids))})",
+                        ids
+                    )
+                transaction.on_commit(lesson_list_cache.invalidate)
+            result['archived'] += len(lessons)
+            result['batches'] += 1
+            if len(lessons) < batch_size:
+                break
+            if pause:
+                time.sleep(pause)
+        return result
+
+    @staticmethod
+    def lesson_payload(lesson: Lesson) -> dict:
+        """
+        Данные урока для задач lesson.schedule_reminder(s): только то, что
+        нужно напоминанию. start_ts - начало урока в секундах epoch
+        (start_time хранится в TIME_ZONE без зоны).
+        """
+        return {
             'id': lesson.id,
             'title': lesson.title,
-            'start_time': lesson.start_time,
-            'description': getattr(lesson, 'description', ''),
-            'duration': getattr(lesson, 'duration', 60),
-            'created_at': datetime.now().isoformat(),
+            'start_ts': int(timezone.make_aware(lesson.start_time).timestamp()),
         }
 
-        return lesson_data
+    @staticmethod
+    def publish_task(task_name: str, args: list):
+        """
+        Публикует задачу Celery согласно settings.LESSON_TASK_PUBLISHING.
+
+        outbox - пишет сообщение в OutboxMessage в текущей транзакции,
+                 в брокер его отправит manage.py relay_outbox;
+        direct - отправляет в брокер сразу после коммита транзакции.
+        """
+        if settings.LESSON_TASK_PUBLISHING == 'outbox':
+            with timed('publish', broker_publish_duration, task=task_name, mode='outbox'):
+                message = OutboxMessage.objects.create(task_name=task_name, args=args)
+            logger.debug("✅ Задача %s записана в outbox: %s", task_name, message.id)
+            return
+
+        def send():
+            with timed('publish', broker_publish_duration, task=task_name, mode='direct'):
+                task = external_celery.send_task(task_name, args=args, ignore_result=True)
+            logger.debug("✅ Задача %s отправлена в Celery: %s", task_name, task.id)
+
+        transaction.on_commit(send)
+
+    @staticmethod
+    async def apublish_task(task_name: str, args: list):
+        """
+        Отправляет задачу в брокер из async-кода.
+
+        Вызов send_task выполняется в publish_executor. Для режима outbox
+        не используется: там задача пишется в одной транзакции с уроком.
+        """
+        loop = asyncio.get_running_loop()
+        with timed('publish', broker_publish_duration, task=task_name, mode='direct'):
+            task = await loop.run_in_executor(
+                publish_executor,
+                partial(external_celery.send_task, task_name, args=args, ignore_result=True)
+            )
+        logger.debug("✅ Задача %s отправлена в Celery: %s", task_name, task.id)
 
     @staticmethod
     def add_new_task(lesson_data: dict):
-        reminder_task = external_celery.send_task(
-            'lesson.schedule_reminder',
-            args=[lesson_data]
-        )
-        print(f"✅ Задача напоминания запланирована: {reminder_task.id}")
+        """Ставит задачу напоминания об уроке"""
+        LessonDomain.publish_task('lesson.schedule_reminder', [lesson_data])
+
+    @staticmethod
+    def add_new_tasks(lessons_data: list[dict]):
+        """Ставит напоминания для пачки уроков одной задачей"""
+        LessonDomain.publish_task('lesson.schedule_reminders', [lessons_data])
 
     @staticmethod
-    def send_websocket_message(message: str):
+    def cancel_reminder(lesson_id: int):
+        """Отменяет напоминание в планировщике воркера"""
+        LessonDomain.publish_task('lesson.cancel_reminder', [lesson_id])
+
+    @staticmethod
+    def sync_reminder(lesson: Lesson, old_status: str, old_start_time: datetime):
+        """
+        Синхронизирует напоминание с измененным уроком.
+
+        Отмена урока снимает напоминание, перенос start_time переставляет
+        его на новое время (в планировщике напоминание заменяется по id урока).
+        """
+        if lesson.status == 'cancelled' and old_status != 'cancelled':
+            LessonDomain.cancel_reminder(lesson.id)
+        elif lesson.status == 'scheduled' and (
+                old_start_time != lesson.start_time or old_status != 'scheduled'):
+            LessonDomain.add_new_task(LessonDomain.lesson_payload(lesson))
+
+    @staticmethod
+    def occurrence_payload(occurrence: Occurrence) -> dict:
+        """
+        Данные занятия серии для lesson.schedule_reminder(s), как у
+        lesson_payload; id - строка series-<id серии>-<время по расписанию>.
         """
-        Отправляет простое текстовое сообщение всем подключенным клиентам
+        return {
+            'id': occurrence.reminder_id,
+            'title': occurrence.title,
+            'start_ts': int(timezone.make_aware(occurrence.start_time).timestamp()),
+        }
+
+    @staticmethod
+    def plan_series_reminders(now: datetime = None, series_id: int = None) -> dict:
+        """
+        Планирует напоминания занятий серий на скользящий горизонт
+        LESSON_SERIES['REMINDER_HORIZON_HOURS'].
+
+        Для каждой серии берутся занятия от reminders_planned_until до
+        now + горизонт - одна задача lesson.schedule_reminders на серию.
+        Отметка переносится UPDATE с условием на прежнее значение:
+        параллельный запуск не запланирует занятия дважды.
+
+        Returns:
+            dict: Количество обработанных серий и запланированных напоминаний
+        """
+        now = now or timezone.now()
+        horizon = now + timedelta(hours=settings.LESSON_SERIES['REMINDER_HORIZON_HOURS'])
+        queryset = active_series(before=horizon, after=now).filter(
+            Q(reminders_planned_until__isnull=True) | Q(reminders_planned_until__lt=horizon)
+        ).order_by('id')
+        if series_id is not None:
+            queryset = queryset.filter(pk=series_id)
+
+        result = {'series': 0, 'reminders': 0}
+        for series in queryset.iterator(chunk_size=500):
+            planned_until = series.reminders_planned_until
+            payloads = [
+                LessonDomain.occurrence_payload(occurrence)
+                for occurrence in occurrences(series, max(planned_until or now, now), horizon)
+            ]
+            with transaction.atomic():
+                updated = LessonSeries.objects.filter(
+                    pk=series.pk, reminders_planned_until=planned_until
+                ).update(reminders_planned_until=horizon)
+                if updated and payloads:
+                    LessonDomain.add_new_tasks(payloads)
+            if updated:
+                result['series'] += 1
+                result['reminders'] += len(payloads)
+        return result
+
+    @staticmethod
+    def planned_until(series_id: int) -> datetime | None:
+        """Отметка планирования из БД: ее переносит UPDATE, объект в памяти может отставать"""
+        return LessonSeries.objects.filter(pk=series_id).values_list('reminders_planned_until', flat=True).first()
+
+    @staticmethod
+    def reset_series_reminders(series: LessonSeries, previous: LessonSeries):
+        """
+        Правило серии изменилось или серия удаляется: снимает напоминания,
+        запланированные по прежнему правилу previous, и сбрасывает
+        отметку - plan_series_reminders запланирует занятия заново.
+        """
+        now = timezone.now()
+        planned_until = LessonDomain.planned_until(series.pk)
+        if planned_until is not None and planned_until > now:
+            for occurrence in occurrences(previous, now, planned_until, exceptions=series_exceptions_of(series)):
+                LessonDomain.cancel_reminder(occurrence.reminder_id)
+        LessonSeries.objects.filter(pk=series.pk).update(reminders_planned_until=None)
+        series.reminders_planned_until = None
+
+    @staticmethod
+    def sync_series_exception(exception: LessonSeriesException, deleted: bool = False):
+        """
+        Переносит или снимает напоминание занятия, для которого добавили,
+        изменили или удалили исключение. Занятия за горизонтом планирования
+        подхватит plan_series_reminders.
+        """
+        series = exception.series
+        planned_until = LessonDomain.planned_until(series.pk)
+        if planned_until is None or series.status != 'active':
+            return
+        now = timezone.now()
+        start_time = exception.occurrence_start if deleted else exception.start_time
+        if start_time is not None and now < start_time < planned_until:
+            # Напоминание в планировщике заменяется по id занятия
+            occurrence = Occurrence(series, exception.occurrence_start, start_time)
+            LessonDomain.add_new_task(LessonDomain.occurrence_payload(occurrence))
+        else:
+            LessonDomain.cancel_reminder(reminder_id(series.id, exception.occurrence_start))
+
+    @staticmethod
+    def encode_notification(message: str) -> str:
+        """Сериализует уведомление для клиента один раз на всю рассылку"""
+        return json.dumps({
+            'type': 'notification',
+            'message': message,
+            'title': '📨 Уведомление от сервера',
+            'status': 'info',
+        }, ensure_ascii=False)
+
+    @staticmethod
+    def send_websocket_message(message: str, groups: list[str] = None):
+        """
+        Отправляет простое текстовое сообщение подключенным клиентам
 
         Args:
             message: Текст сообщения (простая строка)
+            groups: Группы получателей (см. ws_app.groups), по умолчанию
+                все подключенные клиенты
         """
         try:
             # Получаем channel layer
             channel_layer = get_channel_layer()
+            event = {
+                'type': 'send_encoded',
+                'text': LessonDomain.encode_notification(message)
+            }
 
-            # Отправляем сообщение в группу "notifications"
-            async_to_sync(channel_layer.group_send)(
-                "notifications",
-                {
-                    'type': 'send_simple_message',
-                    'message': message
-                }
-            )
-            print(f"✅ Сообщение отправлено в WebSocket: {message}")
+            for group in groups or [BROADCAST_GROUP]:
+                with timed('ws', channel_layer_send_duration, group=group_kind(group)):
+                    async_to_sync(channel_layer.group_send)(group, event)
+            logger.debug("✅ Сообщение отправлено в WebSocket: %s", message)
+
+        except Exception:
+            errors_total.inc(where='send_websocket_message')
+            logger.exception("❌ Ошибка отправки WebSocket")
+
+    @staticmethod
+    async def asend_websocket_message(message: str, groups: list[str] = None):
+        """Асинхронный вариант send_websocket_message без перехода через async_to_sync"""
+        try:
+            channel_layer = get_channel_layer()
+            event = {
+                'type': 'send_encoded',
+                'text': LessonDomain.encode_notification(message)
+            }
+
+            for group in groups or [BROADCAST_GROUP]:
+                with timed('ws', channel_layer_send_duration, group=group_kind(group)):
+                    await channel_layer.group_send(group, event)
+            logger.debug("✅ Сообщение отправлено в WebSocket: %s", message)
 
-        except Exception as e:
-            print(f"❌ Ошибка отправки WebSocket: {e}")
+        except Exception:
+            errors_total.inc(where='asend_websocket_message')
+            logger.exception("❌ Ошибка отправки WebSocket")
 
 
 lesson_domain = LessonDomain()
@@ -0,0 +1,197 @@
+"""
+Живая лента уроков: журнал изменений LessonChange и рассылка дельт
+подписчикам ws/lesson/ (см. ws_app.consumers.SimpleConsumer).
+"""
+import json
+import logging
+from datetime import datetime, timedelta
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Max, Min, Q
+from django.utils import timezone
+from lesson.metrics import channel_layer_send_duration, errors_total, timed
+from lesson.models import Lesson, LessonChange
+from lesson.serializers import lesson_to_dict
+
+logger = logging.getLogger(__name__)
+
+FEED_GROUP = "lesson_feed"
+
+
+def record_change(lesson: Lesson, op: str, previous_start_time: datetime = None) -> LessonChange:
+    """
+    Записывает изменение урока в журнал (в текущей транзакции) и после
+    коммита рассылает дельту подписчикам ленты.
+    """
+    data = {'id': lesson.id} if op == 'delete' else lesson_to_dict(lesson)
+    change = LessonChange.objects.create(
+        lesson_id=lesson.id,
+        op=op,
+        data=data,
+        start_time=lesson.start_time,
+        previous_start_time=previous_start_time,
+    )
+    transaction.on_commit(lambda: broadcast_change(change))
+    return change
+
+
+def record_bulk_change(lessons: list[Lesson], op: str) -> list[LessonChange]:
+    """
+    Записывает изменение пачки уроков (bulk_create и update() не вызывают
+    сигналы) и после коммита рассылает дельты одним событием.
+    """
+    changes = LessonChange.objects.bulk_create([
+        LessonChange(
+            lesson_id=lesson.id,
+            op=op,
+            data=lesson_to_dict(lesson),
+            start_time=lesson.start_time,
+        )
+        for lesson in lessons
+    ])
+    transaction.on_commit(lambda: broadcast_changes(changes))
+    return changes
+
+
+def encode_delta(change: LessonChange) -> str:
+    return json.dumps({
+        'type': 'feed_delta',
+        'seq': change.id,
+        'op': change.op,
+        'lesson': change.data,
+    }, ensure_ascii=False, cls=DjangoJSONEncoder)
+
+
+def broadcast_change(change: LessonChange):
+    """
+    Рассылает дельту группе ленты.
+
+    Дельта сериализуется один раз; время начала (новое и прежнее)
+    передается отдельно, чтобы consumer отфильтровал ее по диапазону
+    подписки без разбора JSON.
+    """
+    try:
+        with timed('ws', channel_layer_send_duration, group=FEED_GROUP):
+            async_to_sync(get_channel_layer().group_send)(FEED_GROUP, delta_event(change))
+    except Exception:
+        errors_total.inc(where='broadcast_change')
+        logger.exception("❌ Ошибка рассылки ленты уроков", extra={'lesson_id': change.lesson_id})
+
+
+def broadcast_changes(changes: list[LessonChange]):
+    """Рассылает пачку дельт одним событием группы ленты"""
+    if not changes:
+        return
+    try:
+        with timed('ws', channel_layer_send_duration, group=FEED_GROUP):
+            async_to_sync(get_channel_layer().group_send)(FEED_GROUP, {
+                'type': 'feed_batch',
+                'items': [delta_event(change) for change in changes],
+            })
+    except Exception:
+        errors_total.inc(where='broadcast_changes')
+        logger.exception("❌ Ошибка рассылки ленты уроков")
+
+
+def in_range(value: str | None, range_from: datetime | None, range_to: datetime | None) -> bool:
+    """Попадает ли время (ISO-строка) в полуинтервал [range_from, range_to)"""
+    if value is None:
+        return False
+    value = datetime.fromisoformat(value)
+    return (range_from is None or value >= range_from) and (range_to is None or value < range_to)
+
+
+def current_seq() -> int:
+    return LessonChange.objects.aggregate(seq=Max('id'))['seq'] or 0
+
+
+def snapshot(range_from: datetime | None, range_to: datetime | None) -> dict:
+    """
+    Начальное состояние ленты: уроки диапазона по времени начала и seq,
+    с которого нужно применять дельты.
+    """
+    seq = current_seq()
+    qs = Lesson.objects.order_by('start_time', 'id')
+    if range_from is not None:
+        qs = qs.filter(start_time__gte=range_from)
+    if range_to is not None:
+        qs = qs.filter(start_time__lt=range_to)
+
+    limit = settings.LESSON_FEED['SNAPSHOT_LIMIT']
+    lessons = list(qs[:limit + 1])
+    return {
+        'type': 'feed_snapshot',
+        'seq': seq,
+        'items': [lesson_to_dict(lesson) for lesson in lessons[:limit]],
+        'truncated': len(lessons) > limit,
+    }
+
+
+def changes_since(since: int, range_from: datetime | None, range_to: datetime | None):
+    """
+    Дельты после since для возобновления подписки.
+
+    Returns:
+        list[LessonChange] | None: None, если журнал уже не содержит
+            всех изменений после since (или их слишком много) и клиенту
+            нужен полный снимок
+    """
+    oldest = LessonChange.objects.aggregate(seq=Min('id'))['seq']
+    if oldest is not None and since < oldest - 1:
+        return None
+
+    qs = LessonChange.objects.filter(id__gt=since).order_by('id')
+    if range_from is not None or range_to is not None:
+        window = Q()
+        if range_from is not None:
+            window &= Q(start_time__gte=range_from)
+        if range_to is not None:
+            window &= Q(start_time__lt=range_to)
+        previous = Q(previous_start_time__isnull=False)
+        if range_from is not None:
+            previous &= Q(previous_start_time__gte=range_from)
+        if range_to is not None:
+            previous &= Q(previous_start_time__lt=range_to)
+        qs = qs.filter(window | previous)
+
+    limit = settings.LESSON_FEED['MAX_RESUME_CHANGES']
+    changes = list(qs[:limit + 1])
+    if len(changes) > limit:
+        return None
+    return changes
+
+
+def changes_between(after: int, upto: int) -> list[LessonChange]:
+    """
+    Все изменения с seq в (after, upto] без фильтра по диапазону: consumer
+    дочитывает ими пропуск в seq, если дельты пришли не по порядку
+    """
+    return list(LessonChange.objects.filter(id__gt=after, id__lte=upto).order_by('id'))
+
+
+def prune(older_than: timedelta) -> int:
+    """Удаляет записи журнала старше older_than"""
+    deleted, _ = LessonChange.objects.filter(
+        created_at__lt=timezone.now() - older_than
+    ).delete()
+    return deleted
+
+
+def delta_event(change: LessonChange) -> dict:
+    """Событие группы ленты для дельты; его же обрабатывает SimpleConsumer.feed_delta"""
+    return {
+        'type': 'feed_delta',
+        'seq': change.id,
+        'lesson_id': change.lesson_id,
+        'text': encode_delta(change),
+        'start_time': _iso(change.start_time),
+        'previous_start_time': _iso(change.previous_start_time),
+    }
+
+
+def _iso(value: datetime | None) -> str | None:
+    return value.isoformat() if value else None
@@ -1,9 +1,37 @@
+from datetime import timedelta
+
 from django import forms
+from django.conf import settings
+from django.utils import timezone
 
 from .models import Lesson
 
 
+class NaiveDateTimeField(forms.DateTimeField):
+    """
+    DateTimeField для USE_TZ=False: время с часовым поясом (ISO 8601
+    со смещением) переводится в локальное без зоны, иначе сравнение
+    с временем уроков падает с TypeError.
+    """
+
+    def to_python(self, value):
+        value = super().to_python(value)
+        if value is not None and timezone.is_aware(value):
+            return timezone.make_naive(value)
+        return value
+
+
 class LessonCreateForm(forms.ModelForm):
+    """
+    pending_intervals - lesson.intervals.PendingIntervals с уроками, которые
+    приняты в этой же операции, но еще не записаны (импорт): они тоже
+    учитываются при проверке пересечений.
+    """
+
+    def __init__(self, *args, pending_intervals=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pending_intervals = pending_intervals
+
     class Meta:
         model = Lesson
         fields = [
@@ -13,6 +41,10 @@ class LessonCreateForm(forms.ModelForm):
             "end_time",
             "status",
         ]
+        field_classes = {
+            "start_time": NaiveDateTimeField,
+            "end_time": NaiveDateTimeField,
+        }
 
         widgets = {
             "start_time": forms.DateTimeInput(
@@ -33,4 +65,49 @@ class LessonCreateForm(forms.ModelForm):
                 "Время окончания должно быть позже времени начала"
             )
 
+        if start:
+            self._check_schedule(start, end or start + Lesson.DEFAULT_DURATION, cleaned_data.get("status"))
+
         return cleaned_data
+
+    def _check_schedule(self, start, end, status):
+        """Длительность урока и пересечения с уже запланированными (lesson.intervals)"""
+        schedule = settings.LESSON_SCHEDULE
+        if end - start > timedelta(hours=schedule['MAX_DURATION_HOURS']):
+            raise forms.ValidationError(
+                f"Урок не может длиться дольше {schedule['MAX_DURATION_HOURS']} ч"
+            )
+
+        if not schedule['CHECK_CONFLICTS'] or status == 'cancelled':
+            return
+        from lesson.intervals import lesson_intervals
+
+        conflicts = lesson_intervals.overlapping(start, end, exclude_id=self.instance.pk)
+        pending = self.pending_intervals.count_overlapping(start, end) if self.pending_intervals else 0
+        if len(conflicts) + pending >= schedule['MAX_PARALLEL']:
+            if not pending:
+                raise forms.ValidationError(
+                    "Время пересекается с другими уроками: %(ids)s",
+                    code="conflict",
+                    params={"ids": ", ".join(map(str, conflicts[:10]))},
+                )
+            raise forms.ValidationError(
+                "Время пересекается с другими уроками: %(ids)s; строк этого импорта: %(pending)s",
+                code="conflict",
+                params={"ids": ", ".join(map(str, conflicts[:10])) or "-", "pending": pending},
+            )
+
+
+class LessonImportForm(LessonCreateForm):
+    """
+    Правила LessonCreateForm для строк массового импорта.
+
+    Ограничение lesson_end_after_start уже проверяется в clean(), поэтому
+    проверка ограничений модели запросом к БД на каждую строку пропускается:
+    Model.validate_constraints не проверяет ограничения по исключенным полям.
+    """
+
+    def _get_validation_exclusions(self):
+        exclude = super()._get_validation_exclusions()
+        exclude.add('end_time')
+        return exclude
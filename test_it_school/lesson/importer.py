@@ -0,0 +1,117 @@
+"""
+Разбор потока строк для массового импорта уроков (POST /lessons/import/).
+
+Строки читаются по мере поступления тела запроса, весь файл в память
+не загружается.
+"""
+import csv
+import json
+
+FORMATS = ('csv', 'ndjson')
+
+
+class ImportFormatError(ValueError):
+    """Поток нельзя разобрать целиком (например, нет заголовка CSV)"""
+
+
+def detect_format(content_type: str, requested: str = None) -> str:
+    """Формат по параметру ?format= или заголовку Content-Type"""
+    if requested:
+        if requested not in FORMATS:
+            raise ImportFormatError(f"Допустимые форматы: {', '.join(FORMATS)}")
+        return requested
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    if content_type in ('application/x-ndjson', 'application/ndjson', 'application/jsonl'):
+        return 'ndjson'
+    if content_type in ('text/csv', 'application/csv'):
+        return 'csv'
+    raise ImportFormatError("Укажите Content-Type text/csv или application/x-ndjson")
+
+
+class UndecodableLine(str):
+    """Строка с байтами не в кодировке импорта: разбор отмечает ее как ошибочную"""
+
+    error = ''
+
+
+def decode_lines(stream, encoding: str = 'utf-8'):
+    """
+    Строки потока байтов (request поддерживает построчное чтение).
+
+    Строка с некорректными байтами не прерывает импорт: она декодируется
+    с заменой символов и помечается как UndecodableLine.
+    """
+    for number, line in enumerate(stream, start=1):
+        if number == 1 and line.startswith(b'\xef\xbb\xbf'):
+            line = line[3:]  # BOM из Excel
+        try:
+            yield line.decode(encoding)
+        except UnicodeDecodeError as e:
+            bad = UndecodableLine(line.decode(encoding, errors='replace'))
+            bad.error = f"Строка не в кодировке {encoding}: {e.reason}, байт {e.start + 1}"
+            yield bad
+
+
+def parse_rows(lines, fmt: str):
+    """
+    Разбирает строки импорта.
+
+    Yields:
+        tuple: (номер строки, данные урока или None, ошибка или None)
+    """
+    if fmt == 'csv':
+        yield from _parse_csv(lines)
+    else:
+        yield from _parse_ndjson(lines)
+
+
+def _parse_csv(lines):
+    undecodable = {}
+
+    def tracked():
+        # Физические номера строк: одна запись CSV может занимать несколько строк
+        for number, line in enumerate(lines, start=1):
+            if isinstance(line, UndecodableLine):
+                undecodable[number] = line.error
+            yield line
+
+    reader = csv.DictReader(tracked())
+    if not reader.fieldnames:
+        raise ImportFormatError("Пустой CSV: ожидается строка заголовка")
+    last_line = reader.line_num
+    while True:
+        # Ошибка разбора одной записи не прерывает разбор остальных
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            last_line = max(reader.line_num, last_line + 1)
+            yield last_line, None, {'__all__': [f"Ошибка CSV: {e}"]}
+            continue
+        first_line, last_line = last_line + 1, reader.line_num
+        errors = [undecodable.pop(number) for number in range(first_line, last_line + 1) if number in undecodable]
+        if errors:
+            yield last_line, None, {'__all__': errors}
+        elif None in row:
+            yield last_line, None, {'__all__': ["Лишние значения в строке"]}
+        else:
+            yield last_line, row, None
+
+
+def _parse_ndjson(lines):
+    for number, line in enumerate(lines, start=1):
+        if isinstance(line, UndecodableLine):
+            yield number, None, {'__all__': [line.error]}
+            continue
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield number, None, {'__all__': [f"Некорректный JSON: {e}"]}
+            continue
+        if not isinstance(row, dict):
+            yield number, None, {'__all__': ["Ожидается JSON-объект"]}
+            continue
+        yield number, row, None
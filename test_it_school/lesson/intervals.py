@@ -0,0 +1,179 @@
+"""
+Индекс интервалов предстоящих уроков в памяти процесса для проверки
+пересечений при создании урока (LessonCreateForm) без запроса к БД.
+"""
+import threading
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+from lesson.models import Lesson
+
+
+class PendingIntervals:
+    """
+    Интервалы уроков, принятых, но еще не записанных в БД (строки текущей
+    пачки импорта): индекс lesson_intervals узнает о них только после коммита.
+    """
+
+    def __init__(self):
+        self._entries = []
+        self._max_duration = timedelta(0)
+
+    def add(self, start: datetime, end: datetime):
+        insort(self._entries, (start, end))
+        self._max_duration = max(self._max_duration, end - start)
+
+    def count_overlapping(self, start: datetime, end: datetime) -> int:
+        """Сколько интервалов пересекается с [start, end)"""
+        i = bisect_left(self._entries, (start - self._max_duration,))
+        hi = bisect_left(self._entries, (end,))
+        return sum(1 for _, entry_end in self._entries[i:hi] if entry_end > start)
+
+    def clear(self):
+        self._entries.clear()
+        self._max_duration = timedelta(0)
+
+
+class LessonIntervalIndex:
+    """
+    Отсортированный по началу список (start_time, id, end_time) неотмененных
+    уроков, которые еще не закончились.
+
+    Поиск пересечений с [start, end) - два бинарных поиска: кандидаты
+    начинаются не раньше start - самая длинная длительность в индексе
+    и раньше end. Строится лениво при первом обращении, дальше
+    поддерживается сигналами Lesson (post_save / post_delete).
+
+    Массовые операции без сигналов вызывают invalidate(). Версия индекса,
+    как у LessonListCache, при общем бэкенде хранится в нем: изменения
+    в других процессах приводят к перестроению при следующей проверке.
+    """
+
+    version_key = 'lesson_intervals:version'
+
+    def __init__(self, shared_alias: str = None):
+        self.shared_alias = shared_alias
+        self._entries = []
+        self._by_id = {}
+        self._max_duration = timedelta(0)
+        # None - индекс не построен
+        self._built_version = None
+        self._version = 1
+        self._lock = threading.RLock()
+        self.rebuilds = 0
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias] if self.shared_alias else None
+
+    def version(self) -> int:
+        if self.shared is None:
+            return self._version
+        return self.shared.get_or_set(self.version_key, 1, timeout=None)
+
+    def _bump_version(self) -> int:
+        if self.shared is None:
+            self._version += 1
+            return self._version
+        try:
+            return self.shared.incr(self.version_key)
+        except ValueError:
+            self.shared.add(self.version_key, 2, timeout=None)
+            return 2
+
+    def invalidate(self):
+        """Индекс будет перестроен при следующей проверке (во всех процессах)"""
+        with self._lock:
+            self._bump_version()
+            self._built_version = None
+
+    def _ensure_built(self):
+        version = self.version()
+        if self._built_version == version:
+            return
+        with self._lock:
+            if self._built_version == version:
+                return
+            rows = (
+                Lesson.objects.exclude(status='cancelled')
+                .filter(end_time__gt=timezone.now())
+                .order_by('start_time', 'id')
+                .values_list('start_time', 'id', 'end_time')
+            )
+            self._entries = list(rows.iterator(chunk_size=10000))
+            self._by_id = {lesson_id: (start, end) for start, lesson_id, end in self._entries}
+            self._max_duration = max((end - start for start, _, end in self._entries), default=timedelta(0))
+            self._built_version = version
+            self.rebuilds += 1
+
+    def overlapping(self, start: datetime, end: datetime, exclude_id: int = None) -> list[int]:
+        """id уроков, пересекающихся с [start, end)"""
+        self._ensure_built()
+        with self._lock:
+            entries = self._entries
+            i = bisect_left(entries, (start - self._max_duration,))
+            hi = bisect_left(entries, (end,))
+            result = []
+            while i < hi:
+                lesson_start, lesson_id, lesson_end = entries[i]
+                if lesson_end > start and lesson_id != exclude_id:
+                    result.append(lesson_id)
+                i += 1
+            return result
+
+    def update(self, lesson: Lesson):
+        """Отражает сохранение урока (после коммита транзакции)"""
+        self.update_many([lesson])
+
+    def update_many(self, lessons: list[Lesson]):
+        """Отражает сохранение пачки уроков (bulk_create, импорт)"""
+        with self._lock:
+            if self._built_version is None:
+                self._bump_version()
+                return
+            added = []
+            for lesson in lessons:
+                self._remove(lesson.id)
+                if lesson.status != 'cancelled' and lesson.end_time:
+                    added.append((lesson.start_time, lesson.id, lesson.end_time))
+                    self._by_id[lesson.id] = (lesson.start_time, lesson.end_time)
+                    self._max_duration = max(self._max_duration, lesson.end_time - lesson.start_time)
+            if len(added) == 1:
+                insort(self._entries, added[0])
+            elif added:
+                # Timsort сливает уже отсортированные участки за линейное время
+                self._entries.extend(sorted(added))
+                self._entries.sort()
+            self._sync_version()
+
+    def remove(self, lesson_id: int):
+        """Отражает удаление урока (после коммита транзакции)"""
+        with self._lock:
+            if self._built_version is None:
+                self._bump_version()
+                return
+            self._remove(lesson_id)
+            self._sync_version()
+
+    def _remove(self, lesson_id: int):
+        interval = self._by_id.pop(lesson_id, None)
+        if interval is not None:
+            i = bisect_left(self._entries, (interval[0], lesson_id))
+            if i < len(self._entries) and self._entries[i][1] == lesson_id:
+                del self._entries[i]
+
+    def _sync_version(self):
+        """
+        Сообщает другим процессам об изменении. Если между нашими
+        изменениями версию увеличил другой процесс, его изменений в индексе
+        нет - индекс будет перестроен.
+        """
+        built = self._built_version
+        version = self._bump_version()
+        self._built_version = version if version == built + 1 else None
+
+
+lesson_intervals = LessonIntervalIndex(shared_alias=settings.LESSON_SCHEDULE['SHARED_BACKEND'])
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+from lesson.aplication import lesson_app
+
+
+class Command(BaseCommand):
+    help = (
+        "Периодически переводит уроки scheduled -> in_progress -> completed "
+        "по времени начала и окончания"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=30,
+                            help="Пауза между запусками, сек")
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Уроков в одном UPDATE")
+        parser.add_argument('--once', action='store_true',
+                            help="Выполнить один запуск и завершиться")
+
+    def handle(self, *args, **options):
+        self.stdout.write("✅ Перевод статусов уроков запущен")
+        while True:
+            result = lesson_app.advance_statuses(batch_size=options['batch_size'])
+            if result['started'] or result['completed']:
+                self.stdout.write(
+                    f"🔄 Начались: {result['started']}, завершились: {result['completed']}"
+                )
+            if options['once']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+from lesson.aplication import lesson_app
+
+
+class Command(BaseCommand):
+    help = (
+        "Периодически переносит завершенные и отмененные уроки старше "
+        "LESSON_ARCHIVE['RETENTION_DAYS'] дней в архив пачками по BATCH_SIZE"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=3600,
+                            help="Пауза между запусками, сек")
+        parser.add_argument('--retention-days', type=int, default=None,
+                            help="Переносить уроки, закончившиеся раньше N дней назад")
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help="Уроков в одной транзакции")
+        parser.add_argument('--once', action='store_true',
+                            help="Выполнить один запуск и завершиться")
+
+    def handle(self, *args, **options):
+        self.stdout.write("✅ Архивация уроков запущена")
+        while True:
+            started = time.perf_counter()
+            result = lesson_app.archive_lessons(
+                retention_days=options['retention_days'],
+                batch_size=options['batch_size'],
+            )
+            if result['archived']:
+                self.stdout.write(
+                    f"📦 В архив перенесено уроков: {result['archived']} "
+                    f"({result['batches']} пачек, {time.perf_counter() - started:.1f}с)"
+                )
+            if options['once']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,293 @@
+import asyncio
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max
+from lesson.benchmarks import (asgi_request, format_result, lesson_form_data, run_load,
+                               seed_lessons, summarize, temporary_database)
+from lesson.cache import lesson_list_cache
+from lesson.models import Lesson
+
+from test_it_school.celery import external_celery
+
+SCENARIOS = ['list', 'create', 'ws', 'reminders']
+
+
+class Command(BaseCommand):
+    help = (
+        "Набор бенчмарков горячих путей: выдача уроков, создание урока, "
+        "рассылка по WebSocket и отправка напоминаний. Пропускная способность "
+        "и p50/p95/p99 задержки, результат можно сохранить в JSON и сравнить "
+        "с прошлым запуском"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenario', action='append', choices=SCENARIOS,
+                            help="Сценарий (можно несколько раз), по умолчанию все")
+        parser.add_argument('--requests', type=int, default=500,
+                            help="HTTP-запросов на сценарий list/create")
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--lessons', type=int, default=10000,
+                            help="Уроков в базе для сценария list")
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--connections', type=int, default=500,
+                            help="WebSocket-соединений для сценария ws")
+        parser.add_argument('--broadcasts', type=int, default=10,
+                            help="Рассылок на все соединения в сценарии ws")
+        parser.add_argument('--reminders', type=int, default=10000,
+                            help="Напоминаний в сценарии reminders")
+        parser.add_argument('--reminder-delay', type=float, default=0.01,
+                            help="Имитация задержки доставки одного напоминания, сек")
+        parser.add_argument('--reminder-concurrency', type=int, default=500)
+        parser.add_argument('--reminder-batch-size', type=int, default=500)
+        parser.add_argument('--celery-service', type=Path,
+                            default=Path(settings.BASE_DIR).parent / 'celery_service',
+                            help="Каталог celery_service для сценария reminders")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--json', metavar='PATH',
+                            help="Сохранить результаты в JSON ('-' - в stdout)")
+        parser.add_argument('--compare', metavar='PATH', type=Path,
+                            help="JSON прошлого запуска для сравнения")
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        scenarios = options['scenario'] or SCENARIOS
+        # Брокер и бэкенд результатов в памяти процесса
+        external_celery.conf.update(broker_url='memory://', result_backend='cache+memory://')
+
+        results = {}
+        with temporary_database():
+            for scenario in scenarios:
+                results.update(getattr(self, f'bench_{scenario}')(options))
+
+        for name, result in results.items():
+            self.stdout.write(format_result(name, result))
+
+        report = {'meta': self._meta(options, scenarios), 'results': results}
+        if options['compare']:
+            self._compare(json.loads(options['compare'].read_text()), results)
+        if options['json'] == '-':
+            self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
+        elif options['json']:
+            Path(options['json']).write_text(json.dumps(report, ensure_ascii=False, indent=2))
+            self.stdout.write(f"Результаты сохранены в {options['json']}")
+
+    def bench_list(self, options) -> dict:
+        """
+        GET /lessons/ по всей глубине выдачи: постраничный режим против
+        курсорного, с кэшем и без (кэш сбрасывается перед каждым запросом).
+        """
+        seed_lessons(options['lessons'])
+        app = get_asgi_application()
+        page_size = options['page_size']
+        pages = max(1, options['lessons'] // page_size)
+        cursors = asyncio.run(self._collect_cursors(app, page_size))
+
+        def page_path(i):
+            return f'/lessons/?page={random.randint(1, pages)}&page_size={page_size}'
+
+        def cursor_path(i):
+            return f'/lessons/?cursor={random.choice(cursors)}&page_size={page_size}'
+
+        results = {}
+        for name, path, cold in [
+            ('list[page]', page_path, False),
+            ('list[page,cold]', page_path, True),
+            ('list[cursor]', cursor_path, False),
+            ('list[cursor,cold]', cursor_path, True),
+        ]:
+            results[name] = asyncio.run(self._bench_get(app, path, cold, options))
+        return results
+
+    @staticmethod
+    async def _collect_cursors(app, page_size: int) -> list[str]:
+        """Курсоры всех страниц выдачи (первая страница - пустой курсор)"""
+        cursors = ['']
+        while True:
+            _, body = await asgi_request(
+                app, 'GET', f'/lessons/?mode=cursor&cursor={cursors[-1]}&page_size={page_size}'
+            )
+            next_cursor = json.loads(body)['pagination']['next_cursor']
+            if not next_cursor:
+                return cursors
+            cursors.append(next_cursor)
+
+    @staticmethod
+    async def _bench_get(app, path, cold: bool, options) -> dict:
+        async def request(i):
+            if cold:
+                lesson_list_cache.invalidate()
+            status, _ = await asgi_request(app, 'GET', path(i))
+            return status == 200
+
+        return await run_load(request, options['requests'], options['concurrency'])
+
+    def bench_create(self, options) -> dict:
+        """POST /lesson_add/ (sync) и /lesson_add_async/ (async)"""
+        app = get_asgi_application()
+        # После засеянных bench_list уроков: новые не должны с ними пересекаться
+        last_end = Lesson.objects.aggregate(last_end=Max('end_time'))['last_end']
+        start = max(datetime.now(), last_end or datetime.now()) + timedelta(days=1)
+        results = {}
+        for name, path in [('create[sync]', '/lesson_add/'), ('create[async]', '/lesson_add_async/')]:
+            offset = len(results) * options['requests']
+
+            async def request(i):
+                status, _ = await asgi_request(app, 'POST', path, lesson_form_data(offset + i, start))
+                return status == 201
+
+            results[name] = asyncio.run(run_load(request, options['requests'], options['concurrency']))
+        return results
+
+    def bench_ws(self, options) -> dict:
+        """
+        Рассылка LessonDomain.asend_websocket_message на все подключенные
+        SimpleConsumer: задержка от отправки до получения каждым клиентом.
+        """
+        return {'ws[broadcast]': asyncio.run(self._bench_ws(options['connections'], options['broadcasts']))}
+
+    @staticmethod
+    async def _bench_ws(connections: int, broadcasts: int) -> dict:
+        from channels.testing import WebsocketCommunicator
+        from lesson.domain import LessonDomain
+        from ws_app.consumers import PING
+
+        from test_it_school.asgi import application
+
+        communicators = []
+        for _ in range(connections):
+            communicator = WebsocketCommunicator(application, '/ws/lesson/')
+            connected, _ = await communicator.connect()
+            if not connected:
+                raise CommandError("SimpleConsumer отклонил подключение, проверьте WEBSOCKET_LIMITS")
+            # Приветственное сообщение consumer
+            await communicator.receive_from()
+            communicators.append(communicator)
+
+        latencies = []
+        started = time.perf_counter()
+        try:
+            for i in range(broadcasts):
+                sent_at = time.perf_counter()
+                await LessonDomain.asend_websocket_message(f"Бенчмарк рассылки {i}")
+
+                async def receive(communicator):
+                    # heartbeat ping при долгом прогоне не считается доставкой
+                    while await communicator.receive_from(timeout=30) == PING:
+                        pass
+                    latencies.append(time.perf_counter() - sent_at)
+
+                await asyncio.gather(*(receive(c) for c in communicators))
+            duration = time.perf_counter() - started
+        finally:
+            for communicator in communicators:
+                await communicator.disconnect()
+        return summarize(latencies, duration)
+
+    def bench_reminders(self, options) -> dict:
+        """
+        Путь напоминания в celery_service: индекс в памяти, выборка тиком
+        диспетчера пачками и конкурентная доставка deliver_batch. Задержка -
+        от начала тика до доставки напоминания.
+        """
+        service_dir = options['celery_service'].resolve()
+        if not (service_dir / 'reminder_scheduler.py').exists():
+            raise CommandError(f"Не найден celery_service: {service_dir}")
+        sys.path.insert(0, str(service_dir))
+        try:
+            from notifier import FakeNotifier, deliver_batch
+            from reminder_scheduler import MemoryReminderIndex, ReminderScheduler
+        finally:
+            sys.path.remove(str(service_dir))
+
+        sent_at = {}
+
+        class TimedNotifier(FakeNotifier):
+            async def send(self, reminder, message):
+                await super().send(reminder, message)
+                sent_at[reminder['reminder_id']] = time.perf_counter()
+
+        scheduler = ReminderScheduler(
+            MemoryReminderIndex(), window=60, batch_size=options['reminder_batch_size']
+        )
+        now = time.time()
+        start_time = datetime.now().isoformat()
+        for i in range(options['reminders']):
+            scheduler.schedule(str(i), now + random.uniform(0, 30), {
+                'title': f'Бенчмарк {i}',
+                'start_time': start_time,
+                'is_early_notice': True,
+            })
+
+        notifier = TimedNotifier(delay=options['reminder_delay'])
+
+        def dispatch(batch):
+            reminders = [
+                {'reminder_id': reminder_id, 'due_ts': due_ts, **payload}
+                for reminder_id, due_ts, payload in batch
+            ]
+            current = scheduler.index.filter_current(reminders)
+            asyncio.run(deliver_batch(current, notifier, options['reminder_concurrency']))
+            scheduler.index.complete_many(current)
+
+        started = time.perf_counter()
+        scheduler.dispatch_due(dispatch, now=now)
+        duration = time.perf_counter() - started
+        latencies = [value - started for value in sent_at.values()]
+        return {'reminders[dispatch]': summarize(
+            latencies, duration, errors=options['reminders'] - len(latencies)
+        )}
+
+    @staticmethod
+    def _meta(options, scenarios) -> dict:
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        params = {
+            key: value for key, value in options.items()
+            if key in ('requests', 'concurrency', 'lessons', 'page_size', 'connections',
+                       'broadcasts', 'reminders', 'reminder_delay', 'reminder_concurrency',
+                       'reminder_batch_size', 'seed')
+        }
+        return {
+            'commit': commit,
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'scenarios': scenarios,
+            'params': params,
+        }
+
+    def _compare(self, previous: dict, results: dict):
+        """Изменение пропускной способности и p95 относительно прошлого запуска"""
+        self.stdout.write(f"Сравнение с {previous['meta'].get('commit') or 'прошлым запуском'}:")
+        for name, result in results.items():
+            before = previous['results'].get(name)
+            if before is None:
+                continue
+            self.stdout.write(
+                f"{name:<24} rps {before['throughput_rps']} -> {result['throughput_rps']} "
+                f"({self._change(before['throughput_rps'], result['throughput_rps'])})  "
+                f"p95 {before['p95_ms']}ms -> {result['p95_ms']}ms "
+                f"({self._change(before['p95_ms'], result['p95_ms'])})"
+            )
+
+    @staticmethod
+    def _change(before: float, after: float) -> str:
+        if not before:
+            return 'n/a'
+        return f"{(after - before) / before * 100:+.1f}%"
@@ -0,0 +1,68 @@
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.db.models import Count
+from lesson.benchmarks import summarize, temporary_database
+from lesson.domain import LessonDomain
+from lesson.models import Lesson, LessonArchive
+from lesson.pagination import KeysetPaginator
+
+
+class Command(BaseCommand):
+    help = (
+        "Рабочая таблица уроков до и после переноса истории в архив на временной базе, "
+        "заполненной generate_lessons: COUNT(*), счетчики по статусам, страницы "
+        "GET /lessons/ и скорость manage.py archive_lessons"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lessons', type=int, default=500000)
+        parser.add_argument('--days-back', type=int, default=365)
+        parser.add_argument('--retention-days', type=int, default=90)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=5,
+                            help="Повторов каждого запроса")
+
+    def handle(self, *args, **options):
+        with temporary_database():
+            call_command('generate_lessons', count=options['lessons'], seed=1, days_back=options['days_back'],
+                         report_every=options['lessons'], stdout=self.stdout)
+            before = self._run_queries(options['repeat'])
+
+            started = time.perf_counter()
+            result = LessonDomain.archive_lessons(
+                retention_days=options['retention_days'], batch_size=options['batch_size'], pause=0,
+            )
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"Перенесено в архив: {result['archived']} за {elapsed:.1f}с "
+                f"({result['archived'] / elapsed:.0f} уроков/с, {result['batches']} пачек)"
+            )
+            after = self._run_queries(options['repeat'])
+
+            self.stdout.write(f"Уроков в рабочей таблице: {Lesson.objects.count()}, "
+                              f"в архиве: {LessonArchive.objects.count()}")
+            self.stdout.write(f"{'query':<20}{'before p50 ms':>15}{'after p50 ms':>15}")
+            for name in before:
+                self.stdout.write(f"{name:<20}{before[name]['p50_ms']:>15.2f}{after[name]['p50_ms']:>15.2f}")
+
+    def _run_queries(self, repeat: int) -> dict:
+        queryset = Lesson.objects.all()
+        queries = {
+            'count': queryset.count,
+            'status counts': lambda: list(queryset.order_by().values('status').annotate(Count('id'))),
+            'page 1': lambda: list(Paginator(queryset.order_by(*KeysetPaginator.ordering), 20).page(1)),
+            'cursor first page': lambda: KeysetPaginator(queryset, 20).get_page(None),
+        }
+        return {name: self._measure(query, repeat) for name, query in queries.items()}
+
+    @staticmethod
+    def _measure(func, repeat: int) -> dict:
+        latencies = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            latencies.append(time.perf_counter() - started)
+        return summarize(latencies, sum(latencies))
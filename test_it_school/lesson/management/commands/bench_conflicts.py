@@ -0,0 +1,82 @@
+import random
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from lesson.benchmarks import summarize, temporary_database
+from lesson.intervals import lesson_intervals
+from lesson.models import Lesson
+
+
+class Command(BaseCommand):
+    help = (
+        "Проверка пересечений нового урока: индекс интервалов в памяти "
+        "(lesson.intervals) против запроса к БД по индексу (start_time, end_time). "
+        "Выполняется на временной SQLite-базе"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lessons', type=int, default=200000,
+                            help="Предстоящих уроков в базе")
+        parser.add_argument('--checks', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        start = datetime.now().replace(second=0, microsecond=0) + timedelta(days=1)
+        # Уроки на год вперед: сетка 15 минут, длительность 45-90 минут
+        slots = 365 * 24 * 4
+
+        with temporary_database():
+            self._seed(rng, start, slots, options['lessons'])
+            probes = [
+                start + timedelta(minutes=15 * rng.randrange(slots))
+                for _ in range(options['checks'])
+            ]
+
+            built = time.perf_counter()
+            lesson_intervals.invalidate()
+            lesson_intervals.overlapping(start, start)
+            self.stdout.write(f"Построение индекса: {(time.perf_counter() - built) * 1000:.0f} мс "
+                              f"({options['lessons']} уроков)")
+
+            for name, check in [('memory', self._check_memory), ('db', self._check_db)]:
+                latencies = []
+                conflicts = 0
+                for probe in probes:
+                    started = time.perf_counter()
+                    conflicts += bool(check(probe, probe + Lesson.DEFAULT_DURATION))
+                    latencies.append(time.perf_counter() - started)
+                result = summarize(latencies, sum(latencies))
+                self.stdout.write(
+                    f"{name:<8} p50={result['p50_ms']:.3f} мс p99={result['p99_ms']:.3f} мс "
+                    f"пересечений {conflicts}/{len(probes)}"
+                )
+
+    @staticmethod
+    def _seed(rng: random.Random, start: datetime, slots: int, count: int):
+        lessons = []
+        for i in range(count):
+            lesson_start = start + timedelta(minutes=15 * rng.randrange(slots))
+            lessons.append(Lesson(
+                title=f'Бенчмарк {i}',
+                start_time=lesson_start,
+                end_time=lesson_start + timedelta(minutes=rng.choice((45, 60, 90))),
+            ))
+        Lesson.objects.bulk_create(lessons, batch_size=5000)
+
+    @staticmethod
+    def _check_memory(start: datetime, end: datetime) -> list[int]:
+        return lesson_intervals.overlapping(start, end)
+
+    @staticmethod
+    def _check_db(start: datetime, end: datetime) -> list[int]:
+        """Тот же запрос, что понадобился бы форме без индекса в памяти"""
+        max_duration = timedelta(hours=settings.LESSON_SCHEDULE['MAX_DURATION_HOURS'])
+        window = Q(start_time__gte=start - max_duration, start_time__lt=end, end_time__gt=start)
+        return list(
+            Lesson.objects.filter(window).exclude(status='cancelled')
+            .order_by().values_list('id', flat=True)
+        )
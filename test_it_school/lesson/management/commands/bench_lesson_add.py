@@ -0,0 +1,57 @@
+import asyncio
+import contextlib
+import io
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from lesson.benchmarks import asgi_request, format_result, lesson_form_data, run_load, temporary_database
+
+from test_it_school.celery import external_celery
+
+ENDPOINTS = {
+    'sync': '/lesson_add/',
+    'async': '/lesson_add_async/',
+}
+
+
+class Command(BaseCommand):
+    help = "Сравнивает создание уроков через sync (lesson_add) и async (alesson_add) представления"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--mode', choices=['sync', 'async', 'both'], default='both')
+        parser.add_argument('--publishing', choices=['outbox', 'direct'],
+                            default=settings.LESSON_TASK_PUBLISHING,
+                            help="Режим публикации задач на время бенчмарка")
+
+    def handle(self, *args, **options):
+        settings.LESSON_TASK_PUBLISHING = options['publishing']
+        # Брокер и бэкенд результатов в памяти процесса
+        external_celery.conf.update(broker_url='memory://', result_backend='cache+memory://')
+
+        modes = ['sync', 'async'] if options['mode'] == 'both' else [options['mode']]
+        app = get_asgi_application()
+
+        with temporary_database():
+            for offset, mode in enumerate(modes):
+                # Печать из доменного слоя не должна влиять на замер
+                with contextlib.redirect_stdout(io.StringIO()):
+                    result = asyncio.run(self._bench(
+                        app, ENDPOINTS[mode], options['requests'], options['concurrency'],
+                        offset=offset * options['requests'],
+                    ))
+                self.stdout.write(format_result(f"lesson_add[{mode}]", result))
+
+    @staticmethod
+    async def _bench(app, path: str, total: int, concurrency: int, offset: int = 0) -> dict:
+        start = datetime.now() + timedelta(days=1)
+
+        async def request(i):
+            # Уроки второго режима идут после уроков первого, без пересечений
+            status, _ = await asgi_request(app, 'POST', path, lesson_form_data(offset + i, start))
+            return status == 201
+
+        return await run_load(request, total, concurrency)
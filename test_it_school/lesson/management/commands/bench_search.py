@@ -0,0 +1,60 @@
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from lesson.benchmarks import summarize, temporary_database
+from lesson.models import Lesson
+from lesson.search import Fts5SearchBackend, LikeSearchBackend
+
+QUERIES = [
+    'python',
+    'практ',
+    'django модели',
+    '"домашнее задание"',
+    'олимпиад',
+    'робототехники мини-проект',
+    'несуществующееслово',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Поиск уроков: индекс SQLite FTS5 против LIKE '%...%' на временной базе, "
+        "заполненной generate_lessons. Задержка ранжированного поиска (GET /lessons/search/) "
+        "и фильтра админки по каждому запросу"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lessons', type=int, default=1000000)
+        parser.add_argument('--repeat', type=int, default=5,
+                            help="Повторов каждого запроса")
+        parser.add_argument('--limit', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with temporary_database():
+            started = time.perf_counter()
+            call_command('generate_lessons', count=options['lessons'], seed=1,
+                         report_every=options['lessons'], stdout=self.stdout)
+            self.stdout.write(f"Заполнение с индексом FTS5: {time.perf_counter() - started:.1f}с")
+
+            backends = [Fts5SearchBackend(), LikeSearchBackend()]
+            self.stdout.write(f"{'query':<28}{'backend':<8}{'search p50 ms':>15}{'filter p50 ms':>15}{'found':>9}")
+            for query in QUERIES:
+                for backend in backends:
+                    # Список админки: COUNT по фильтру поиска
+                    matches = backend.filter(Lesson.objects.all(), query)
+                    search = self._measure(lambda: backend.search(query, options['limit']), options['repeat'])
+                    admin = self._measure(matches.count, options['repeat'])
+                    self.stdout.write(
+                        f"{query:<28}{backend.name:<8}{search['p50_ms']:>15.2f}"
+                        f"{admin['p50_ms']:>15.2f}{matches.count():>9}"
+                    )
+
+    @staticmethod
+    def _measure(func, repeat: int) -> dict:
+        latencies = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            latencies.append(time.perf_counter() - started)
+        return summarize(latencies, sum(latencies))
@@ -0,0 +1,117 @@
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from kombu.compression import compress
+from kombu.serialization import dumps
+from lesson.domain import LessonDomain
+from lesson.models import Lesson
+import redis
+
+from test_it_school.celery import external_celery
+
+BENCH_QUEUE = 'bench.payload'
+
+
+class Command(BaseCommand):
+    help = (
+        "Размер сообщений задач напоминаний: прежний формат (описание, datetime) "
+        "против компактного, json против msgpack, с zlib и без. С --redis-url "
+        "дополнительно публикует сообщения в Redis и замеряет рост памяти брокера"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help="Уроков в сообщении lesson.schedule_reminders")
+        parser.add_argument('--description-length', type=int, default=600,
+                            help="Длина описания урока в прежнем формате")
+        parser.add_argument('--redis-url', help="Брокер для замера памяти, например redis://localhost:6379/15")
+        parser.add_argument('--messages', type=int, default=10000,
+                            help="Сообщений lesson.schedule_reminder для замера памяти брокера")
+
+    def handle(self, *args, **options):
+        lessons = self._lessons(options['batch_size'], options['description_length'])
+        contracts = {
+            'legacy': [self._legacy_payload(lesson) for lesson in lessons],
+            'compact': [LessonDomain.lesson_payload(lesson) for lesson in lessons],
+        }
+
+        self.stdout.write(f"{'contract':<9}{'serializer':<12}{'compression':<13}"
+                          f"{'single B':>10}{'batch B':>10}{'B/lesson':>10}")
+        for contract, payloads in contracts.items():
+            for serializer in ('json', 'msgpack'):
+                for compression in (None, 'zlib'):
+                    single = self._body_size([payloads[0]], serializer, compression)
+                    batch = self._body_size([payloads], serializer, compression)
+                    self.stdout.write(
+                        f"{contract:<9}{serializer:<12}{compression or '-':<13}"
+                        f"{single:>10}{batch:>10}{batch / len(payloads):>10.1f}"
+                    )
+
+        if options['redis_url']:
+            self.stdout.write("Память Redis на сообщение lesson.schedule_reminder (с заголовками Celery):")
+            for contract, payloads in contracts.items():
+                for serializer in ('json', 'msgpack'):
+                    per_message = self._broker_memory(
+                        options['redis_url'], payloads, serializer, options['messages']
+                    )
+                    self.stdout.write(f"  {contract:<9}{serializer:<10}{per_message:>8.0f} B")
+
+    @staticmethod
+    def _lessons(count: int, description_length: int) -> list[Lesson]:
+        """Уроки в памяти: для размера сообщений БД не нужна"""
+        start = datetime.now().replace(second=0, microsecond=0) + timedelta(days=1)
+        description = ('Описание урока для бенчмарка. ' * description_length)[:description_length]
+        return [
+            Lesson(id=100000 + i, title=f'Бенчмарк {i}', description=description,
+                   start_time=start + timedelta(minutes=15 * i))
+            for i in range(count)
+        ]
+
+    @staticmethod
+    def _legacy_payload(lesson: Lesson) -> dict:
+        """Формат задачи до компактного контракта (как его сохранял outbox)"""
+        return {
+            'id': lesson.id,
+            'title': lesson.title,
+            'start_time': lesson.start_time.isoformat(),
+            'description': lesson.description,
+            'duration': 60,
+            'created_at': datetime.now().isoformat(),
+        }
+
+    @staticmethod
+    def _body_size(args: list, serializer: str, compression: str = None) -> int:
+        """Размер тела сообщения протокола Celery 2: (args, kwargs, embed)"""
+        _, _, body = dumps((args, {}, {'callbacks': None, 'errbacks': None, 'chain': None, 'chord': None}),
+                           serializer=serializer)
+        if compression:
+            body, _ = compress(body, compression)
+        return len(body)
+
+    def _broker_memory(self, redis_url: str, payloads: list, serializer: str, messages: int) -> float:
+        client = redis.Redis.from_url(redis_url)
+        try:
+            self._cleanup(client)
+        except redis.ConnectionError as e:
+            raise CommandError(f"Redis недоступен: {e}")
+        external_celery.conf.update(broker_url=redis_url)
+        before = client.info('memory')['used_memory']
+        with external_celery.producer_or_acquire() as producer:
+            for i in range(messages):
+                external_celery.send_task(
+                    'lesson.schedule_reminder', args=[payloads[i % len(payloads)]],
+                    queue=BENCH_QUEUE, serializer=serializer, ignore_result=True,
+                    producer=producer,
+                )
+        # Redis освобождает и выделяет память не мгновенно
+        time.sleep(0.5)
+        after = client.info('memory')['used_memory']
+        self._cleanup(client)
+        return (after - before) / messages
+
+    @staticmethod
+    def _cleanup(client):
+        keys = client.keys(f'{BENCH_QUEUE}*') + client.keys(f'_kombu.binding.{BENCH_QUEUE}*')
+        if keys:
+            client.delete(*keys)
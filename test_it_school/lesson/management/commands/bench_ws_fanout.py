@@ -0,0 +1,97 @@
+import asyncio
+import time
+
+from channels.layers import InMemoryChannelLayer
+from django.core.management.base import BaseCommand
+from lesson.domain import LessonDomain
+from ws_app.consumers import SimpleConsumer
+from ws_app.flow import FlowStats, SendQueue
+from ws_app.groups import BROADCAST_GROUP, lesson_group
+
+MESSAGE = "Урок «Введение в Python» начнется 2025-12-25 в 10:00 <br>" * 5
+
+
+class Command(BaseCommand):
+    help = (
+        "Бенчмарк рассылки по WebSocket: сериализация на каждое соединение "
+        "(send_simple_message) против заранее сериализованного сообщения "
+        "(send_encoded) и адресной рассылки в группу урока"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=10000)
+        parser.add_argument('--subscribers', type=int, default=50,
+                            help="Подписчиков группы урока для адресной рассылки")
+        parser.add_argument('--rounds', type=int, default=5)
+
+    def handle(self, *args, **options):
+        results = asyncio.run(self._bench(
+            options['connections'], options['subscribers'], options['rounds']
+        ))
+        for name, seconds, delivered in results:
+            self.stdout.write(
+                f"{name:<38} доставлено={delivered:<7} "
+                f"{seconds * 1000:>9.2f}ms на рассылку  "
+                f"{seconds / max(delivered, 1) * 1e6:>7.2f}µs на соединение"
+            )
+
+    async def _bench(self, connections: int, subscribers: int, rounds: int):
+        layer = InMemoryChannelLayer(capacity=rounds + 1)
+        consumers = {}
+        for i in range(connections):
+            channel = await layer.new_channel()
+            await layer.group_add(BROADCAST_GROUP, channel)
+            if i < subscribers:
+                await layer.group_add(lesson_group(1), channel)
+            consumers[channel] = self._simulated_consumer(rounds + 1)
+
+        legacy_event = {'type': 'send_simple_message', 'message': MESSAGE}
+        encoded_event = {'type': 'send_encoded', 'text': LessonDomain.encode_notification(MESSAGE)}
+
+        return [
+            ("broadcast / json.dumps на соединение",
+             *await self._measure(layer, consumers, BROADCAST_GROUP, legacy_event, rounds)),
+            ("broadcast / сериализация один раз",
+             *await self._measure(layer, consumers, BROADCAST_GROUP, encoded_event, rounds)),
+            ("группа урока / сериализация один раз",
+             *await self._measure(layer, consumers, lesson_group(1), encoded_event, rounds)),
+        ]
+
+    @staticmethod
+    def _simulated_consumer(queue_size: int):
+        """SimpleConsumer без сокета: отправка клиенту ничего не делает"""
+        consumer = SimpleConsumer()
+        consumer.closing = False
+        consumer.send_queue = SendQueue(queue_size, stats=FlowStats())
+
+        async def base_send(message):
+            pass
+
+        consumer.base_send = base_send
+        return consumer
+
+    @staticmethod
+    async def _measure(layer, consumers, group, event, rounds):
+        """
+        Время одной рассылки: group_send в channel layer плюс обработка
+        события каждым consumer, которому оно пришло.
+        """
+        total = 0.0
+        delivered = 0
+        for _ in range(rounds):
+            started = time.perf_counter()
+            await layer.group_send(group, event)
+            delivered = 0
+            for channel in layer.groups.get(group, {}):
+                consumer = consumers[channel]
+                queue = layer.channels.pop(channel, None)
+                if queue is None:
+                    continue
+                # Прямое чтение очереди: InMemoryChannelLayer.receive на каждый
+                # вызов обходит все каналы, что исказило бы замер на 10k соединений
+                _, message = queue.get_nowait()
+                await getattr(consumer, message['type'])(message)
+                await consumer.send(text_data=await consumer.send_queue.get())
+                delivered += 1
+            total += time.perf_counter() - started
+        return total / rounds, delivered
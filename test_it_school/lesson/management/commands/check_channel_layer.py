@@ -0,0 +1,137 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Проверяет, что рассылка LessonDomain.send_websocket_message из одного "
+        "процесса доходит до SimpleConsumer, подключенных в других процессах"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--listeners', type=int, default=2,
+                            help="Количество процессов с подключенным SimpleConsumer")
+        parser.add_argument('--timeout', type=float, default=10.0)
+        parser.add_argument('--fake-redis', type=int, metavar='PORT',
+                            help="Поднять локальную замену Redis (пакет fakeredis) "
+                                 "на порту PORT и проверить слой redis на ней")
+        parser.add_argument('--role', choices=['listen', 'send'],
+                            help="Служебный параметр для дочерних процессов")
+        parser.add_argument('--token', help="Служебный параметр для дочерних процессов")
+
+    def handle(self, *args, **options):
+        if options['role'] == 'listen':
+            asyncio.run(self._listen(options['timeout']))
+            return
+        if options['role'] == 'send':
+            from lesson.domain import LessonDomain
+
+            LessonDomain.send_websocket_message(options['token'])
+            return
+
+        env = dict(os.environ)
+        fake_server = None
+        if options['fake_redis']:
+            fake_server = self._start_fake_redis(options['fake_redis'])
+            env.update(
+                CHANNEL_LAYER='redis',
+                CHANNEL_REDIS_URLS=f"redis://127.0.0.1:{options['fake_redis']}/0",
+            )
+
+        try:
+            received = asyncio.run(self._check(env, options['listeners'], options['timeout']))
+        finally:
+            if fake_server is not None:
+                fake_server.shutdown()
+
+        for index, ok in enumerate(received):
+            self.stdout.write(f"{'✅' if ok else '❌'} Процесс-слушатель {index + 1}")
+        if not all(received):
+            raise CommandError(
+                f"Рассылку получили {sum(received)} из {len(received)} процессов. "
+                f"Для нескольких процессов нужен CHANNEL_LAYER=redis."
+            )
+        self.stdout.write(self.style.SUCCESS("Рассылка доходит до всех процессов"))
+
+    async def _check(self, env: dict, listeners: int, timeout: float) -> list[bool]:
+        token = f"check-{uuid.uuid4()}"
+        manage = [sys.executable, sys.argv[0], 'check_channel_layer', '--timeout', str(timeout)]
+
+        procs = [
+            await asyncio.create_subprocess_exec(
+                *manage, '--role', 'listen', env=env, stdout=asyncio.subprocess.PIPE
+            )
+            for _ in range(listeners)
+        ]
+        try:
+            for proc in procs:
+                await asyncio.wait_for(self._read_until(proc, 'READY'), timeout)
+
+            sender = await asyncio.create_subprocess_exec(
+                *manage, '--role', 'send', '--token', token, env=env,
+                stdout=asyncio.subprocess.DEVNULL
+            )
+            await sender.wait()
+
+            results = []
+            for proc in procs:
+                try:
+                    line = await asyncio.wait_for(self._read_until(proc, 'RECEIVED'), timeout)
+                    results.append(token in line)
+                except (asyncio.TimeoutError, EOFError):
+                    results.append(False)
+            return results
+        finally:
+            for proc in procs:
+                if proc.returncode is None:
+                    proc.kill()
+                await proc.wait()
+
+    @staticmethod
+    async def _read_until(proc, prefix: str) -> str:
+        while True:
+            line = await proc.stdout.readline()
+            if not line:
+                raise EOFError(f"Процесс завершился, не дождавшись {prefix}")
+            line = line.decode()
+            if line.startswith(prefix):
+                return line
+
+    async def _listen(self, timeout: float):
+        from channels.testing import WebsocketCommunicator
+
+        from test_it_school.asgi import application
+
+        communicator = WebsocketCommunicator(application, '/ws/lesson/')
+        connected, _ = await communicator.connect()
+        if not connected:
+            raise CommandError("SimpleConsumer не принял подключение")
+        # Приветственное сообщение consumer
+        await communicator.receive_from(timeout)
+        print('READY', flush=True)
+
+        try:
+            message = json.loads(await communicator.receive_from(timeout))
+        except asyncio.TimeoutError:
+            # При таймауте приложение уже остановлено communicator
+            print('TIMEOUT', flush=True)
+            return
+        print('RECEIVED', message.get('message'), flush=True)
+        await communicator.disconnect()
+
+    @staticmethod
+    def _start_fake_redis(port: int):
+        try:
+            from fakeredis import TcpFakeServer
+        except ImportError:
+            raise CommandError("Для --fake-redis нужен пакет fakeredis[lua]")
+
+        server = TcpFakeServer(('127.0.0.1', port), server_type='redis')
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
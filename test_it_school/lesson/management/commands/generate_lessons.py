@@ -0,0 +1,133 @@
+import random
+import time
+from datetime import datetime, timedelta
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import reset_queries, transaction
+from lesson.cache import lesson_list_cache
+from lesson.intervals import lesson_intervals
+from lesson.models import Lesson
+
+# Популярные часы начала и их относительный вес: утренние группы,
+# после школы и вечерние группы взрослых
+START_HOURS = {9: 2, 10: 4, 11: 3, 12: 1, 14: 2, 15: 4, 16: 5, 17: 4, 18: 6, 19: 6, 20: 3}
+WEEKDAY_WEIGHTS = [10, 10, 10, 10, 8, 5, 3]  # пн..вс
+
+TOPICS = [
+    'Введение в Python', 'Циклы и условия', 'Функции', 'ООП: классы и объекты',
+    'Работа с файлами', 'Основы SQL', 'Django: модели', 'Django: представления',
+    'HTML и CSS', 'JavaScript для начинающих', 'Алгоритмы сортировки', 'Git и GitHub',
+    'Асинхронность в Python', 'Тестирование с pytest', 'Scratch: первая игра',
+    'Основы робототехники', 'Unity: движение персонажа', 'Подготовка к олимпиаде',
+]
+GROUPS = ['Junior', 'Middle', 'Pro', 'Интенсив', 'Индивидуально']
+SENTENCES = [
+    'На занятии разберем теорию и сразу закрепим ее на практике.',
+    'Ученики выполнят несколько задач возрастающей сложности.',
+    'В конце урока - мини-проект, который можно показать родителям.',
+    'Преподаватель проверит домашнее задание и разберет типичные ошибки.',
+    'Понадобится ноутбук с установленной средой разработки.',
+    'Материалы урока и запись будут доступны в личном кабинете.',
+    'Повторим ключевые понятия прошлого занятия.',
+    'Работа в парах: один пишет код, второй проверяет.',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Генерирует уроки для нагрузочного тестирования пачками bulk_create: "
+        "реалистичные статусы, время начала по популярным часам, длинные описания"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=100000)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--days-back', type=int, default=365,
+                            help="Глубина истории: уроки начинаются с сегодня минус N дней")
+        parser.add_argument('--days-forward', type=int, default=90,
+                            help="Горизонт расписания вперед, дней")
+        parser.add_argument('--cancelled-ratio', type=float, default=0.07)
+        parser.add_argument('--description-sentences', type=int, default=12,
+                            help="Максимум предложений в описании")
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--report-every', type=int, default=100000,
+                            help="Печатать прогресс каждые N уроков")
+
+    def handle(self, *args, **options):
+        if options['count'] <= 0 or options['batch_size'] <= 0:
+            raise CommandError("--count и --batch-size должны быть положительными")
+        rng = random.Random(options['seed'])
+        lessons = self._generate(rng, options)
+
+        created = 0
+        next_report = options['report_every']
+        started = time.perf_counter()
+        while True:
+            batch = list(islice(lessons, options['batch_size']))
+            if not batch:
+                break
+            with transaction.atomic():
+                Lesson.objects.bulk_create(batch)
+            created += len(batch)
+            # При DEBUG=True Django копит текст запросов - на миллионах строк это память
+            reset_queries()
+
+            if created >= next_report:
+                next_report += options['report_every']
+                self.stdout.write(self._progress(created, started))
+
+        # bulk_create не вызывает сигналы Lesson
+        lesson_list_cache.invalidate()
+        lesson_intervals.invalidate()
+        self.stdout.write(self.style.SUCCESS(f"✅ Готово: {self._progress(created, started)}"))
+
+    @staticmethod
+    def _progress(created: int, started: float) -> str:
+        elapsed = time.perf_counter() - started
+        return f"{created} уроков за {elapsed:.1f}с, {created / elapsed:,.0f} строк/с"
+
+    def _generate(self, rng: random.Random, options: dict):
+        """
+        Ленивый поток уроков: в памяти одновременно только текущая пачка.
+
+        Прошедшие уроки в основном завершены, будущие - запланированы,
+        идущие сейчас - в процессе; часть уроков отменена.
+        """
+        now = datetime.now()
+        first_day = (now - timedelta(days=options['days_back'])).date()
+        days = options['days_back'] + options['days_forward'] + 1
+        hours, hour_weights = zip(*START_HOURS.items())
+
+        for i in range(options['count']):
+            # Дни недели с разным весом: будни загружены сильнее выходных
+            while True:
+                day = first_day + timedelta(days=rng.randrange(days))
+                if rng.random() * max(WEEKDAY_WEIGHTS) < WEEKDAY_WEIGHTS[day.weekday()]:
+                    break
+            start_time = datetime(day.year, day.month, day.day,
+                                  rng.choices(hours, hour_weights)[0],
+                                  rng.choice((0, 0, 0, 15, 30, 30, 45)))
+            end_time = start_time + timedelta(minutes=rng.choice((45, 45, 45, 60, 90)))
+
+            if rng.random() < options['cancelled_ratio']:
+                status = 'cancelled'
+            elif end_time <= now:
+                status = 'completed'
+            elif start_time <= now:
+                status = 'in_progress'
+            else:
+                status = 'scheduled'
+
+            lesson = Lesson(
+                title=f"{rng.choice(TOPICS)} ({rng.choice(GROUPS)}) #{i + 1}",
+                description=' '.join(rng.choices(
+                    SENTENCES, k=rng.randint(1, options['description_sentences'])
+                )),
+                start_time=start_time,
+                end_time=end_time,
+                status=status,
+                completed_at=end_time if status == 'completed' else None,
+            )
+            lesson.apply_defaults()
+            yield lesson
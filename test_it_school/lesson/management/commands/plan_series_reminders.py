@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+from lesson.aplication import lesson_app
+
+
+class Command(BaseCommand):
+    help = (
+        "Периодически ставит напоминания занятий повторяющихся уроков "
+        "на LESSON_SERIES['REMINDER_HORIZON_HOURS'] часов вперед"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=600,
+                            help="Пауза между запусками, сек")
+        parser.add_argument('--once', action='store_true',
+                            help="Выполнить один запуск и завершиться")
+
+    def handle(self, *args, **options):
+        self.stdout.write("✅ Планирование напоминаний серий запущено")
+        while True:
+            result = lesson_app.plan_series_reminders()
+            if result['reminders']:
+                self.stdout.write(
+                    f"🔔 Серий: {result['series']}, напоминаний: {result['reminders']}"
+                )
+            if options['once']:
+                break
+            time.sleep(options['interval'])
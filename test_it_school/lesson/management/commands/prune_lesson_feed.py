@@ -0,0 +1,21 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from lesson import feed
+
+
+class Command(BaseCommand):
+    help = (
+        "Удаляет старые записи журнала живой ленты уроков. Клиенты, "
+        "отставшие сильнее, получат при переподключении полный снимок"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=float,
+                            default=settings.LESSON_FEED['RETENTION_HOURS'],
+                            help="Хранить изменения за последние N часов")
+
+    def handle(self, *args, **options):
+        deleted = feed.prune(timedelta(hours=options['hours']))
+        self.stdout.write(f"🧹 Удалено записей журнала: {deleted}")
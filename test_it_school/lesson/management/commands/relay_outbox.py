@@ -0,0 +1,52 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from lesson.outbox import OutboxRelay
+
+
+class Command(BaseCommand):
+    help = "Отправляет накопленные в outbox сообщения в брокер Celery"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help="Сообщений за одну итерацию")
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help="Пауза между итерациями при пустом outbox, сек")
+        parser.add_argument('--max-attempts', type=int, default=10,
+                            help="Попыток отправки до статуса failed")
+        parser.add_argument('--lease', type=int, default=60,
+                            help="На сколько секунд пачка забирается на время публикации, "
+                                 "после этого ее повторит другой relay")
+        parser.add_argument('--purge-after', type=float, default=24,
+                            help="Удалять отправленные сообщения старше N часов")
+        parser.add_argument('--once', action='store_true',
+                            help="Разобрать outbox один раз и завершиться")
+
+    def handle(self, *args, **options):
+        relay = OutboxRelay(
+            batch_size=options['batch_size'],
+            max_attempts=options['max_attempts'],
+            lease=options['lease'],
+        )
+        purge_after = timedelta(hours=options['purge_after'])
+        last_purge = 0
+
+        self.stdout.write("✅ Outbox relay запущен")
+        while True:
+            result = relay.relay_batch()
+            if result['sent'] or result['failed'] or result['deferred']:
+                self.stdout.write(
+                    f"📤 Отправлено: {result['sent']}, ошибок: {result['failed']}, "
+                    f"отложено до повтора предыдущих: {result['deferred']}"
+                )
+
+            if time.monotonic() - last_purge > 60:
+                relay.purge_sent(purge_after)
+                last_purge = time.monotonic()
+
+            # Полная пачка - сразу берем следующую, иначе ждем новые сообщения
+            if result['sent'] + result['failed'] + result['deferred'] < relay.batch_size:
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
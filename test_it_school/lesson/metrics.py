@@ -0,0 +1,206 @@
+"""
+Метрики веб-процесса в текстовом формате Prometheus (GET /metrics).
+
+Счетчики и гистограммы живут в памяти процесса; при нескольких
+процессах Daphne каждый отдает свои значения, суммирует Prometheus.
+
+Замеры внутри запроса (запросы к БД, валидация формы, публикация в
+брокер, отправка в channel layer) дополнительно копятся в контексте
+запроса и попадают в заголовок Server-Timing, см. MetricsMiddleware.
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name: str, documentation: str, labels: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(label, '')) for label in self.labels)
+
+    def _format_labels(self, key: tuple, extra: dict = None) -> str:
+        pairs = list(zip(self.labels, key)) + list((extra or {}).items())
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+    def render(self) -> list[str]:
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type}']
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            lines.append(f'{self.name}{self._format_labels(key)} {value}')
+        return lines
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, *args, buckets: tuple = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # Ключ меток -> [счетчики по корзинам, сумма, количество]
+        self._values = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        with self._lock:
+            values = [(key, list(counts), total, count) for key, (counts, total, count) in self._values.items()]
+        for key, counts, total, count in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{self._format_labels(key, {"le": bound})} {cumulative}')
+            lines.append(f'{self.name}_bucket{self._format_labels(key, {"le": "+Inf"})} {count}')
+            lines.append(f'{self.name}_sum{self._format_labels(key)} {total}')
+            lines.append(f'{self.name}_count{self._format_labels(key)} {count}')
+        return lines
+
+
+REGISTRY = []
+
+http_request_duration = Histogram(
+    'it_school_http_request_duration_seconds', 'Время обработки HTTP-запроса',
+    ('method', 'endpoint', 'status'),
+)
+http_request_db_queries = Histogram(
+    'it_school_http_request_db_queries', 'Запросов к БД за HTTP-запрос',
+    ('endpoint',), buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 500),
+)
+http_request_db_duration = Histogram(
+    'it_school_http_request_db_duration_seconds', 'Суммарное время запросов к БД за HTTP-запрос',
+    ('endpoint',),
+)
+form_validation_duration = Histogram(
+    'it_school_form_validation_duration_seconds', 'Время валидации формы урока', ('form',),
+)
+broker_publish_duration = Histogram(
+    'it_school_broker_publish_duration_seconds', 'Время публикации задачи Celery (или записи в outbox)',
+    ('task', 'mode'),
+)
+channel_layer_send_duration = Histogram(
+    'it_school_channel_layer_send_duration_seconds', 'Время group_send в channel layer',
+    ('group',),
+)
+errors_total = Counter(
+    'it_school_errors_total', 'Перехваченные ошибки по месту возникновения', ('where',),
+)
+
+
+class RequestTimings:
+    """Замеры одного HTTP-запроса для заголовка Server-Timing"""
+
+    def __init__(self):
+        self.db_queries = 0
+        self.durations = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float):
+        with self._lock:
+            self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    def add_query(self, seconds: float):
+        with self._lock:
+            self.db_queries += 1
+            self.durations['db'] = self.durations.get('db', 0.0) + seconds
+
+    def server_timing(self, total: float) -> str:
+        parts = []
+        for name, seconds in self.durations.items():
+            desc = f';desc="{self.db_queries} queries"' if name == 'db' else ''
+            parts.append(f'{name};dur={seconds * 1000:.2f}{desc}')
+        parts.append(f'total;dur={total * 1000:.2f}')
+        return ', '.join(parts)
+
+
+# Контекст текущего запроса; sync_to_async и async_to_sync переносят его
+# в поток выполнения, поэтому замеры из ORM и доменного слоя попадают сюда
+current_timings = contextvars.ContextVar('current_timings', default=None)
+
+
+@contextmanager
+def timed(name: str, histogram: Histogram, **labels):
+    """Замеряет блок: наблюдение в гистограмму и отрезок name в Server-Timing"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        histogram.observe(elapsed, **labels)
+        timings = current_timings.get()
+        if timings is not None:
+            timings.add(name, elapsed)
+
+
+def db_execute_wrapper(execute, sql, params, many, context):
+    """execute_wrapper соединения БД: время и количество запросов текущего HTTP-запроса"""
+    timings = current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add_query(time.perf_counter() - started)
+
+
+def install_db_instrumentation(sender, connection, **kwargs):
+    """Обработчик connection_created: подключает db_execute_wrapper к новому соединению"""
+    if db_execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(db_execute_wrapper)
+
+
+def group_kind(group: str) -> str:
+    """Тип группы для метки: без id пользователя, сессии или урока"""
+    return group.split('.', 1)[0]
+
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
@@ -0,0 +1,64 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from lesson.metrics import RequestTimings, current_timings, http_request_db_duration, http_request_db_queries, \
+    http_request_duration
+
+
+class MetricsMiddleware:
+    """
+    Замеряет HTTP-запросы: гистограммы задержки по endpoint (шаблон URL),
+    количества и времени запросов к БД, а при METRICS_SERVER_TIMING -
+    заголовок Server-Timing с разбивкой времени запроса.
+
+    Для потоковых ответов замеряется время до начала отправки тела.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings, token, started = self._start()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self._finish(request, response, timings, started)
+
+    async def __acall__(self, request):
+        timings, token, started = self._start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self._finish(request, response, timings, started)
+
+    @staticmethod
+    def _start():
+        timings = RequestTimings()
+        return timings, current_timings.set(timings), time.perf_counter()
+
+    @staticmethod
+    def _finish(request, response, timings: RequestTimings, started: float):
+        elapsed = time.perf_counter() - started
+        match = getattr(request, 'resolver_match', None)
+        # Шаблон маршрута, а не путь: id и курсоры не раздувают число серий
+        endpoint = f"/{match.route}" if match is not None else 'unmatched'
+
+        http_request_duration.observe(
+            elapsed, method=request.method, endpoint=endpoint, status=response.status_code
+        )
+        http_request_db_queries.observe(timings.db_queries, endpoint=endpoint)
+        http_request_db_duration.observe(timings.durations.get('db', 0.0), endpoint=endpoint)
+
+        if settings.METRICS_SERVER_TIMING:
+            response['Server-Timing'] = timings.server_timing(elapsed)
+        return response
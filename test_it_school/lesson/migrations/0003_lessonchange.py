@@ -0,0 +1,32 @@
+# Generated by Django 5.2 on 2026-10-18 12:38
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lesson', '0002_outboxmessage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LessonChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lesson_id', models.BigIntegerField(verbose_name='ID урока')),
+                ('op', models.CharField(choices=[('create', 'Создан'), ('update', 'Изменен'), ('delete', 'Удален')], max_length=10, verbose_name='Операция')),
+                ('data', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Данные урока')),
+                ('start_time', models.DateTimeField(null=True, verbose_name='Время начала урока')),
+                ('previous_start_time', models.DateTimeField(null=True, verbose_name='Прежнее время начала')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата изменения')),
+            ],
+            options={
+                'verbose_name': 'Изменение урока',
+                'verbose_name_plural': 'Изменения уроков',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['created_at'], name='lesson_less_created_a4fbdd_idx')],
+            },
+        ),
+    ]
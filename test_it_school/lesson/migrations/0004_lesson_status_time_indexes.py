@@ -0,0 +1,21 @@
+# Generated by Django 5.2 on 2026-10-18 13:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lesson', '0003_lessonchange'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lesson',
+            index=models.Index(fields=['status', 'start_time'], name='lesson_status_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lesson',
+            index=models.Index(fields=['status', 'end_time'], name='lesson_status_end_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2 on 2026-10-18 13:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lesson', '0004_lesson_status_time_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='lesson',
+            name='lesson_less_start_t_2f4cd9_idx',
+        ),
+        migrations.AddIndex(
+            model_name='lesson',
+            index=models.Index(fields=['start_time', 'end_time'], name='lesson_start_end_idx'),
+        ),
+    ]
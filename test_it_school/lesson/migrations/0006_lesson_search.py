@@ -0,0 +1,73 @@
+"""
+Полнотекстовый индекс уроков для lesson.search: виртуальная таблица
+SQLite FTS5 и триггеры синхронизации. На других СУБД миграция ничего
+не делает, поиск идет через бэкенд like.
+
+DDL записан здесь, а не импортируется из lesson.search: изменения
+приложения не должны менять уже примененную миграцию.
+"""
+from django.db import migrations
+
+CREATE_SQL = [
+    # content='lesson_lesson' - таблица хранит только индекс, тексты берутся из уроков;
+    # prefix - отдельные индексы префиксов из 2 и 3 символов для поиска по началу слова
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS lesson_search USING fts5(
+        title, description,
+        content='lesson_lesson', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS lesson_search_insert AFTER INSERT ON lesson_lesson BEGIN
+        INSERT INTO lesson_search(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS lesson_search_delete AFTER DELETE ON lesson_lesson BEGIN
+        INSERT INTO lesson_search(lesson_search, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS lesson_search_update
+    AFTER UPDATE OF title, description ON lesson_lesson BEGIN
+        INSERT INTO lesson_search(lesson_search, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO lesson_search(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    "INSERT INTO lesson_search(lesson_search) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS lesson_search_insert",
+    "DROP TRIGGER IF EXISTS lesson_search_delete",
+    "DROP TRIGGER IF EXISTS lesson_search_update",
+    "DROP TABLE IF EXISTS lesson_search",
+]
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in CREATE_SQL:
+            schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in DROP_SQL:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lesson', '0005_lesson_start_end_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2 on 2026-10-18 13:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lesson', '0006_lesson_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LessonSeries',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=200, verbose_name='Название урока')),
+                ('description', models.TextField(blank=True, verbose_name='Описание')),
+                ('start_time', models.DateTimeField(verbose_name='Начало первого занятия')),
+                ('duration', models.PositiveIntegerField(default=45, verbose_name='Длительность, минут')),
+                ('frequency', models.CharField(choices=[('daily', 'Ежедневно'), ('weekly', 'Еженедельно')], default='weekly', max_length=10, verbose_name='Повторение')),
+                ('interval', models.PositiveSmallIntegerField(default=1, help_text='Каждые N дней или недель', verbose_name='Интервал')),
+                ('weekdays', models.CharField(blank=True, help_text='Для еженедельных: номера дней через запятую, 0 - понедельник; пусто - день первого занятия', max_length=13, verbose_name='Дни недели')),
+                ('until', models.DateTimeField(blank=True, null=True, verbose_name='Повторять до')),
+                ('status', models.CharField(choices=[('active', 'Активна'), ('cancelled', 'Отменена')], default='active', max_length=20, verbose_name='Статус')),
+                ('reminders_planned_until', models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Напоминания запланированы до')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'Серия уроков',
+                'verbose_name_plural': 'Серии уроков',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'reminders_planned_until'], name='series_reminders_idx')],
+                'constraints': [models.CheckConstraint(condition=models.Q(('interval__gte', 1)), name='series_interval_positive'), models.CheckConstraint(condition=models.Q(('duration__gte', 1)), name='series_duration_positive')],
+            },
+        ),
+        migrations.CreateModel(
+            name='LessonSeriesException',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('occurrence_start', models.DateTimeField(verbose_name='Время занятия по расписанию')),
+                ('start_time', models.DateTimeField(blank=True, help_text='Пусто - занятие отменено', null=True, verbose_name='Новое время')),
+                ('series', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exceptions', to='lesson.lessonseries', verbose_name='Серия')),
+            ],
+            options={
+                'verbose_name': 'Исключение серии',
+                'verbose_name_plural': 'Исключения серии',
+                'ordering': ['occurrence_start'],
+                'constraints': [models.UniqueConstraint(fields=('series', 'occurrence_start'), name='series_exception_unique')],
+            },
+        ),
+    ]
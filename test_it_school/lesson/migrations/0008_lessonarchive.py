@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-18 13:22
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lesson', '0007_lessonseries'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LessonArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='ID урока')),
+                ('title', models.CharField(max_length=200, verbose_name='Название урока')),
+                ('description', models.TextField(blank=True, verbose_name='Описание')),
+                ('start_time', models.DateTimeField(verbose_name='Время начала урока')),
+                ('end_time', models.DateTimeField(blank=True, null=True, verbose_name='Время окончания урока')),
+                ('status', models.CharField(choices=[('scheduled', 'Запланирован'), ('in_progress', 'В процессе'), ('completed', 'Завершен'), ('cancelled', 'Отменен')], max_length=20, verbose_name='Статус урока')),
+                ('created_at', models.DateTimeField(verbose_name='Дата создания')),
+                ('updated_at', models.DateTimeField(verbose_name='Дата обновления')),
+                ('completed_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата завершения')),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата архивации')),
+            ],
+            options={
+                'verbose_name': 'Архивный урок',
+                'verbose_name_plural': 'Архив уроков',
+                'ordering': ['-start_time'],
+                'indexes': [models.Index(fields=['start_time', 'end_time'], name='archive_start_end_idx')],
+            },
+        ),
+    ]
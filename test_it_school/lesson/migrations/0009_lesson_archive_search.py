@@ -0,0 +1,72 @@
+"""
+Полнотекстовый индекс архива уроков для lesson.search: виртуальная
+таблица SQLite FTS5 lesson_archive_search и триггеры синхронизации
+с lesson_lessonarchive, как у lesson_search в 0006. На других СУБД
+миграция ничего не делает, поиск идет через бэкенд like.
+
+DDL записан здесь, а не импортируется из lesson.search: изменения
+приложения не должны менять уже примененную миграцию.
+"""
+from django.db import migrations
+
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS lesson_archive_search USING fts5(
+        title, description,
+        content='lesson_lessonarchive', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS lesson_archive_search_insert AFTER INSERT ON lesson_lessonarchive BEGIN
+        INSERT INTO lesson_archive_search(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS lesson_archive_search_delete AFTER DELETE ON lesson_lessonarchive BEGIN
+        INSERT INTO lesson_archive_search(lesson_archive_search, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS lesson_archive_search_update
+    AFTER UPDATE OF title, description ON lesson_lessonarchive BEGIN
+        INSERT INTO lesson_archive_search(lesson_archive_search, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO lesson_archive_search(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    "INSERT INTO lesson_archive_search(lesson_archive_search) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS lesson_archive_search_insert",
+    "DROP TRIGGER IF EXISTS lesson_archive_search_delete",
+    "DROP TRIGGER IF EXISTS lesson_archive_search_update",
+    "DROP TABLE IF EXISTS lesson_archive_search",
+]
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in CREATE_SQL:
+            schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in DROP_SQL:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lesson', '0008_lessonarchive'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -1,5 +1,6 @@
 from django.utils import timezone
 from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
 
 from django.db import models
 
@@ -13,6 +14,9 @@ class Lesson(models.Model):
         ('completed', 'Завершен'),
         ('cancelled', 'Отменен'),
     ]
+    # Длительность урока без end_time
+    DEFAULT_DURATION = timezone.timedelta(minutes=45)
+
     title = models.CharField(verbose_name="Название урока",
                              max_length=200,
                              help_text="Например: 'Введение в Python'"
@@ -44,7 +48,12 @@ class Lesson(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['status']),
-            models.Index(fields=['start_time'])
+            # Диапазонные запросы по расписанию (GET /lessons/range/), префикс
+            # start_time обслуживает и сортировку по времени начала
+            models.Index(fields=['start_time', 'end_time'], name='lesson_start_end_idx'),
+            # Периодический перевод статусов по времени (LessonDomain.advance_statuses)
+            models.Index(fields=['status', 'start_time'], name='lesson_status_start_idx'),
+            models.Index(fields=['status', 'end_time'], name='lesson_status_end_idx'),
         ]
         constraints = [
             models.CheckConstraint(
@@ -56,19 +65,43 @@ class Lesson(models.Model):
     def __str__(self):
         return f"{self.title}"
 
-    def save(self, *args, **kwargs):
-        """Автоматически устанавливаем end_time, если не задан"""
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Запоминаем загруженные из БД значения, чтобы отслеживать изменения"""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def get_loaded_value(self, field_name: str):
+        """Значение поля на момент загрузки из БД (None для новых объектов)"""
+        return getattr(self, '_loaded_values', {}).get(field_name)
 
+    def apply_defaults(self):
+        """
+        Значения по умолчанию, которые выставляет save().
+
+        Вызывается отдельно перед bulk_create, который save() не вызывает.
+        """
         if not self.end_time and self.start_time:
             # По умолчанию: урок длится 45 минут
-            self.end_time = self.start_time + timezone.timedelta(minutes=45)
+            self.end_time = self.start_time + self.DEFAULT_DURATION
 
         # Если завершаем урок, ставим время завершения
         if self.status == 'completed' and not self.completed_at:
             self.completed_at = timezone.now()
 
+    def save(self, *args, **kwargs):
+        """Автоматически устанавливаем end_time, если не задан"""
+        self.apply_defaults()
+
         super().save(*args, **kwargs)
 
+        # Сохраненные значения становятся исходными для следующего сравнения
+        self._loaded_values = {
+            field.attname: getattr(self, field.attname)
+            for field in self._meta.concrete_fields
+        }
+
     def clean(self):
         """Валидация данных"""
         errors = {}
@@ -82,3 +115,295 @@ class Lesson(models.Model):
 
         if errors:
             raise ValidationError(errors)
+
+
+class LessonArchive(models.Model):
+    """
+    Архив уроков: завершенные и отмененные уроки старше
+    LESSON_ARCHIVE['RETENTION_DAYS'] переносит сюда LessonDomain.archive_lessons.
+
+    Рабочая таблица уроков остается небольшой, история доступна через
+    GET /lessons/range/, GET /lessons/search/, выгрузку с archive=1
+    и админку. id урока сохраняется.
+    """
+
+    # Поля, переносимые из Lesson без изменений
+    LESSON_FIELDS = ('id', 'title', 'description', 'start_time', 'end_time', 'status',
+                     'created_at', 'updated_at', 'completed_at')
+
+    id = models.BigIntegerField(primary_key=True, verbose_name="ID урока")
+    title = models.CharField(verbose_name="Название урока", max_length=200)
+    description = models.TextField(verbose_name="Описание", blank=True)
+    start_time = models.DateTimeField(verbose_name="Время начала урока")
+    end_time = models.DateTimeField(verbose_name="Время окончания урока", null=True, blank=True)
+    status = models.CharField(verbose_name="Статус урока",
+                              max_length=20,
+                              choices=Lesson.STATUS_CHOICES
+                              )
+    created_at = models.DateTimeField(verbose_name="Дата создания")
+    updated_at = models.DateTimeField(verbose_name="Дата обновления")
+    completed_at = models.DateTimeField(null=True, blank=True, verbose_name="Дата завершения")
+    archived_at = models.DateTimeField(verbose_name="Дата архивации", default=timezone.now)
+
+    class Meta:
+        verbose_name = "Архивный урок"
+        verbose_name_plural = "Архив уроков"
+        ordering = ['-start_time']
+        indexes = [
+            # Диапазонные запросы по истории и выгрузка по времени начала
+            models.Index(fields=['start_time', 'end_time'], name='archive_start_end_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.title}"
+
+    @classmethod
+    def from_lesson(cls, lesson: Lesson, archived_at=None) -> 'LessonArchive':
+        return cls(
+            **{field: getattr(lesson, field) for field in cls.LESSON_FIELDS},
+            archived_at=archived_at or timezone.now(),
+        )
+
+
+class LessonSeries(models.Model):
+    """
+    Повторяющийся урок (курс): правило повторения вместо строки Lesson
+    на каждое занятие.
+
+    Занятия вычисляются по правилу только для запрошенного промежутка
+    (lesson.series), напоминания планируются на скользящий горизонт
+    LESSON_SERIES['REMINDER_HORIZON_HOURS'] (manage.py plan_series_reminders).
+    """
+
+    FREQUENCY_CHOICES = [
+        ('daily', 'Ежедневно'),
+        ('weekly', 'Еженедельно'),
+    ]
+    STATUS_CHOICES = [
+        ('active', 'Активна'),
+        ('cancelled', 'Отменена'),
+    ]
+    # Поля правила: при их изменении запланированные напоминания пересчитываются
+    RULE_FIELDS = ('title', 'start_time', 'duration', 'frequency', 'interval', 'weekdays', 'until', 'status')
+
+    title = models.CharField(verbose_name="Название урока", max_length=200)
+    description = models.TextField(verbose_name="Описание", blank=True)
+    start_time = models.DateTimeField(verbose_name="Начало первого занятия")
+    duration = models.PositiveIntegerField(verbose_name="Длительность, минут", default=45)
+    frequency = models.CharField(verbose_name="Повторение",
+                                 max_length=10,
+                                 choices=FREQUENCY_CHOICES,
+                                 default='weekly'
+                                 )
+    interval = models.PositiveSmallIntegerField(verbose_name="Интервал",
+                                                default=1,
+                                                help_text="Каждые N дней или недель"
+                                                )
+    weekdays = models.CharField(verbose_name="Дни недели",
+                                max_length=13,
+                                blank=True,
+                                help_text="Для еженедельных: номера дней через запятую, "
+                                          "0 - понедельник; пусто - день первого занятия"
+                                )
+    until = models.DateTimeField(verbose_name="Повторять до", null=True, blank=True)
+    status = models.CharField(verbose_name="Статус",
+                              max_length=20,
+                              choices=STATUS_CHOICES,
+                              default='active'
+                              )
+    reminders_planned_until = models.DateTimeField(verbose_name="Напоминания запланированы до",
+                                                   null=True,
+                                                   blank=True,
+                                                   editable=False
+                                                   )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+
+    class Meta:
+        verbose_name = "Серия уроков"
+        verbose_name_plural = "Серии уроков"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'reminders_planned_until'], name='series_reminders_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                check=models.Q(interval__gte=1),
+                name="series_interval_positive"
+            ),
+            models.CheckConstraint(
+                check=models.Q(duration__gte=1),
+                name="series_duration_positive"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.title} ({self.get_frequency_display().lower()})"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Запоминаем загруженные из БД значения, чтобы отслеживать изменения"""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def loaded_copy(self):
+        """Серия в состоянии на момент загрузки из БД (None для новых объектов)"""
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return None
+        return LessonSeries(**loaded)
+
+    def rule_changed(self) -> bool:
+        previous = self.loaded_copy()
+        return previous is not None and any(
+            getattr(previous, field) != getattr(self, field) for field in self.RULE_FIELDS
+        )
+
+    def save(self, *args, **kwargs):
+        # Отметку планирования переносит только UPDATE в LessonDomain:
+        # сохранение объекта, загруженного раньше, не должно ее затирать
+        if not self._state.adding and not kwargs.get('force_insert') and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'reminders_planned_until'
+            ]
+        super().save(*args, **kwargs)
+        self._loaded_values = {
+            field.attname: getattr(self, field.attname)
+            for field in self._meta.concrete_fields
+        }
+
+    def clean(self):
+        """Валидация данных"""
+        errors = {}
+        try:
+            days = self.weekday_list()
+        except ValueError:
+            days = None
+        if days is None or any(day > 6 for day in days):
+            errors['weekdays'] = 'Номера дней недели от 0 до 6 через запятую'
+        if self.until and self.start_time and self.until < self.start_time:
+            errors['until'] = 'Дата окончания серии раньше первого занятия'
+        if errors:
+            raise ValidationError(errors)
+
+    def weekday_list(self) -> list[int]:
+        """Дни недели занятий (0 - понедельник) по возрастанию"""
+        if self.weekdays:
+            return sorted({int(day) for day in self.weekdays.split(',') if day.strip()})
+        return [self.start_time.weekday()]
+
+
+class LessonSeriesException(models.Model):
+    """Исключение из правила серии: занятие отменено или перенесено"""
+
+    series = models.ForeignKey(LessonSeries,
+                               verbose_name="Серия",
+                               related_name='exceptions',
+                               on_delete=models.CASCADE
+                               )
+    occurrence_start = models.DateTimeField(verbose_name="Время занятия по расписанию")
+    start_time = models.DateTimeField(verbose_name="Новое время",
+                                      null=True,
+                                      blank=True,
+                                      help_text="Пусто - занятие отменено"
+                                      )
+
+    class Meta:
+        verbose_name = "Исключение серии"
+        verbose_name_plural = "Исключения серии"
+        ordering = ['occurrence_start']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['series', 'occurrence_start'],
+                name="series_exception_unique"
+            )
+        ]
+
+    def __str__(self):
+        if self.start_time is None:
+            return f"{self.occurrence_start:%d.%m.%Y %H:%M} отменено"
+        return f"{self.occurrence_start:%d.%m.%Y %H:%M} -> {self.start_time:%d.%m.%Y %H:%M}"
+
+
+class OutboxMessage(models.Model):
+    """
+    Исходящее сообщение для брокера Celery (transactional outbox).
+
+    Пишется в той же транзакции, что и изменение урока, и отправляется
+    в брокер отдельным процессом (manage.py relay_outbox). Так HTTP-запрос
+    не ждет брокер, а сообщение не теряется, если брокер недоступен.
+    """
+
+    STATUS_CHOICES = [
+        ('pending', 'Ожидает отправки'),
+        ('sent', 'Отправлено'),
+        ('failed', 'Ошибка'),
+    ]
+    task_name = models.CharField(verbose_name="Имя задачи", max_length=200)
+    args = models.JSONField(verbose_name="Аргументы задачи",
+                            default=list,
+                            encoder=DjangoJSONEncoder
+                            )
+    status = models.CharField(verbose_name="Статус",
+                              max_length=20,
+                              choices=STATUS_CHOICES,
+                              default='pending'
+                              )
+    attempts = models.PositiveIntegerField(verbose_name="Попыток отправки", default=0)
+    available_at = models.DateTimeField(verbose_name="Отправить не раньше",
+                                        default=timezone.now
+                                        )
+    last_error = models.TextField(verbose_name="Последняя ошибка", blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name="Дата отправки")
+
+    class Meta:
+        verbose_name = "Исходящее сообщение"
+        verbose_name_plural = "Исходящие сообщения"
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'available_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.task_name} #{self.id} ({self.status})"
+
+
+class LessonChange(models.Model):
+    """
+    Журнал изменений уроков для живой ленты по WebSocket.
+
+    id записи - порядковый номер изменения (seq): клиент ленты запоминает
+    последний полученный seq и после переподключения запрашивает только
+    изменения после него.
+    """
+
+    OP_CHOICES = [
+        ('create', 'Создан'),
+        ('update', 'Изменен'),
+        ('delete', 'Удален'),
+    ]
+    lesson_id = models.BigIntegerField(verbose_name="ID урока")
+    op = models.CharField(verbose_name="Операция", max_length=10, choices=OP_CHOICES)
+    data = models.JSONField(verbose_name="Данные урока",
+                            default=dict,
+                            encoder=DjangoJSONEncoder
+                            )
+    start_time = models.DateTimeField(verbose_name="Время начала урока", null=True)
+    previous_start_time = models.DateTimeField(verbose_name="Прежнее время начала",
+                                               null=True
+                                               )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата изменения")
+
+    class Meta:
+        verbose_name = "Изменение урока"
+        verbose_name_plural = "Изменения уроков"
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['created_at']),
+        ]
+
+    def __str__(self):
+        return f"#{self.id} {self.op} урока {self.lesson_id}"
@@ -0,0 +1,186 @@
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from lesson.models import OutboxMessage
+
+from test_it_school.celery import external_celery
+
+
+def reminder_keys(message: OutboxMessage) -> set[str]:
+    """id напоминаний, которых касается сообщение: порядок важен только внутри одного id"""
+    if message.task_name == 'lesson.schedule_reminders':
+        return {str(lesson['id']) for lesson in message.args[0]}
+    if message.task_name == 'lesson.schedule_reminder':
+        return {str(message.args[0]['id'])}
+    if message.task_name == 'lesson.cancel_reminder':
+        return {str(message.args[0])}
+    return set()
+
+
+class OutboxRelay:
+    """
+    Переносит сообщения из таблицы OutboxMessage в брокер Celery.
+
+    Сообщения выбираются пачками в порядке id; публикация пачки идет
+    через одно соединение с брокером. Неудачные сообщения откладываются
+    с экспоненциальной задержкой и после max_attempts попыток помечаются
+    как failed.
+
+    Пока более раннее сообщение того же напоминания отложено после ошибки,
+    следующие за ним откладываются до того же времени: отмена не уйдет
+    в брокер раньше постановки, которую она должна отменить.
+
+    Attributes:
+        batch_size (int): Сообщений за одну итерацию
+        max_attempts (int): Попыток до статуса failed
+        max_backoff (int): Верхняя граница задержки между попытками, сек
+        lease (int): На сколько секунд пачка забирается на время публикации
+    """
+
+    def __init__(self, batch_size: int = 100, max_attempts: int = 10, max_backoff: int = 300,
+                 lease: int = 60):
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.max_backoff = max_backoff
+        self.lease = lease
+
+    def relay_batch(self) -> dict:
+        """
+        Отправляет одну пачку готовых к отправке сообщений.
+
+        Транзакции короткие, публикация в брокер идет вне транзакции:
+        на SQLite открытая транзакция держит блокировку БД, и зависший
+        брокер не должен останавливать запись уроков. Порядок:
+            1. пачка забирается в аренду - available_at сдвигается на lease
+               секунд, другие relay-процессы ее не возьмут, а более поздние
+               сообщения тех же напоминаний ждут ее (см. _blocked_keys);
+            2. публикация без транзакции;
+            3. статусы отправленных, неудачных и отложенных сообщений.
+        Если процесс упадет между 2 и 3, сообщения уйдут повторно после
+        окончания аренды (at-least-once, как и раньше).
+
+        Returns:
+            dict: Количество отправленных, неудачных и отложенных
+                  из-за порядка сообщений
+        """
+        now = timezone.now()
+        messages, waiting, blocked = self._claim(now)
+        if not messages:
+            return {'sent': 0, 'failed': 0, 'deferred': waiting}
+
+        sent_ids = []
+        failures = []
+        deferred = []
+        with external_celery.producer_or_acquire() as producer:
+            for message in messages:
+                keys = reminder_keys(message)
+                until = max((blocked[key] for key in keys if key in blocked), default=None)
+                if until is not None:
+                    deferred.append((message, until))
+                    continue
+                try:
+                    external_celery.send_task(
+                        message.task_name,
+                        args=message.args,
+                        producer=producer,
+                        # Результат никто не читает: без подписки на бэкенд результатов
+                        ignore_result=True
+                    )
+                    sent_ids.append(message.id)
+                except Exception as e:
+                    failures.append((message, e))
+                    self._retry_at(message, timezone.now())
+                    if message.status == 'pending':
+                        self._block(blocked, keys, message.available_at)
+
+        with transaction.atomic():
+            OutboxMessage.objects.filter(id__in=sent_ids).update(
+                status='sent',
+                sent_at=timezone.now(),
+                attempts=F('attempts') + 1
+            )
+            for message, error in failures:
+                self._mark_failed(message, error)
+            for message, until in deferred:
+                message.available_at = until
+                message.save(update_fields=['available_at'])
+
+        return {'sent': len(sent_ids), 'failed': len(failures), 'deferred': waiting + len(deferred)}
+
+    def _claim(self, now) -> tuple[list, int, dict]:
+        """
+        Забирает пачку в аренду до now + lease. Сообщения, которые ждут
+        более ранних сообщений тех же напоминаний, откладываются сразу.
+
+        Returns:
+            tuple: сообщения для публикации, сколько отложено,
+                   напоминания с более ранними сообщениями -> время повтора
+        """
+        lease_until = now + timedelta(seconds=self.lease)
+        claimed = []
+        deferred = 0
+        with transaction.atomic():
+            qs = OutboxMessage.objects.filter(
+                status='pending',
+                available_at__lte=now
+            ).order_by('id')
+            # Несколько relay-процессов не возьмут одну и ту же пачку
+            if connection.features.has_select_for_update_skip_locked:
+                qs = qs.select_for_update(skip_locked=True)
+            messages = list(qs[:self.batch_size])
+            if not messages:
+                return [], 0, {}
+
+            blocked = self._blocked_keys(now, before_id=messages[-1].id)
+            for message in messages:
+                keys = reminder_keys(message)
+                until = max((blocked[key] for key in keys if key in blocked), default=None)
+                if until is not None:
+                    message.available_at = until
+                    message.save(update_fields=['available_at'])
+                    deferred += 1
+                    continue
+                # Без SKIP LOCKED (SQLite) пачку мог уже забрать другой relay
+                taken = OutboxMessage.objects.filter(
+                    id=message.id, status='pending', available_at__lte=now
+                ).update(available_at=lease_until)
+                if taken:
+                    message.available_at = lease_until
+                    claimed.append(message)
+        return claimed, deferred, blocked
+
+    def _blocked_keys(self, now, before_id: int) -> dict:
+        """Напоминания с отложенными сообщениями раньше before_id -> время повтора"""
+        blocked = {}
+        earlier = OutboxMessage.objects.filter(status='pending', available_at__gt=now, id__lt=before_id)
+        for message in earlier.only('task_name', 'args', 'available_at'):
+            self._block(blocked, reminder_keys(message), message.available_at)
+        return blocked
+
+    @staticmethod
+    def _block(blocked: dict, keys: set[str], until):
+        for key in keys:
+            blocked[key] = max(blocked.get(key, until), until)
+
+    def purge_sent(self, older_than: timedelta) -> int:
+        """Удаляет отправленные сообщения старше older_than"""
+        deleted, _ = OutboxMessage.objects.filter(
+            status='sent',
+            sent_at__lt=timezone.now() - older_than
+        ).delete()
+        return deleted
+
+    def _retry_at(self, message: OutboxMessage, now):
+        """Следующая попытка после ошибки: счетчик, статус и время повтора"""
+        message.attempts += 1
+        if message.attempts >= self.max_attempts:
+            message.status = 'failed'
+        else:
+            delay = min(2 ** message.attempts, self.max_backoff)
+            message.available_at = now + timedelta(seconds=delay)
+
+    def _mark_failed(self, message: OutboxMessage, error: Exception):
+        message.last_error = str(error)
+        message.save(update_fields=['attempts', 'last_error', 'status', 'available_at'])
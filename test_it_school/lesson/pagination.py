@@ -0,0 +1,105 @@
+import base64
+import json
+from datetime import datetime
+
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    """Курсор не удалось разобрать: поврежден или подделан клиентом"""
+
+
+def encode_cursor(start_time: datetime, lesson_id: int, occurrence_start: datetime = None) -> str:
+    """
+    Кодирует позицию в выдаче в непрозрачный для клиента курсор.
+
+    Курсор содержит пару (start_time, id) последнего отданного урока,
+    id используется как tie-breaker для уроков с одинаковым временем начала.
+    У занятий серий (lesson.series) третьим элементом идет occurrence_start:
+    id у всех занятий одной серии общий.
+    """
+    position = [start_time.isoformat(), lesson_id]
+    if occurrence_start is not None:
+        position.append(occurrence_start.isoformat())
+    raw = json.dumps(position, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """
+    Обратная операция к encode_cursor: (start_time, id)
+    или (start_time, id, occurrence_start)
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        start_time_iso, lesson_id, *rest = json.loads(base64.urlsafe_b64decode(padded))
+        if len(rest) > 1:
+            raise ValueError("лишние элементы курсора")
+        times = [datetime.fromisoformat(value) for value in (start_time_iso, *rest)]
+        # encode_cursor пишет время без зоны (USE_TZ=False), время с зоной - подделка
+        if any(value.tzinfo is not None for value in times):
+            raise ValueError("время курсора с часовым поясом")
+        return times[0], int(lesson_id), *times[1:]
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f"Некорректный курсор: {cursor!r}") from e
+
+
+class KeysetPaginator:
+    """
+    Пагинация по ключу (keyset / cursor) для выдачи уроков.
+
+    В отличие от django.core.paginator.Paginator не выполняет COUNT(*)
+    и OFFSET: следующая страница выбирается условием
+    (start_time, id) < (курсор) по индексу start_time, поэтому стоимость
+    запроса не зависит от глубины страницы.
+
+    Порядок выдачи: -start_time, -id.
+    """
+
+    ordering = ('-start_time', '-id')
+
+    def __init__(self, queryset, per_page: int):
+        self.queryset = queryset.order_by(*self.ordering)
+        self.per_page = per_page
+
+    def get_page(self, cursor: str | None = None) -> dict:
+        """
+        Возвращает страницу после позиции cursor.
+
+        Returns:
+            dict: object_list - уроки страницы,
+                  next_cursor - курсор следующей страницы или None,
+                  has_next - есть ли следующая страница
+        """
+        position = decode_cursor(cursor) if cursor else None
+
+        # Берем на одну запись больше, чтобы узнать о наличии следующей страницы
+        object_list = self.fetch(position, self.per_page + 1)
+        has_next = len(object_list) > self.per_page
+        object_list = object_list[:self.per_page]
+
+        next_cursor = None
+        if has_next:
+            last = object_list[-1]
+            next_cursor = encode_cursor(*self.position(last))
+
+        return {
+            'object_list': object_list,
+            'next_cursor': next_cursor,
+            'has_next': has_next,
+        }
+
+    def position(self, item) -> tuple:
+        """Позиция записи в выдаче для курсора"""
+        return item.start_time, item.id
+
+    def fetch(self, position: tuple | None, limit: int) -> list:
+        """Первые limit записей после позиции (start_time, id) в порядке выдачи"""
+        qs = self.queryset
+        if position:
+            start_time, lesson_id = position[:2]
+            qs = qs.filter(
+                Q(start_time__lt=start_time)
+                | Q(start_time=start_time, id__lt=lesson_id)
+            )
+        return list(qs[:limit])
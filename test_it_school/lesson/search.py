@@ -0,0 +1,236 @@
+"""
+Полнотекстовый поиск уроков по названию и описанию (GET /lessons/search/
+и поиск в админке).
+
+Ищутся и рабочие уроки, и архив (LessonArchive). Бэкенд выбирается
+настройкой LESSON_SEARCH['BACKEND']:
+    fts5 - виртуальные таблицы SQLite FTS5 lesson_search (миграция 0006)
+           и lesson_archive_search (миграция 0009), синхронизируются
+           со своими таблицами триггерами, в том числе при bulk_create
+           и update(), которые не вызывают сигналы;
+    like - LIKE '%...%' по title и description для других СУБД, без индекса;
+    auto - fts5 на SQLite, иначе like;
+    путь к классу - собственный бэкенд с методами search() и filter().
+
+Запрос: слова ищутся по префиксу (прогр -> программирование), фраза
+в кавычках - целиком, все условия должны выполняться одновременно.
+"""
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, QuerySet, When
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+from lesson.models import Lesson, LessonArchive
+
+FTS5_TABLE = 'lesson_search'
+ARCHIVE_FTS5_TABLE = 'lesson_archive_search'
+
+
+def fts5_table_sql(table: str, content: str) -> str:
+    # content - таблица хранит только индекс, тексты берутся из content;
+    # prefix - отдельные индексы префиксов из 2 и 3 символов для поиска по началу слова
+    return f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5(
+            title, description,
+            content='{content}', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+    """
+
+
+def fts5_triggers_sql(table: str, content: str) -> dict:
+    """Триггеры синхронизации индекса table с таблицей content: {имя: DDL}"""
+    return {
+        f'{table}_insert': f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_insert AFTER INSERT ON {content} BEGIN
+                INSERT INTO {table}(rowid, title, description)
+                VALUES (new.id, new.title, new.description);
+            END
+        """,
+        f'{table}_delete': f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_delete AFTER DELETE ON {content} BEGIN
+                INSERT INTO {table}({table}, rowid, title, description)
+                VALUES ('delete', old.id, old.title, old.description);
+            END
+        """,
+        # Смена статуса или времени индекс не трогает
+        f'{table}_update': f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_update
+            AFTER UPDATE OF title, description ON {content} BEGIN
+                INSERT INTO {table}({table}, rowid, title, description)
+                VALUES ('delete', old.id, old.title, old.description);
+                INSERT INTO {table}(rowid, title, description)
+                VALUES (new.id, new.title, new.description);
+            END
+        """,
+    }
+
+
+# Индексы FTS5: рабочие уроки (миграция 0006) и архив (миграция 0009)
+FTS5_INDEXES = {
+    Lesson: FTS5_TABLE,
+    LessonArchive: ARCHIVE_FTS5_TABLE,
+}
+
+
+def install_fts5(connection, model=Lesson):
+    """Создает таблицу FTS5 и триггеры модели и перестраивает индекс по ее таблице"""
+    table, content = FTS5_INDEXES[model], model._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(fts5_table_sql(table, content))
+        for sql in fts5_triggers_sql(table, content).values():
+            cursor.execute(sql)
+        cursor.execute(f"INSERT INTO {table}({table}) VALUES ('rebuild')")
+
+
+def repair_fts5(connection) -> bool:
+    """
+    Восстанавливает триггеры после миграций (post_migrate).
+
+    Изменение Lesson или LessonArchive на SQLite Django выполняет
+    пересозданием таблицы, и ее триггеры удаляются вместе со старой таблицей.
+
+    Returns:
+        bool: триггеры были восстановлены, индекс перестроен
+    """
+    if connection.vendor != 'sqlite':
+        return False
+    repaired = False
+    for model, table in FTS5_INDEXES.items():
+        triggers = fts5_triggers_sql(table, model._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger') AND name IN (%s, %s, %s, %s)",
+                [table, *triggers]
+            )
+            existing = {row[0] for row in cursor.fetchall()}
+        if table not in existing or existing >= set(triggers):
+            continue
+        install_fts5(connection, model)
+        repaired = True
+    return repaired
+
+
+_TERM_RE = re.compile(r'"([^"]*)"?|(\S+)')
+_WORD_RE = re.compile(r'\w+')
+
+
+def parse_query(query: str) -> list[tuple[str, bool]]:
+    """
+    Разбирает строку поиска на условия (текст, фраза ли).
+
+    Знаки препинания и операторы FTS5 отбрасываются: в запрос попадают
+    только слова, поэтому пользовательский ввод не ломает синтаксис MATCH.
+    """
+    terms = []
+    for phrase, word in _TERM_RE.findall(query):
+        words = _WORD_RE.findall(phrase or word)
+        if phrase and len(words) > 1:
+            terms.append((' '.join(words), True))
+        else:
+            terms.extend((w, False) for w in words)
+    return terms
+
+
+class LikeSearchBackend:
+    """
+    Поиск через LIKE для СУБД без полнотекстового индекса: полный просмотр
+    таблицы. На SQLite регистр не учитывается только для латиницы.
+    """
+
+    name = 'like'
+
+    def filter(self, queryset: QuerySet, query: str) -> QuerySet:
+        for text, _ in parse_query(query):
+            queryset = queryset.filter(Q(title__icontains=text) | Q(description__icontains=text))
+        return queryset
+
+    def search(self, query: str, limit: int) -> list[Lesson | LessonArchive]:
+        terms = parse_query(query)
+        if not terms:
+            return []
+        # Совпадения в названии выше совпадений только в описании
+        in_title = Q()
+        for text, _ in terms:
+            in_title &= Q(title__icontains=text)
+        found = []
+        for model in (Lesson, LessonArchive):
+            found.extend(
+                self.filter(model.objects.all(), query)
+                .annotate(title_match=Case(When(in_title, then=0), default=1, output_field=IntegerField()))
+                .order_by('title_match', '-start_time', '-id')[:limit]
+            )
+        # Тот же порядок для обеих таблиц вместе: сортировка устойчивая
+        found.sort(key=lambda lesson: (lesson.start_time, lesson.id), reverse=True)
+        found.sort(key=lambda lesson: lesson.title_match)
+        return found[:limit]
+
+
+class Fts5SearchBackend:
+    """
+    Поиск по виртуальным таблицам SQLite FTS5 lesson_search
+    и lesson_archive_search.
+
+    Таблицы хранят только индекс (content='lesson_lesson'
+    и 'lesson_lessonarchive'), тексты уроков не дублируются.
+    Релевантность - bm25 с весом названия LESSON_SEARCH['TITLE_WEIGHT']
+    относительно описания; у уроков и архива она общая.
+    """
+
+    name = 'fts5'
+    tables = FTS5_INDEXES
+
+    @staticmethod
+    def match_expression(query: str) -> str:
+        """Строка поиска -> выражение MATCH: слова по префиксу, фразы целиком"""
+        return ' '.join(
+            f'"{text}"' if is_phrase else f'"{text}"*'
+            for text, is_phrase in parse_query(query)
+        )
+
+    def filter(self, queryset: QuerySet, query: str) -> QuerySet:
+        expression = self.match_expression(query)
+        if not expression:
+            return queryset
+        table = self.tables[queryset.model]
+        return queryset.filter(
+            id__in=RawSQL(f'SELECT rowid FROM {table} WHERE {table} MATCH %s', [expression])
+        )
+
+    def search(self, query: str, limit: int) -> list[Lesson | LessonArchive]:
+        expression = self.match_expression(query)
+        if not expression:
+            return []
+        models = list(self.tables)
+        selects = [
+            f'SELECT rowid, {index}, bm25({table}, %s, 1.0) AS rank FROM {table} WHERE {table} MATCH %s'
+            for index, table in enumerate(self.tables.values())
+        ]
+        params = [settings.LESSON_SEARCH['TITLE_WEIGHT'], expression] * len(selects)
+        with connection.cursor() as cursor:
+            cursor.execute(f"{' UNION ALL '.join(selects)} ORDER BY rank LIMIT %s", [*params, limit])
+            rows = [(models[index], lesson_id) for lesson_id, index, _ in cursor.fetchall()]
+        found = {
+            model: model.objects.in_bulk([lesson_id for row_model, lesson_id in rows if row_model is model])
+            for model in models
+        }
+        return [found[model][lesson_id] for model, lesson_id in rows if lesson_id in found[model]]
+
+
+BACKENDS = {
+    'like': LikeSearchBackend,
+    'fts5': Fts5SearchBackend,
+}
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    """Бэкенд поиска по LESSON_SEARCH['BACKEND']"""
+    name = settings.LESSON_SEARCH['BACKEND']
+    if name == 'auto':
+        name = 'fts5' if connection.vendor == 'sqlite' else 'like'
+    backend_class = BACKENDS[name] if name in BACKENDS else import_string(name)
+    return backend_class()
@@ -0,0 +1,32 @@
+from lesson.models import Lesson
+from lesson.series import Occurrence
+
+
+def lesson_to_dict(lesson: Lesson) -> dict:
+    """Представление урока для JSON-ответов API"""
+    return {
+        "id": lesson.id,
+        "title": lesson.title,
+        "description": lesson.description,
+        "start_time": lesson.start_time.isoformat(),
+        "end_time": lesson.end_time.isoformat() if lesson.end_time else None,
+        "status": lesson.status,
+    }
+
+
+def occurrence_to_dict(occurrence: Occurrence) -> dict:
+    """
+    Занятие серии: поля урока без id, series_id и occurrence_start
+    (время по расписанию) однозначно определяют занятие.
+    """
+    return {
+        **lesson_to_dict(occurrence),
+        "id": None,
+        "series_id": occurrence.series.id,
+        "occurrence_start": occurrence.occurrence_start.isoformat(),
+    }
+
+
+def schedule_item_to_dict(item) -> dict:
+    """Урок или занятие серии из общей выдачи"""
+    return occurrence_to_dict(item) if isinstance(item, Occurrence) else lesson_to_dict(item)
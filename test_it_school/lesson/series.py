@@ -0,0 +1,248 @@
+"""
+Занятия повторяющихся уроков (LessonSeries), вычисляемые по правилу.
+
+Строки в БД есть только у серии и ее исключений; занятия строятся
+генераторами и только для запрошенного промежутка: стоимость зависит
+от ширины промежутка, а не от длины истории серии.
+
+В общей выдаче занятие упорядочивается по ключу
+(start_time, -id серии, occurrence_start): у уроков id положительные
+и с занятиями не совпадают, а occurrence_start различает занятия одной
+серии, перенесенные на одно время. Курсор KeysetPaginator для уроков
+не меняется, у занятий в нем добавляется occurrence_start.
+"""
+import heapq
+from datetime import datetime, timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+from lesson.models import LessonSeries, LessonSeriesException
+from lesson.pagination import KeysetPaginator
+
+
+class Occurrence:
+    """Занятие серии; поля совпадают с полями Lesson, которые отдает API"""
+
+    __slots__ = ('series', 'occurrence_start', 'start_time', 'end_time')
+
+    def __init__(self, series: LessonSeries, occurrence_start: datetime, start_time: datetime):
+        self.series = series
+        # Время по правилу - ключ исключений и напоминания, не меняется при переносе
+        self.occurrence_start = occurrence_start
+        self.start_time = start_time
+        self.end_time = start_time + timedelta(minutes=series.duration)
+
+    @property
+    def id(self) -> int:
+        # Общий для всех занятий серии, уникален только вместе с occurrence_start
+        return -self.series.id
+
+    @property
+    def title(self) -> str:
+        return self.series.title
+
+    @property
+    def description(self) -> str:
+        return self.series.description
+
+    @property
+    def status(self) -> str:
+        now = timezone.now()
+        if now < self.start_time:
+            return 'scheduled'
+        return 'in_progress' if now < self.end_time else 'completed'
+
+    @property
+    def reminder_id(self) -> str:
+        return reminder_id(self.series.id, self.occurrence_start)
+
+    def __repr__(self):
+        return f"<Occurrence series={self.series.id} {self.start_time:%Y-%m-%d %H:%M}>"
+
+
+def reminder_id(series_id: int, occurrence_start: datetime) -> str:
+    """id напоминания занятия для воркера: не пересекается с id уроков"""
+    return f"series-{series_id}-{occurrence_start:%Y%m%d%H%M}"
+
+
+def sort_key(item) -> tuple:
+    """Ключ общей выдачи уроков и занятий, уникален для каждой записи"""
+    if isinstance(item, Occurrence):
+        return item.start_time, item.id, item.occurrence_start
+    return item.start_time, item.id
+
+
+def rule_starts(series: LessonSeries, start: datetime, end: datetime):
+    """
+    Время занятий по правилу серии в [start, end) по возрастанию.
+
+    Первый период, пересекающийся с start, вычисляется сразу, без
+    перебора занятий от начала серии.
+    """
+    first = series.start_time
+    start = max(start, first)
+    if series.until is not None:
+        end = min(end, series.until + timedelta(microseconds=1))
+    if start >= end:
+        return
+
+    if series.frequency == 'daily':
+        step = timedelta(days=series.interval)
+        k = max(0, -(-(start - first) // step))
+        current = first + k * step
+        while current < end:
+            yield current
+            current += step
+        return
+
+    # weekly: периоды по interval недель от понедельника первой недели
+    anchor = first - timedelta(days=first.weekday())
+    step = timedelta(weeks=series.interval)
+    k = max(0, (start - anchor) // step)
+    days = series.weekday_list()
+    while True:
+        week = anchor + k * step
+        if week >= end:
+            return
+        for day in days:
+            current = week + timedelta(days=day)
+            if current >= end:
+                return
+            if current >= start:
+                yield current
+        k += 1
+
+
+def occurrences(series: LessonSeries, start: datetime, end: datetime, exceptions: dict = None):
+    """
+    Занятия серии, начинающиеся в [start, end), по возрастанию времени.
+
+    exceptions - {occurrence_start: новое время или None}, по умолчанию
+    берутся из series.exceptions (рассчитано на prefetch_related).
+    """
+    if exceptions is None:
+        exceptions = series_exceptions(series)
+    moved = sorted(
+        (new_start, original) for original, new_start in exceptions.items()
+        if new_start is not None and start <= new_start < end
+    )
+    by_rule = (
+        (rule_start, rule_start) for rule_start in rule_starts(series, start, end)
+        if rule_start not in exceptions
+    )
+    for new_start, original in heapq.merge(by_rule, moved):
+        yield Occurrence(series, original, new_start)
+
+
+def series_exceptions(series: LessonSeries) -> dict:
+    return {exception.occurrence_start: exception.start_time for exception in series.exceptions.all()}
+
+
+def active_series(before: datetime = None, after: datetime = None):
+    """
+    Активные серии с исключениями: before - только начавшиеся раньше,
+    after - только с занятиями не раньше этого времени (по until или
+    занятию, перенесенному позже).
+    """
+    queryset = LessonSeries.objects.filter(status='active').prefetch_related('exceptions')
+    if before is not None:
+        queryset = queryset.filter(start_time__lt=before)
+    if after is not None:
+        moved_later = LessonSeriesException.objects.filter(series=OuterRef('pk'), start_time__gte=after)
+        queryset = queryset.filter(Q(until__isnull=True) | Q(until__gte=after) | Exists(moved_later))
+    return queryset
+
+
+def occurrences_between(series_list, start: datetime, end: datetime) -> list[Occurrence]:
+    """Занятия всех серий, идущие в [start, end) (пересекаются с промежутком), по времени начала"""
+    result = []
+    for series in series_list:
+        # Занятие, начавшееся до start, еще может идти
+        window_start = start - timedelta(minutes=series.duration)
+        result.extend(
+            occurrence for occurrence in occurrences(series, window_start, end)
+            if occurrence.end_time > start
+        )
+    result.sort(key=sort_key)
+    return result
+
+
+def series_span(series: LessonSeries, exceptions: dict = None) -> tuple[datetime, datetime | None]:
+    """
+    Время первого и последнего занятия серии с учетом переносов;
+    последнее - None, если серия бессрочная.
+    """
+    if exceptions is None:
+        exceptions = series_exceptions(series)
+    moved = [new_start for new_start in exceptions.values() if new_start is not None]
+    first = min([series.start_time, *moved])
+    last = None if series.until is None else max([series.until, *moved])
+    return first, last
+
+
+def occurrences_desc(series_list, before: datetime, window: timedelta = timedelta(days=7)):
+    """
+    Занятия всех серий, начинающиеся раньше before, от поздних к ранним.
+
+    Ленивый: серии разворачиваются окнами по window назад, пока
+    потребитель берет занятия. В окне разворачиваются только серии,
+    идущие в нем (по series_span); промежутки, где ни одной серии нет,
+    пропускаются, обход заканчивается на начале самой ранней серии.
+    """
+    spans = [(series, *series_span(series)) for series in series_list]
+    end = before
+    while True:
+        started = [(series, last) for series, first, last in spans if first < end]
+        if not started:
+            return
+        # Все начавшиеся серии закончились раньше end - переходим к последнему занятию
+        if all(last is not None for _, last in started):
+            end = min(end, max(last for _, last in started) + timedelta(microseconds=1))
+        start = end - window
+        batch = []
+        for series, last in started:
+            if last is None or last >= start:
+                batch.extend(occurrences(series, start, end))
+        batch.sort(key=sort_key, reverse=True)
+        yield from batch
+        end = start
+
+
+def list_horizon() -> datetime:
+    """Дальше этого времени занятия серий в GET /lessons/ не попадают"""
+    return timezone.now() + timedelta(days=settings.LESSON_SERIES['LIST_HORIZON_DAYS'])
+
+
+def merge_desc(lessons: list, series_list, before: datetime, cursor_key: tuple = None, limit: int = None) -> list:
+    """
+    Уроки (по убыванию sort_key) вместе с занятиями серий до before,
+    после позиции cursor_key; не больше limit записей.
+    """
+    pending = occurrences_desc(series_list, before)
+    if cursor_key is not None:
+        pending = (occurrence for occurrence in pending if sort_key(occurrence) < cursor_key)
+    if limit is not None:
+        pending = islice(pending, limit)
+    merged = heapq.merge(lessons, pending, key=sort_key, reverse=True)
+    return list(islice(merged, limit)) if limit is not None else list(merged)
+
+
+class SeriesKeysetPaginator(KeysetPaginator):
+    """
+    KeysetPaginator для GET /lessons/ с занятиями серий: в страницу
+    попадают и уроки, и занятия до list_horizon(), курсор общий.
+    """
+
+    def position(self, item) -> tuple:
+        return sort_key(item)
+
+    def fetch(self, position, limit):
+        lessons = super().fetch(position, limit)
+        before = list_horizon()
+        if position is not None:
+            before = min(before, position[0] + timedelta(microseconds=1))
+        # Страница уже заполнена уроками: занятия раньше последнего из них в нее не попадут
+        after = lessons[-1].start_time if len(lessons) == limit else None
+        return merge_desc(lessons, active_series(before, after), before, cursor_key=position, limit=limit)
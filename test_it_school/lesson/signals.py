@@ -1,7 +1,19 @@
-from django.db.models.signals import post_migrate
+import logging
+
+from django.db import connections, transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_delete
 from django.contrib.auth.models import User
 from django.dispatch import receiver
 
+from lesson.cache import lesson_list_cache
+from lesson.intervals import lesson_intervals
+from lesson.metrics import install_db_instrumentation
+from lesson.models import Lesson, LessonSeries, LessonSeriesException
+from lesson.search import repair_fts5
+
+logger = logging.getLogger(__name__)
+
 
 @receiver(post_migrate)
 def create_superuser(sender, **kwargs):
@@ -15,4 +27,141 @@ def create_superuser(sender, **kwargs):
                 email='admin@example.com',
                 password='admin123'
             )
-            print("✅ Суперпользователь создан: admin / admin123")
+            logger.info("✅ Суперпользователь создан: admin / admin123")
+
+
+@receiver(post_migrate)
+def repair_lesson_search(sender, using, **kwargs):
+    """Возвращает триггеры FTS5, если миграция пересоздала таблицу уроков"""
+    if sender.name == 'lesson' and repair_fts5(connections[using]):
+        logger.warning("Триггеры полнотекстового поиска восстановлены, индекс перестроен")
+
+
+# Счетчики запросов к БД для метрик и Server-Timing
+connection_created.connect(install_db_instrumentation)
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def invalidate_lesson_list_cache(sender, **kwargs):
+    """
+    Сбрасывает кэш выдачи уроков при создании, изменении и удалении урока.
+
+    После коммита: иначе запрос, пришедший до коммита, снова положит
+    в кэш страницу без изменения.
+    """
+    transaction.on_commit(lesson_list_cache.invalidate)
+
+
+@receiver(post_save, sender=Lesson)
+def sync_lesson_interval(sender, instance, **kwargs):
+    """Обновляет индекс интервалов после коммита: откат не должен оставлять урок в индексе"""
+    transaction.on_commit(lambda: lesson_intervals.update(instance))
+
+
+@receiver(post_delete, sender=Lesson)
+def remove_lesson_interval(sender, instance, **kwargs):
+    """Убирает удаленный урок из индекса интервалов"""
+    lesson_id = instance.id
+    transaction.on_commit(lambda: lesson_intervals.remove(lesson_id))
+
+
+@receiver(post_save, sender=Lesson)
+def sync_lesson_reminder(sender, instance, created, **kwargs):
+    """
+    Переносит или отменяет напоминание при изменении урока (например, в админке).
+
+    Новые уроки планирует LessonApplication.lesson_add.
+    """
+    if created:
+        return
+    from lesson.domain import LessonDomain
+
+    LessonDomain.sync_reminder(
+        instance,
+        old_status=instance.get_loaded_value('status'),
+        old_start_time=instance.get_loaded_value('start_time'),
+    )
+
+
+@receiver(post_delete, sender=Lesson)
+def cancel_lesson_reminder(sender, instance, **kwargs):
+    """Отменяет напоминание удаленного урока"""
+    from lesson.domain import LessonDomain
+
+    LessonDomain.cancel_reminder(instance.id)
+
+
+@receiver(post_save, sender=Lesson)
+def record_lesson_change(sender, instance, created, **kwargs):
+    """Записывает создание или изменение урока в журнал живой ленты"""
+    from lesson import feed
+
+    if created:
+        feed.record_change(instance, 'create')
+        return
+    previous_start_time = instance.get_loaded_value('start_time')
+    feed.record_change(
+        instance, 'update',
+        previous_start_time=previous_start_time if previous_start_time != instance.start_time else None,
+    )
+
+
+@receiver(post_delete, sender=Lesson)
+def record_lesson_delete(sender, instance, **kwargs):
+    """Записывает удаление урока в журнал живой ленты"""
+    from lesson import feed
+
+    feed.record_change(instance, 'delete')
+
+
+@receiver(post_save, sender=LessonSeries)
+@receiver(post_delete, sender=LessonSeries)
+@receiver(post_save, sender=LessonSeriesException)
+@receiver(post_delete, sender=LessonSeriesException)
+def invalidate_series_list_cache(sender, **kwargs):
+    """Занятия серий входят в выдачу уроков - сбрасываем кэш после коммита"""
+    transaction.on_commit(lesson_list_cache.invalidate)
+
+
+@receiver(post_save, sender=LessonSeries)
+def sync_series_reminders(sender, instance, created, **kwargs):
+    """
+    Новую серию сразу планирует на горизонт напоминаний; при изменении
+    правила или отмене серии снимает напоминания, поставленные по старому правилу.
+    """
+    from lesson.domain import LessonDomain
+
+    if not created and instance.rule_changed():
+        LessonDomain.reset_series_reminders(instance, instance.loaded_copy())
+    LessonDomain.plan_series_reminders(series_id=instance.pk)
+
+
+@receiver(pre_delete, sender=LessonSeries)
+def cancel_series_reminders(sender, instance, **kwargs):
+    """Снимает запланированные напоминания серии до удаления (пока в БД есть ее исключения)"""
+    from lesson.domain import LessonDomain
+
+    LessonDomain.reset_series_reminders(instance, instance)
+
+
+@receiver(post_save, sender=LessonSeriesException)
+def sync_series_exception_reminder(sender, instance, **kwargs):
+    """Переносит или отменяет напоминание занятия при изменении исключения"""
+    from lesson.domain import LessonDomain
+
+    LessonDomain.sync_series_exception(instance)
+
+
+@receiver(post_delete, sender=LessonSeriesException)
+def restore_series_exception_reminder(sender, instance, origin=None, **kwargs):
+    """
+    Возвращает напоминание занятию на время по правилу. При удалении
+    самой серии исключения удаляются каскадом - напоминания снимает
+    cancel_series_reminders.
+    """
+    from lesson.domain import LessonDomain
+
+    if getattr(origin, 'model', type(origin)) is LessonSeries:
+        return
+    LessonDomain.sync_series_exception(instance, deleted=True)
@@ -1,10 +1,18 @@
 from django.urls import path
-from .views import main, lesson_add, lesson_list
+from .views import main, lesson_add, alesson_add, lesson_export, lesson_import, lesson_list, lesson_list_cache_stats, lesson_range, lesson_search, metrics, websocket_stats
 
 app_name = "lesson"
 
 urlpatterns = [
     path('', main, name="main"),
     path('lesson_add/', lesson_add, name="lesson_add"),
+    path('lesson_add_async/', alesson_add, name="lesson_add_async"),
     path('lessons/', lesson_list, name="lesson_list"),
+    path('lessons/range/', lesson_range, name="lesson_range"),
+    path('lessons/search/', lesson_search, name="lesson_search"),
+    path('lessons/import/', lesson_import, name="lesson_import"),
+    path('lessons/export/', lesson_export, name="lesson_export"),
+    path('lessons/cache_stats/', lesson_list_cache_stats, name="lesson_list_cache_stats"),
+    path('ws_stats/', websocket_stats, name="websocket_stats"),
+    path('metrics', metrics, name="metrics"),
 ]
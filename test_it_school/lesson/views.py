@@ -1,12 +1,37 @@
+import heapq
+import json
+from datetime import timedelta
+from itertools import islice
+
+from django import forms
+from django.conf import settings
 from django.core.paginator import Paginator
-from django.http import JsonResponse
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
+from django.utils import timezone
 from django.views.decorators.http import require_GET, require_POST
 from lesson.aplication import lesson_app
-from lesson.models import Lesson
+from lesson.cache import lesson_list_cache
+from lesson.exporter import CONTENT_TYPES, export_queryset, stream_export
+from lesson.forms import NaiveDateTimeField
+from lesson.importer import ImportFormatError, detect_format
+from lesson.metrics import errors_total
+from lesson.metrics import render as render_metrics
+from lesson.models import Lesson, LessonArchive
+from lesson.pagination import InvalidCursor, KeysetPaginator
+from lesson.search import get_backend as get_search_backend
+from lesson.search import parse_query
+from lesson.serializers import lesson_to_dict, schedule_item_to_dict
+from lesson.series import SeriesKeysetPaginator, active_series, occurrences_between
+from lesson.series import sort_key as series_sort_key
+from ws_app.flow import flow_stats
 
 
 async def main(request):
+    # Сессия нужна, чтобы адресовать WebSocket-уведомления этому посетителю
+    if not request.session.session_key:
+        await request.session.asave()
     return render(request, 'main.html')
 
 
@@ -43,12 +68,15 @@ def lesson_add(request):
     # История операций
     try:
 
-        lesson_app.lesson_add(request=request)
+        result = lesson_app.lesson_add(request=request)
+        if isinstance(result, HttpResponse):
+            return result
         return JsonResponse(
             {"status": "ok"},
             status=201
         )
     except Exception as e:
+        errors_total.inc(where="lesson_add")
         return JsonResponse(
             {
                 "status": f"Непредвиденная ошибка в lesson_add: {str(e)}",
@@ -58,35 +86,366 @@ def lesson_add(request):
         )
 
 
+@require_POST
+async def alesson_add(request):
+    """
+        Асинхронный вариант lesson_add (POST /lesson_add_async/).
+
+        Принимает те же данные и возвращает те же ответы, но выполняется
+        в event loop Daphne без выделения потока на весь запрос,
+        см. LessonApplication.alesson_add.
+    """
+    try:
+
+        result = await lesson_app.alesson_add(request=request)
+        if isinstance(result, HttpResponse):
+            return result
+        return JsonResponse(
+            {"status": "ok"},
+            status=201
+        )
+    except Exception as e:
+        errors_total.inc(where="alesson_add")
+        return JsonResponse(
+            {
+                "status": f"Непредвиденная ошибка в alesson_add: {str(e)}",
+                "message": "Внутренняя ошибка сервера при создании урока"
+            },
+            status=500
+        )
+
+
+@require_POST
+def lesson_import(request):
+    """
+        Массовый импорт уроков (POST /lessons/import/).
+
+        Тело - CSV с заголовком (title,description,start_time,end_time,status)
+        или NDJSON (один JSON-объект урока на строку). Формат определяется
+        по Content-Type или параметру ?format=csv|ndjson. Тело читается
+        потоком, см. LessonApplication.lesson_import.
+
+        Returns:
+            JsonResponse: отчет импорта:
+                - status: 'ok' или 'partial', если есть строки с ошибками
+                - created / failed: количество созданных и ошибочных строк
+                - errors: [{"line": 3, "errors": {"start_time": [...]}}, ...]
+                - truncated: превышен LESSON_IMPORT['MAX_ROWS']
+
+        Строки с некорректной кодировкой или ошибкой разбора CSV попадают
+        в errors и не прерывают импорт.
+
+        Запрос защищен CSRF, как и форма создания урока: нужны cookie
+        csrftoken (ее ставит главная страница) и заголовок X-CSRFToken.
+
+        Status Codes:
+            200: Импорт выполнен (возможно, частично)
+            400: Неизвестный формат тела
+            403: Нет cookie csrftoken или заголовка X-CSRFToken
+
+        Example:
+            curl -s -c cookies.txt http://localhost:8000/ > /dev/null
+            curl -b cookies.txt -H "X-CSRFToken: $(awk '/csrftoken/ {print $7}' cookies.txt)" \
+                 -H 'Content-Type: text/csv' --data-binary @semester.csv http://localhost:8000/lessons/import/
+    """
+    try:
+        fmt = detect_format(request.content_type, request.GET.get("format"))
+        report = lesson_app.lesson_import(request, fmt)
+    except ImportFormatError as e:
+        return JsonResponse({"status": "error", "errors": {"format": str(e)}}, status=400)
+    except Exception as e:
+        errors_total.inc(where="lesson_import")
+        return JsonResponse(
+            {
+                "status": f"Непредвиденная ошибка в lesson_import: {str(e)}",
+                "message": "Внутренняя ошибка сервера при импорте уроков"
+            },
+            status=500
+        )
+
+    report["errors_truncated"] = len(report["errors"]) < report["failed"]
+    return JsonResponse({"status": "partial" if report["failed"] else "ok", **report})
+
+
 @require_GET
 def lesson_list(request):
-    # Пример плохого эндпоинта
-    page_number = request.GET.get("page", 1)
-
-    qs = Lesson.objects.order_by("-start_time")
-
-    paginator = Paginator(qs, 3)
-    page = paginator.get_page(page_number)
-
-    lessons = [
-        {
-            "id": lesson.id,
-            "title": lesson.title,
-            "description": lesson.description,
-            "start_time": lesson.start_time.isoformat(),
-            "end_time": lesson.end_time.isoformat() if lesson.end_time else None,
-            "status": lesson.status,
-        }
-        for lesson in page.object_list
+    """
+        Список уроков, отсортированный по времени начала (новые первыми).
+
+        Поддерживает два режима пагинации:
+            page   - номер страницы (Paginator), считает COUNT(*) по таблице,
+                     подходит для небольших таблиц;
+            cursor - keyset-пагинация по (start_time, id), не считает
+                     количество записей и не использует OFFSET.
+
+        В режиме cursor в выдачу попадают и занятия серий (LessonSeries)
+        не дальше LESSON_SERIES['LIST_HORIZON_DAYS'] вперед - они
+        вычисляются для страницы, у них id = null и есть series_id.
+        Режим page показывает только уроки.
+
+        Query parameters:
+            mode: 'page' или 'cursor' (по умолчанию settings.LESSON_LIST_PAGINATION)
+            page: номер страницы для режима page
+            cursor: курсор из ответа предыдущей страницы (включает режим cursor)
+            page_size: размер страницы, не больше settings.LESSON_LIST_MAX_PAGE_SIZE
+
+        Ответ кэшируется (lesson.cache.lesson_list_cache) и сбрасывается
+        при любом изменении уроков; заголовок X-Cache показывает HIT/MISS.
+
+        Example:
+            GET /lessons/?mode=cursor&page_size=20
+            GET /lessons/?cursor=WyIyMDI1LTEyLTI1VDEwOjAwOjAwIiw0Ml0
+    """
+    cursor = request.GET.get("cursor")
+    mode = "cursor" if cursor else request.GET.get("mode", settings.LESSON_LIST_PAGINATION)
+    if mode not in ("page", "cursor"):
+        return JsonResponse(
+            {"status": "error", "errors": {"mode": "Допустимые значения: page, cursor"}},
+            status=400
+        )
+
+    try:
+        page_size = int(request.GET.get("page_size", settings.LESSON_LIST_PAGE_SIZE))
+    except ValueError:
+        return JsonResponse(
+            {"status": "error", "errors": {"page_size": "Ожидается целое число"}},
+            status=400
+        )
+    page_size = max(1, min(page_size, settings.LESSON_LIST_MAX_PAGE_SIZE))
+
+    params = {"mode": mode, "page_size": page_size}
+    if mode == "cursor":
+        params["cursor"] = cursor or ""
+    else:
+        params["page"] = request.GET.get("page", "1")
+
+    try:
+        content, cache_hit = lesson_list_cache.get_or_build(
+            params,
+            lambda: json.dumps(_lesson_list_payload(**params), cls=DjangoJSONEncoder).encode()
+        )
+    except InvalidCursor as e:
+        return JsonResponse(
+            {"status": "error", "errors": {"cursor": str(e)}},
+            status=400
+        )
+
+    response = HttpResponse(content, content_type="application/json")
+    response["X-Cache"] = "HIT" if cache_hit else "MISS"
+    return response
+
+
+@require_GET
+async def lesson_export(request):
+    """
+        Потоковая выгрузка уроков (GET /lessons/export/).
+
+        Параметры:
+            format: ndjson (по умолчанию) или csv
+            status: один или несколько статусов через запятую
+            from / to: диапазон времени начала [from, to) в ISO 8601
+            gzip: 1 - сжимать ответ на лету (Content-Encoding: gzip)
+            archive: 1 - выгружать архив уроков (LessonArchive) вместо рабочей таблицы
+
+        Уроки упорядочены по start_time. Таблица читается порциями
+        LESSON_EXPORT_CHUNK_SIZE, см. lesson.exporter.
+
+        Example:
+            curl --compressed '/lessons/export/?format=csv&status=scheduled&from=2025-09-01&gzip=1'
+    """
+    errors = {}
+    fmt = request.GET.get("format", "ndjson")
+    if fmt not in CONTENT_TYPES:
+        errors["format"] = f"Допустимые значения: {', '.join(CONTENT_TYPES)}"
+
+    statuses = [status for status in request.GET.get("status", "").split(",") if status]
+    allowed = {value for value, _ in Lesson.STATUS_CHOICES}
+    if not set(statuses) <= allowed:
+        errors["status"] = f"Допустимые значения: {', '.join(sorted(allowed))}"
+
+    bounds = {}
+    for param in ("from", "to"):
+        try:
+            bounds[param] = NaiveDateTimeField(required=False).clean(request.GET.get(param))
+        except forms.ValidationError:
+            errors[param] = "Ожидается дата и время в формате ISO 8601"
+
+    if errors:
+        return JsonResponse({"status": "error", "errors": errors}, status=400)
+
+    compress = request.GET.get("gzip") == "1"
+    queryset = export_queryset(statuses, bounds["from"], bounds["to"], archive=request.GET.get("archive") == "1")
+    response = StreamingHttpResponse(
+        stream_export(queryset, fmt, compress, chunk_size=settings.LESSON_EXPORT_CHUNK_SIZE),
+        content_type=CONTENT_TYPES[fmt],
+    )
+    response["Content-Disposition"] = f'attachment; filename="lessons.{fmt}"'
+    if compress:
+        response["Content-Encoding"] = "gzip"
+    return response
+
+
+@require_GET
+def lesson_range(request):
+    """
+        Уроки, которые идут в промежутке [from, to) (GET /lessons/range/).
+
+        Урок попадает в ответ, если пересекается с промежутком: начался
+        до to и закончился после from. Занятия серий (LessonSeries)
+        вычисляются для промежутка и идут в общем порядке, у них id = null
+        и есть series_id. Промежуток старше LESSON_ARCHIVE['RETENTION_DAYS']
+        дополнительно читается из архива (LessonArchive). Запрос идет по индексу
+        (start_time, end_time): просматриваются только уроки, начавшиеся
+        не раньше from - LESSON_SCHEDULE['MAX_DURATION_HOURS'].
+
+        Параметры:
+            from / to: границы промежутка в ISO 8601, обязательны
+            status: один или несколько статусов через запятую
+
+        Returns:
+            JsonResponse: items - уроки по времени начала, count,
+            truncated - в промежутке больше LESSON_SCHEDULE['RANGE_LIMIT'] уроков
+
+        Example:
+            GET /lessons/range/?from=2025-12-22T00:00&to=2025-12-29T00:00&status=scheduled
+    """
+    errors = {}
+    statuses = [status for status in request.GET.get("status", "").split(",") if status]
+    allowed = {value for value, _ in Lesson.STATUS_CHOICES}
+    if not set(statuses) <= allowed:
+        errors["status"] = f"Допустимые значения: {', '.join(sorted(allowed))}"
+
+    bounds = {}
+    for param in ("from", "to"):
+        try:
+            bounds[param] = NaiveDateTimeField().clean(request.GET.get(param))
+        except forms.ValidationError:
+            errors[param] = "Обязательный параметр: дата и время в формате ISO 8601"
+    if not errors and bounds["from"] >= bounds["to"]:
+        errors["to"] = "Должно быть позже from"
+
+    if errors:
+        return JsonResponse({"status": "error", "errors": errors}, status=400)
+
+    schedule = settings.LESSON_SCHEDULE
+    limit = schedule["RANGE_LIMIT"]
+    sources = [Lesson]
+    # В архиве только уроки, закончившиеся раньше срока хранения
+    if bounds["from"] < timezone.now() - timedelta(days=settings.LESSON_ARCHIVE["RETENTION_DAYS"]):
+        sources.append(LessonArchive)
+    lesson_lists = []
+    for model in sources:
+        queryset = model.objects.filter(
+            start_time__gte=bounds["from"] - timedelta(hours=schedule["MAX_DURATION_HOURS"]),
+            start_time__lt=bounds["to"],
+            end_time__gt=bounds["from"],
+        )
+        if statuses:
+            queryset = queryset.filter(status__in=statuses)
+        lesson_lists.append(list(queryset.order_by("start_time", "id")[:limit + 1]))
+
+    # Занятия серий вычисляются только для запрошенного промежутка
+    series_list = active_series(
+        before=bounds["to"],
+        after=bounds["from"] - timedelta(hours=schedule["MAX_DURATION_HOURS"]),
+    )
+    occurrences = [
+        occurrence for occurrence in occurrences_between(series_list, bounds["from"], bounds["to"])
+        if not statuses or occurrence.status in statuses
     ]
-    return JsonResponse(
-        {
-            "items": lessons,
+    items = list(islice(heapq.merge(*lesson_lists, occurrences, key=series_sort_key), limit + 1))
+
+    return JsonResponse({
+        "items": [schedule_item_to_dict(item) for item in items[:limit]],
+        "count": min(len(items), limit),
+        "truncated": len(items) > limit,
+    })
+
+
+@require_GET
+def lesson_search(request):
+    """
+        Полнотекстовый поиск уроков по названию и описанию (GET /lessons/search/).
+
+        Слова ищутся по началу (прогр найдет «программирование»), фраза
+        в кавычках - целиком; урок должен содержать все слова запроса.
+        Ищутся и архивные уроки (LessonArchive). Результаты упорядочены
+        по релевантности, см. lesson.search.
+
+        Query parameters:
+            q: строка поиска, обязательна
+            limit: сколько уроков вернуть, не больше LESSON_SEARCH['MAX_LIMIT']
+
+        Example:
+            GET /lessons/search/?q=django+"домашнее задание"&limit=10
+    """
+    query = request.GET.get("q", "").strip()
+    if not parse_query(query):
+        return JsonResponse(
+            {"status": "error", "errors": {"q": "Обязательный параметр: хотя бы одно слово"}},
+            status=400
+        )
+    try:
+        limit = int(request.GET.get("limit", settings.LESSON_SEARCH["LIMIT"]))
+    except ValueError:
+        return JsonResponse(
+            {"status": "error", "errors": {"limit": "Ожидается целое число"}},
+            status=400
+        )
+    limit = max(1, min(limit, settings.LESSON_SEARCH["MAX_LIMIT"]))
+
+    backend = get_search_backend()
+    lessons = backend.search(query, limit)
+    return JsonResponse({
+        "items": [lesson_to_dict(lesson) for lesson in lessons],
+        "count": len(lessons),
+        "backend": backend.name,
+    })
+
+
+@require_GET
+def lesson_list_cache_stats(request):
+    """Счетчики попаданий/промахов кэша GET /lessons/ для подбора его размера"""
+    return JsonResponse(lesson_list_cache.stats())
+
+
+@require_GET
+def metrics(request):
+    """Метрики процесса в текстовом формате Prometheus"""
+    return HttpResponse(render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def websocket_stats(request):
+    """Счетчики WebSocket-соединений процесса: отклоненные, вытесненные и схлопнутые сообщения"""
+    return JsonResponse(flow_stats.stats())
+
+
+def _lesson_list_payload(mode: str, page_size: int, page: str = "1", cursor: str = "") -> dict:
+    """Строит тело ответа GET /lessons/ по нормализованным параметрам"""
+    qs = Lesson.objects.all()
+
+    if mode == "cursor":
+        keyset_page = SeriesKeysetPaginator(qs, page_size).get_page(cursor)
+        return {
+            "items": [schedule_item_to_dict(item) for item in keyset_page["object_list"]],
             "pagination": {
-                "page": page.number,
-                "pages": paginator.num_pages,
-                "has_next": page.has_next(),
-                "has_prev": page.has_previous(),
+                "mode": "cursor",
+                "page_size": page_size,
+                "next_cursor": keyset_page["next_cursor"],
+                "has_next": keyset_page["has_next"],
             }
         }
-    )
+
+    paginator = Paginator(qs.order_by(*KeysetPaginator.ordering), page_size)
+    page_obj = paginator.get_page(page)
+
+    return {
+        "items": [lesson_to_dict(lesson) for lesson in page_obj.object_list],
+        "pagination": {
+            "mode": "page",
+            "page": page_obj.number,
+            "pages": paginator.num_pages,
+            "has_next": page_obj.has_next(),
+            "has_prev": page_obj.has_previous(),
+        }
+    }
@@ -65,6 +65,11 @@ class WebSocketManager {
             };
 
             this.ws.onmessage = (event) => {
+                // Ответ на heartbeat сервера, иначе соединение закроется по простою
+                if (event.data === '{"type": "ping"}') {
+                    this.ws.send('{"action": "pong"}');
+                    return;
+                }
                 if (this.isPaused) return;
 
                 try {
@@ -1,3 +1,4 @@
+import logging
 import os
 
 from django.core.asgi import get_asgi_application
@@ -5,15 +6,16 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'test_it_school.settings')
 
 django_asgi_app = get_asgi_application()
+logger = logging.getLogger(__name__)
 
 from channels.auth import AuthMiddlewareStack
 from channels.routing import ProtocolTypeRouter, URLRouter
 
 try:
     from ws_app.routing import websocket_urlpatterns
-    print(f"✅ WebSocket patterns loaded: {websocket_urlpatterns}")
-except ImportError as e:
-    print(f"❌ Error importing WebSocket routing: {e}")
+    logger.info("✅ WebSocket patterns loaded: %s", websocket_urlpatterns)
+except ImportError:
+    logger.exception("❌ Error importing WebSocket routing")
     websocket_urlpatterns = []
 
 application = ProtocolTypeRouter({
@@ -1,13 +1,47 @@
+import os
+import time
+
 from celery import Celery
+from celery.signals import before_task_publish
 
 external_celery = Celery('external_client')
 
+# Маршруты и приоритеты задач воркера (совпадают с celery_service/worker.py):
+# планирование и срочная доставка напоминаний идут разными очередями
+TASK_ROUTES = {
+    'lesson.send_reminder_batch': {'queue': 'reminders.due', 'priority': 0},
+    'lesson.send_reminder': {'queue': 'reminders.due', 'priority': 0},
+    'lesson.dispatch_due_reminders': {'queue': 'reminders.due', 'priority': 0},
+    'lesson.schedule_reminder': {'queue': 'reminders.schedule', 'priority': 3},
+    'lesson.cancel_reminder': {'queue': 'reminders.schedule', 'priority': 3},
+    # Пачки импорта (до LESSON_IMPORT['CHUNK_SIZE'] уроков) сжимаются
+    'lesson.schedule_reminders': {'queue': 'reminders.schedule', 'priority': 7, 'compression': 'zlib'},
+}
+
+# json или msgpack (компактнее; воркер принимает оба)
+TASK_SERIALIZER = os.environ.get('CELERY_TASK_SERIALIZER', 'json')
+
 external_celery.conf.update(
     broker_url='redis://redis:6379/0',
     result_backend='redis://redis:6379/1',
-    task_serializer='json',
-    accept_content=['json'],
+    task_serializer=TASK_SERIALIZER,
+    accept_content=['json', 'msgpack'],
     result_serializer='json',
     timezone='Europe/Moscow',
     enable_utc=True,
+    task_routes=TASK_ROUTES,
+    task_default_queue='reminders.schedule',
+    # Шаги приоритетов Redis-транспорта должны совпадать с воркером
+    broker_transport_options={
+        'priority_steps': list(range(10)),
+        'sep': ':',
+        'queue_order_strategy': 'priority',
+    },
 )
+
+
+@before_task_publish.connect
+def stamp_published_at(headers=None, **kwargs):
+    """Время публикации: воркер считает по нему ожидание задачи в очереди"""
+    if headers is not None:
+        headers.setdefault('published_at', time.time())
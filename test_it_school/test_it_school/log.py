@@ -0,0 +1,52 @@
+"""
+Форматтер и обработчик для LOGGING (см. settings).
+
+Логгеры веб-процесса пишут через DeferredQueueHandler: запрос только
+кладет запись в очередь, форматирование и вывод выполняет фоновый
+QueueListener, который создает dictConfig. Python 3.12 слушателя не
+запускает, поэтому обработчик запускает его при первой записи.
+"""
+import json
+import logging
+from datetime import datetime
+from logging.handlers import QueueHandler
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись - одна строка JSON; lesson_id и task_id передаются через extra"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'lesson_id': getattr(record, 'lesson_id', None),
+            'task_id': getattr(record, 'task_id', None),
+        }
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler без форматирования в потоке запроса: очередь внутри
+    процесса, поэтому запись передается как есть, и % -форматирование
+    выполняет поток QueueListener.
+    """
+
+    def prepare(self, record):
+        return record
+
+    def emit(self, record):
+        # emit вызывается под блокировкой обработчика (Handler.handle)
+        if self.listener is not None and self.listener._thread is None:
+            self.listener.start()
+        super().emit(record)
+
+    def close(self):
+        # logging.shutdown при выходе: дописать очередь
+        if self.listener is not None and self.listener._thread is not None:
+            self.listener.stop()
+        super().close()
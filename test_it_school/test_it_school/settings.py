@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -21,6 +22,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'lesson.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -93,8 +95,215 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-CHANNEL_LAYERS = {
+# Channel layer:
+#   memory - сообщения доходят только до клиентов того же процесса Daphne
+#            (локальная разработка с одним процессом);
+#   redis  - общий слой для всех процессов и узлов веб-тира.
+# Несколько адресов в CHANNEL_REDIS_URLS (через запятую) - шардирование:
+# каналы и группы распределяются по инстансам Redis консистентным хешированием.
+CHANNEL_LAYER = os.environ.get('CHANNEL_LAYER', 'memory')
+CHANNEL_REDIS_URLS = os.environ.get('CHANNEL_REDIS_URLS', 'redis://redis:6379/3').split(',')
+# Размер пула соединений с каждым инстансом Redis на процесс
+CHANNEL_REDIS_MAX_CONNECTIONS = int(os.environ.get('CHANNEL_REDIS_MAX_CONNECTIONS', 50))
+
+if CHANNEL_LAYER == 'redis':
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {
+                'hosts': [
+                    {'address': url, 'max_connections': CHANNEL_REDIS_MAX_CONNECTIONS}
+                    for url in CHANNEL_REDIS_URLS
+                ],
+                'prefix': 'it_school',
+                'capacity': 1000,
+                'expiry': 60,
+                'group_expiry': 86400,
+            },
+        },
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer'
+        },
+    }
+
+# Пагинация GET /lessons/: 'page' (номер страницы, COUNT(*)) или 'cursor' (keyset)
+LESSON_LIST_PAGINATION = 'page'
+LESSON_LIST_PAGE_SIZE = 3
+LESSON_LIST_MAX_PAGE_SIZE = 100
+
+CACHES = {
     'default': {
-        'BACKEND': 'channels.layers.InMemoryChannelLayer'
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Общий кэш для нескольких процессов, в проде - Redis:
+    # 'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+    # 'LOCATION': 'redis://redis:6379/2',
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'shared',
+    },
+}
+
+# Кэш страниц GET /lessons/: LRU в памяти процесса + опциональный общий бэкенд
+# SHARED_BACKEND - алиас из CACHES или None. Уроки меняют и отдельные процессы
+# (advance_lesson_statuses, archive_lessons, plan_series_reminders): без общего
+# бэкенда (Redis) их изменения видны в web только по истечении TTL
+LESSON_LIST_CACHE = {
+    'MAX_ENTRIES': 1024,
+    'TTL': 60,
+    'SHARED_BACKEND': None,
+}
+
+# Расписание: проверка пересечений при создании урока (lesson.intervals)
+# и диапазонный запрос GET /lessons/range/
+# MAX_PARALLEL - сколько уроков может идти одновременно, новый урок
+# сверх лимита отклоняется формой; MAX_DURATION_HOURS - предел длительности,
+# по нему ограничивается просмотр индекса в диапазонном запросе
+# RANGE_LIMIT - максимум уроков в ответе GET /lessons/range/
+# SHARED_BACKEND - алиас из CACHES для версии индекса интервалов или None
+LESSON_SCHEDULE = {
+    'CHECK_CONFLICTS': True,
+    'MAX_PARALLEL': 1,
+    'MAX_DURATION_HOURS': 12,
+    'RANGE_LIMIT': 1000,
+    'SHARED_BACKEND': None,
+}
+
+# Полнотекстовый поиск уроков (lesson.search, GET /lessons/search/ и админка)
+# BACKEND - 'auto' (FTS5 на SQLite, иначе LIKE), 'fts5', 'like' или путь к классу
+# TITLE_WEIGHT - вес совпадения в названии относительно описания в bm25
+LESSON_SEARCH = {
+    'BACKEND': 'auto',
+    'TITLE_WEIGHT': 10.0,
+    'LIMIT': 20,
+    'MAX_LIMIT': 100,
+}
+
+# Список уроков в админке (lesson.changelist)
+# MODE - 'default' (стандартный ModelAdmin) или 'scalable' для больших таблиц:
+# оценка числа уроков, счетчики фильтров из кэша, страницы по курсору
+# EXACT_COUNT_LIMIT - до скольких уроков отфильтрованный список считается точно
+# FACETS_TTL - через сколько секунд счетчики фильтров пересчитываются в фоне
+# FACETS_BACKEND - алиас из CACHES для счетчиков
+LESSON_ADMIN = {
+    'MODE': 'default',
+    'EXACT_COUNT_LIMIT': 10000,
+    'FACETS_TTL': 300,
+    'FACETS_BACKEND': 'default',
+}
+
+# Повторяющиеся уроки (lesson.series)
+# LIST_HORIZON_DAYS - на сколько дней вперед занятия серий попадают в GET /lessons/
+# REMINDER_HORIZON_HOURS - на сколько часов вперед manage.py plan_series_reminders
+# ставит напоминания занятий
+LESSON_SERIES = {
+    'LIST_HORIZON_DAYS': 90,
+    'REMINDER_HORIZON_HOURS': 48,
+}
+
+# Архив уроков (LessonArchive, manage.py archive_lessons)
+# RETENTION_DAYS - через сколько дней после окончания завершенные и отмененные
+# уроки переносятся в архив
+# BATCH_SIZE - уроков в одной транзакции переноса
+# PAUSE - пауза между транзакциями, сек: перенос не занимает БД целиком
+LESSON_ARCHIVE = {
+    'RETENTION_DAYS': 90,
+    'BATCH_SIZE': 1000,
+    'PAUSE': 0.1,
+}
+
+# Публикация задач Celery: 'outbox' (запись в OutboxMessage в транзакции
+# с уроком, отправка через manage.py relay_outbox) или 'direct' (сразу в брокер)
+LESSON_TASK_PUBLISHING = 'outbox'
+
+# Размер пула потоков для публикации задач в брокер из async-представлений
+LESSON_PUBLISH_EXECUTOR_WORKERS = 8
+
+# Живая лента уроков по WebSocket (lesson.feed)
+# SNAPSHOT_LIMIT - максимум уроков в начальном снимке
+# MAX_RESUME_CHANGES - сколько изменений можно дослать при возобновлении,
+# больше - клиент получает снимок заново
+# RETENTION_HOURS - срок хранения журнала для manage.py prune_lesson_feed
+# GAP_WAIT - сколько секунд соединение ждет пропущенный seq (дельты разных
+# процессов приходят не по порядку), потом дочитывает его из журнала
+LESSON_FEED = {
+    'SNAPSHOT_LIMIT': 500,
+    'MAX_RESUME_CHANGES': 1000,
+    'RETENTION_HOURS': 24,
+    'GAP_WAIT': 0.5,
+}
+
+# Ограничения WebSocket-соединений SimpleConsumer (ws_app.flow)
+# MAX_CONNECTIONS - соединений на процесс, сверх лимита рукопожатие отклоняется
+# SEND_QUEUE_SIZE / SEND_QUEUE_POLICY - очередь исходящих сообщений соединения
+# и политика при переполнении: 'drop_oldest', 'drop_newest' или 'close'
+# SEND_TIMEOUT - сек на отправку одного сообщения, дольше - медленный клиент
+# INBOUND_RATE / INBOUND_BURST - входящих сообщений в секунду и подряд
+# MAX_RATE_VIOLATIONS - отброшенных подряд входящих до закрытия соединения
+# HEARTBEAT_INTERVAL / IDLE_TIMEOUT - ping клиенту и закрытие молчащего соединения, сек
+WEBSOCKET_LIMITS = {
+    'MAX_CONNECTIONS': int(os.environ.get('WEBSOCKET_MAX_CONNECTIONS', 10000)),
+    'SEND_QUEUE_SIZE': 256,
+    'SEND_QUEUE_POLICY': 'drop_oldest',
+    'SEND_TIMEOUT': 10,
+    'INBOUND_RATE': 5,
+    'INBOUND_BURST': 20,
+    'MAX_RATE_VIOLATIONS': 50,
+    'HEARTBEAT_INTERVAL': 25,
+    'IDLE_TIMEOUT': 75,
+}
+
+# Массовый импорт POST /lessons/import/
+# CHUNK_SIZE - уроков в одном INSERT и одной задаче lesson.schedule_reminders
+LESSON_IMPORT = {
+    'CHUNK_SIZE': 500,
+    'MAX_ROWS': 100000,
+    'MAX_ERRORS': 1000,
+}
+
+# Выгрузка GET /lessons/export/: строк, читаемых из БД за один раз
+LESSON_EXPORT_CHUNK_SIZE = 2000
+
+# Заголовок Server-Timing с разбивкой времени запроса (БД, форма, брокер, WebSocket)
+METRICS_SERVER_TIMING = DEBUG
+
+# Логирование: LOG_FORMAT text или json (одна запись - одна строка JSON),
+# LOG_QUEUE=0 - писать в потоке запроса без фонового QueueListener
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text')
+LOG_QUEUE = os.environ.get('LOG_QUEUE', '1') == '1'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'text': {
+            'format': '[%(asctime)s] %(levelname)s - %(name)s - %(message)s',
+            'datefmt': '%Y-%m-%d %H:%M:%S',
+        },
+        'json': {
+            '()': 'test_it_school.log.JsonFormatter',
+        },
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'formatter': LOG_FORMAT,
+        },
+        'queue': {
+            'class': 'test_it_school.log.DeferredQueueHandler',
+            'handlers': ['console'],
+        },
+    },
+    'loggers': {
+        app: {
+            'handlers': ['queue' if LOG_QUEUE else 'console'],
+            'level': LOG_LEVEL,
+            'propagate': False,
+        }
+        for app in ('lesson', 'ws_app', 'test_it_school')
     },
 }
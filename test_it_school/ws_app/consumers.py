@@ -1,42 +1,397 @@
+import asyncio
 import json
+from datetime import datetime
 
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from lesson import feed
+from ws_app.flow import QueueOverflow, SendQueue, TokenBucket, flow_stats
+from ws_app.groups import BROADCAST_GROUP, client_groups, lesson_group
+
+# Коды закрытия соединения
+CLOSE_IDLE = 4000
+CLOSE_SLOW_CONSUMER = 4008
+CLOSE_POLICY_VIOLATION = 1008
+
+PING = json.dumps({'type': 'ping'})
 
 
 class SimpleConsumer(AsyncWebsocketConsumer):
+    """
+    Все сообщения клиенту идут через ограниченную очередь send_queue
+    (settings.WEBSOCKET_LIMITS), которую разбирает отдельная задача:
+    медленный клиент не копит сообщения в памяти процесса без предела.
+    Дельты ленты одного урока в очереди схлопываются в последнюю, поэтому
+    клиент должен применять feed_delta с op create/update как upsert.
+    """
+
     async def connect(self):
+        self.limits = settings.WEBSOCKET_LIMITS
+        self.counted = False
+        self.closing = False
+        self.tasks = []
+        if flow_stats.active >= self.limits['MAX_CONNECTIONS']:
+            # Лимит на процесс: отклоняем рукопожатие, клиент переподключится позже
+            flow_stats.incr('connections_rejected')
+            await self.close()
+            return
+
         await self.accept()
+        self.counted = True
+        flow_stats.connected()
+
+        self.send_queue = SendQueue(self.limits['SEND_QUEUE_SIZE'], self.limits['SEND_QUEUE_POLICY'])
+        self.inbound = TokenBucket(self.limits['INBOUND_RATE'], self.limits['INBOUND_BURST'])
+        self.rate_violations = 0
+        self.last_seen = asyncio.get_running_loop().time()
+
+        # Подписка на ленту уроков: диапазон и seq, до которого все дельты
+        # обработаны; дельты после пропуска в seq ждут в feed_buffer
+        self.feed_range = None
+        self.feed_seq = 0
+        self.feed_buffer = {}
+        self.feed_missing = set()
+        self.feed_gap_task = None
+
+        # Общая рассылка и личные группы клиента (пользователь или сессия)
+        session = self.scope.get("session")
+        self.subscribed_groups = {BROADCAST_GROUP, *client_groups(
+            self.scope.get("user"),
+            session.session_key if session is not None else None
+        )}
+        for group in self.subscribed_groups:
+            await self.channel_layer.group_add(group, self.channel_name)
 
-        await self.channel_layer.group_add(
-            "notifications",
-            self.channel_name
-        )
+        self.tasks = [
+            asyncio.create_task(self.write_loop()),
+            asyncio.create_task(self.heartbeat_loop()),
+        ]
 
-        await self.send(json.dumps({
+        await self.enqueue(json.dumps({
             'type': 'system',
             'message': 'Подключено к серверу'
         }))
 
     async def disconnect(self, close_code):
-        await self.channel_layer.group_discard(
-            "notifications",
-            self.channel_name
-        )
+        for task in self.tasks:
+            task.cancel()
+        if getattr(self, "feed_gap_task", None) is not None:
+            self.feed_gap_task.cancel()
+        for group in getattr(self, "subscribed_groups", ()):
+            await self.channel_layer.group_discard(group, self.channel_name)
+        if self.counted:
+            self.counted = False
+            flow_stats.disconnected()
+
+    async def shutdown(self, code: int):
+        """Закрывает соединение по инициативе сервера и останавливает фоновые задачи"""
+        if self.closing:
+            return
+        self.closing = True
+        current = asyncio.current_task()
+        for task in self.tasks:
+            if task is not current:
+                task.cancel()
+        await self.close(code=code)
+
+    async def enqueue(self, text: str, coalesce_key=None):
+        """Ставит сообщение в очередь отправки клиенту"""
+        if self.closing:
+            return
+        try:
+            dropped = self.send_queue.put(text, coalesce_key)
+        except QueueOverflow:
+            flow_stats.incr('closed_slow')
+            await self.shutdown(CLOSE_SLOW_CONSUMER)
+            return
+
+        if any(isinstance(key, tuple) and key[0] == 'feed' for key in dropped):
+            # Потерянная дельта ломает состояние ленты у клиента:
+            # отписываем и просим подписаться заново с последним seq
+            await self.reset_feed()
+
+    async def write_loop(self):
+        while True:
+            text = await self.send_queue.get()
+            try:
+                await asyncio.wait_for(self.send(text_data=text), self.limits['SEND_TIMEOUT'])
+            except asyncio.TimeoutError:
+                flow_stats.incr('closed_slow')
+                await self.shutdown(CLOSE_SLOW_CONSUMER)
+                return
+            flow_stats.incr('messages_sent')
+
+    async def heartbeat_loop(self):
+        """
+        Раз в HEARTBEAT_INTERVAL отправляет ping; если от клиента ничего не
+        приходило дольше IDLE_TIMEOUT, закрывает соединение.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.limits['HEARTBEAT_INTERVAL'])
+            if loop.time() - self.last_seen > self.limits['IDLE_TIMEOUT']:
+                flow_stats.incr('closed_idle')
+                await self.shutdown(CLOSE_IDLE)
+                return
+            await self.enqueue(PING, coalesce_key='ping')
 
     async def receive(self, text_data):
-        await self.send(json.dumps({
+        """
+        Управляющие сообщения клиента:
+            {"action": "subscribe", "lesson_id": 42}
+            {"action": "unsubscribe", "lesson_id": 42}
+            {"action": "feed_subscribe", "from": "2025-01-01T00:00", "to": "2025-02-01T00:00", "since": 120}
+            {"action": "feed_unsubscribe"}
+            {"action": "pong"} - ответ на ping
+        Остальные сообщения возвращаются эхом.
+        """
+        if self.closing:
+            return
+        self.last_seen = asyncio.get_running_loop().time()
+        if not self.inbound.consume():
+            await self.handle_rate_limited()
+            return
+        self.rate_violations = 0
+
+        try:
+            command = json.loads(text_data)
+        except ValueError:
+            command = None
+
+        action = command.get('action') if isinstance(command, dict) else None
+        if action == 'pong':
+            return
+        if action in ('subscribe', 'unsubscribe'):
+            await self.handle_subscription(command)
+            return
+        if action == 'feed_subscribe':
+            await self.handle_feed_subscribe(command)
+            return
+        if action == 'feed_unsubscribe':
+            await self.handle_feed_unsubscribe()
+            return
+
+        await self.enqueue(json.dumps({
             'type': 'echo',
             'message': f'Вы отправили: {text_data}'
         }))
 
+    async def handle_rate_limited(self):
+        flow_stats.incr('inbound_rate_limited')
+        self.rate_violations += 1
+        if self.rate_violations > self.limits['MAX_RATE_VIOLATIONS']:
+            flow_stats.incr('closed_rate_limited')
+            await self.shutdown(CLOSE_POLICY_VIOLATION)
+            return
+        await self.enqueue(json.dumps({
+            'type': 'error',
+            'message': 'Слишком много сообщений, сообщение отброшено'
+        }, ensure_ascii=False), coalesce_key='rate_limited')
+
+    async def handle_subscription(self, command: dict):
+        try:
+            group = lesson_group(int(command.get('lesson_id')))
+        except (TypeError, ValueError):
+            await self.enqueue(json.dumps({
+                'type': 'error',
+                'message': 'Ожидается числовой lesson_id'
+            }, ensure_ascii=False))
+            return
+
+        if command['action'] == 'subscribe':
+            self.subscribed_groups.add(group)
+            await self.channel_layer.group_add(group, self.channel_name)
+        else:
+            self.subscribed_groups.discard(group)
+            await self.channel_layer.group_discard(group, self.channel_name)
+
+        await self.enqueue(json.dumps({
+            'type': 'subscription',
+            'action': command['action'],
+            'lesson_id': command['lesson_id'],
+        }))
+
+    async def handle_feed_subscribe(self, command: dict):
+        """
+        Подписка на ленту уроков с временем начала в [from, to).
+
+        Без since (или если since уже вытеснен из журнала) клиент получает
+        снимок feed_snapshot, иначе - только пропущенные feed_delta.
+        Дальше приходят дельты с seq больше последнего отправленного.
+        """
+        try:
+            range_from = self._parse_time(command.get('from'))
+            range_to = self._parse_time(command.get('to'))
+            since = command.get('since')
+            since = int(since) if since is not None else None
+        except (TypeError, ValueError):
+            await self.enqueue(json.dumps({
+                'type': 'error',
+                'message': 'Ожидается from/to в формате ISO 8601 и числовой since'
+            }, ensure_ascii=False))
+            return
+
+        # Сначала вступаем в группу, потом читаем базу: дельты, пришедшие
+        # во время чтения, дождутся в очереди канала и отсеются по seq
+        self.clear_feed_state()
+        self.feed_range = (range_from, range_to)
+        self.subscribed_groups.add(feed.FEED_GROUP)
+        await self.channel_layer.group_add(feed.FEED_GROUP, self.channel_name)
+
+        changes = None
+        if since is not None:
+            # Журнал до этого seq просмотрен целиком, даже если в диапазон ничего не попало
+            seq = await database_sync_to_async(feed.current_seq)()
+            changes = await database_sync_to_async(feed.changes_since)(since, range_from, range_to)
+        # Пропущенное не помещается в очередь отправки - дешевле прислать снимок
+        if changes is not None and len(changes) >= self.send_queue.max_size:
+            changes = None
+
+        if changes is None:
+            snapshot = await database_sync_to_async(feed.snapshot)(range_from, range_to)
+            self.feed_seq = snapshot['seq']
+            await self.enqueue(json.dumps(snapshot, ensure_ascii=False, cls=DjangoJSONEncoder))
+            return
+
+        self.feed_seq = max(since, seq)
+        for change in changes:
+            self.feed_seq = max(self.feed_seq, change.id)
+            await self.enqueue(feed.encode_delta(change), coalesce_key=('feed', change.lesson_id))
+        await self.enqueue(json.dumps({'type': 'feed_resumed', 'seq': self.feed_seq}))
+
+    def clear_feed_state(self):
+        self.feed_range = None
+        self.feed_buffer = {}
+        self.feed_missing = set()
+        # reset_feed может прийти и из самой задачи дочитывания
+        if self.feed_gap_task is not None and self.feed_gap_task is not asyncio.current_task():
+            self.feed_gap_task.cancel()
+        self.feed_gap_task = None
+
+    async def handle_feed_unsubscribe(self):
+        self.clear_feed_state()
+        self.subscribed_groups.discard(feed.FEED_GROUP)
+        await self.channel_layer.group_discard(feed.FEED_GROUP, self.channel_name)
+        await self.enqueue(json.dumps({'type': 'feed_unsubscribed'}))
+
+    async def reset_feed(self):
+        self.clear_feed_state()
+        self.subscribed_groups.discard(feed.FEED_GROUP)
+        await self.channel_layer.group_discard(feed.FEED_GROUP, self.channel_name)
+        await self.enqueue(json.dumps({'type': 'feed_reset'}), coalesce_key='feed_reset')
+
+    async def feed_delta(self, event):
+        """
+        Дельта ленты из lesson.feed.broadcast_change.
+
+        Дельты рассылаются после коммита из разных процессов и могут прийти
+        не по порядку seq. Клиенту они уходят строго по порядку: дельта
+        после пропуска ждет в feed_buffer, пока не придет пропущенная;
+        через LESSON_FEED['GAP_WAIT'] секунд пропуск дочитывается из
+        журнала (fill_feed_gap). seq, которых в журнале не оказалось
+        (транзакция еще не закоммичена), запоминаются в feed_missing:
+        такая дельта отправляется, даже если придет позже.
+        """
+        if self.feed_range is None:
+            return
+        seq = event['seq']
+        if seq <= self.feed_seq:
+            if seq in self.feed_missing:
+                self.feed_missing.discard(seq)
+                await self.send_feed_delta(event)
+            return
+        self.feed_buffer[seq] = event
+        await self.drain_feed_buffer()
+
+    async def feed_batch(self, event):
+        """Пачка дельт ленты из lesson.feed.broadcast_changes (импорт уроков)"""
+        for item in event['items']:
+            await self.feed_delta(item)
+
+    async def send_feed_delta(self, event):
+        if self.feed_range is None:
+            return
+        # Урок в диапазоне сейчас или был в нем до переноса
+        if not (feed.in_range(event['start_time'], *self.feed_range)
+                or feed.in_range(event['previous_start_time'], *self.feed_range)):
+            return
+        await self.enqueue(event['text'], coalesce_key=('feed', event['lesson_id']))
+
+    async def drain_feed_buffer(self):
+        """Отправляет дельты, идущие подряд после feed_seq; при пропуске запускает дочитывание"""
+        while self.feed_range is not None and self.feed_seq + 1 in self.feed_buffer:
+            self.feed_seq += 1
+            await self.send_feed_delta(self.feed_buffer.pop(self.feed_seq))
+        if self.feed_range is not None and self.feed_buffer and self.feed_gap_task is None:
+            self.feed_gap_task = asyncio.create_task(self.fill_feed_gap())
+
+    async def fill_feed_gap(self):
+        """Ждет пропущенные дельты GAP_WAIT секунд, потом дочитывает их из журнала"""
+        try:
+            await asyncio.sleep(settings.LESSON_FEED['GAP_WAIT'])
+            await self.read_feed_gap()
+        finally:
+            self.feed_gap_task = None
+        await self.drain_feed_buffer()
+
+    async def read_feed_gap(self):
+        """Дочитывает пропуск в seq из журнала LessonChange, как при возобновлении подписки"""
+        if self.feed_range is None or not self.feed_buffer:
+            return
+        upto = max(self.feed_buffer)
+        max_changes = settings.LESSON_FEED['MAX_RESUME_CHANGES']
+        if upto - self.feed_seq > max_changes:
+            # Дочитывать слишком много - клиент возобновит подписку сам
+            await self.reset_feed()
+            return
+        changes = await database_sync_to_async(feed.changes_between)(self.feed_seq, upto)
+        found = {change.id: change for change in changes}
+        for seq in range(self.feed_seq + 1, upto + 1):
+            # Пока читали журнал, часть дельт могла прийти и уйти клиенту
+            if self.feed_range is None or seq <= self.feed_seq:
+                continue
+            self.feed_seq = seq
+            if seq in self.feed_buffer:
+                await self.send_feed_delta(self.feed_buffer.pop(seq))
+            elif seq in found:
+                await self.send_feed_delta(feed.delta_event(found[seq]))
+            else:
+                self.feed_missing.add(seq)
+        # Слишком старые пропуски больше не ждем
+        self.feed_missing = {seq for seq in self.feed_missing if seq > self.feed_seq - max_changes}
+
+    @staticmethod
+    def _parse_time(value) -> datetime | None:
+        if value is None:
+            return None
+        value = datetime.fromisoformat(value)
+        if timezone.is_aware(value):
+            value = timezone.make_naive(value)
+        return value
+
+    async def send_encoded(self, event):
+        """
+        Пересылает клиенту уже сериализованное сообщение.
+
+        JSON собирается один раз на стороне отправителя
+        (LessonDomain.send_websocket_message), поэтому рассылка на N
+        соединений не делает N вызовов json.dumps.
+        """
+        await self.enqueue(event['text'])
+
     async def send_simple_message(self, event):
         """
         Получает сообщение из Django и отправляет клиенту
         event - это словарь с данными из Django
+
+        Оставлен для отправителей старого формата, новые используют send_encoded.
         """
         message_text = event.get('message', 'Пустое сообщение')
 
-        await self.send(json.dumps({
+        await self.enqueue(json.dumps({
             'type': 'notification',
             'message': message_text,
             'title': '📨 Уведомление от сервера',
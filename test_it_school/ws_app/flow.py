@@ -0,0 +1,135 @@
+"""
+Ограничения потока для WebSocket-соединений: очередь исходящих сообщений
+с вытеснением и схлопыванием, ограничение частоты входящих сообщений и
+счетчики по процессу.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+
+
+class FlowStats:
+    """Счетчики соединений и сообщений SimpleConsumer в текущем процессе"""
+
+    COUNTERS = (
+        'connections_accepted', 'connections_rejected',
+        'messages_queued', 'messages_sent', 'messages_dropped', 'messages_coalesced',
+        'inbound_rate_limited', 'closed_rate_limited', 'closed_idle', 'closed_slow',
+    )
+
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+        self.counters = dict.fromkeys(self.COUNTERS, 0)
+
+    def incr(self, name: str, amount: int = 1):
+        self.counters[name] += amount
+
+    def connected(self):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        self.incr('connections_accepted')
+
+    def disconnected(self):
+        self.active -= 1
+
+    def stats(self) -> dict:
+        return {'connections_active': self.active, 'connections_peak': self.peak, **self.counters}
+
+
+flow_stats = FlowStats()
+
+
+class TokenBucket:
+    """
+    Ограничение частоты: rate токенов в секунду, не больше burst подряд.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def consume(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class QueueOverflow(Exception):
+    """Очередь переполнена при политике 'close'"""
+
+
+class SendQueue:
+    """
+    Ограниченная очередь исходящих сообщений одного соединения.
+
+    Сообщение с coalesce_key заменяет еще не отправленное сообщение с тем
+    же ключом (оно переносится в конец очереди, порядок остальных
+    сохраняется). При переполнении политика policy:
+        'drop_oldest' - вытесняется самое старое сообщение
+        'drop_newest' - отбрасывается новое сообщение
+        'close' - QueueOverflow, соединение закрывается как медленное
+    """
+
+    POLICIES = ('drop_oldest', 'drop_newest', 'close')
+
+    def __init__(self, max_size: int, policy: str = 'drop_oldest', stats: FlowStats = flow_stats):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Неизвестная политика очереди: {policy}")
+        self.max_size = max_size
+        self.policy = policy
+        self.stats = stats
+        self._items = OrderedDict()
+        self._ready = asyncio.Event()
+
+    def __len__(self):
+        return len(self._items)
+
+    def put(self, text: str, coalesce_key=None) -> list:
+        """
+        Ставит сообщение в очередь.
+
+        Returns:
+            list: ключи вытесненных сообщений (для сообщений без
+                coalesce_key - None)
+        """
+        self.stats.incr('messages_queued')
+        if coalesce_key is not None and coalesce_key in self._items:
+            del self._items[coalesce_key]
+            self._items[coalesce_key] = text
+            self.stats.incr('messages_coalesced')
+            return []
+
+        dropped = []
+        if len(self._items) >= self.max_size:
+            if self.policy == 'close':
+                raise QueueOverflow()
+            self.stats.incr('messages_dropped')
+            if self.policy == 'drop_newest':
+                return [coalesce_key]
+            key, _ = self._items.popitem(last=False)
+            dropped.append(key if not isinstance(key, _Anonymous) else None)
+
+        key = coalesce_key if coalesce_key is not None else _Anonymous()
+        self._items[key] = text
+        self._ready.set()
+        return dropped
+
+    async def get(self) -> str:
+        while not self._items:
+            self._ready.clear()
+            await self._ready.wait()
+        _, text = self._items.popitem(last=False)
+        return text
+
+
+class _Anonymous:
+    """Ключ сообщения, которое не схлопывается"""
+
+    __slots__ = ()
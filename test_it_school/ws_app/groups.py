@@ -0,0 +1,35 @@
+"""
+Имена групп channel layer.
+
+notifications    - общая рассылка всем подключенным клиентам;
+user.<id>        - все соединения авторизованного пользователя;
+session.<key>    - соединения анонимного посетителя (по сессии);
+lesson.<id>      - клиенты, подписанные на конкретный урок.
+"""
+
+BROADCAST_GROUP = "notifications"
+
+
+def user_group(user_id) -> str:
+    return f"user.{user_id}"
+
+
+def session_group(session_key: str) -> str:
+    return f"session.{session_key}"
+
+
+def lesson_group(lesson_id) -> str:
+    return f"lesson.{lesson_id}"
+
+
+def client_groups(user, session_key: str = None) -> list[str]:
+    """
+    Группы, через которые можно достучаться до конкретного клиента.
+
+    Если клиента не удается идентифицировать, возвращает общую группу.
+    """
+    if user is not None and user.is_authenticated:
+        return [user_group(user.pk)]
+    if session_key:
+        return [session_group(session_key)]
+    return [BROADCAST_GROUP]